@@ -1,16 +1,49 @@
-from .tracing.tracer import Tracer
-from .agentneo import AgentNeo
-from .server import launch_dashboard, close_dashboard
-from . import utils
-from . import data
-from .evaluation import Evaluation
+import importlib
+from typing import TYPE_CHECKING
+
+# Public names are resolved on first access (PEP 562), so that importing the
+# tracer does not pull in litellm (evaluation) or flask/waitress (dashboard).
+_LAZY_ATTRIBUTES = {
+    "AgentNeo": ".agentneo",
+    "Tracer": ".tracing.tracer",
+    "Evaluation": ".evaluation",
+    "BatchEvaluation": ".evaluation",
+    "launch_dashboard": ".server",
+    "close_dashboard": ".server",
+}
+_LAZY_SUBMODULES = {"utils", "data"}
+
+if TYPE_CHECKING:
+    from .tracing.tracer import Tracer
+    from .agentneo import AgentNeo
+    from .server import launch_dashboard, close_dashboard
+    from . import utils
+    from . import data
+    from .evaluation import Evaluation, BatchEvaluation
 
 __all__ = [
     "AgentNeo",
     "Tracer",
     "Evaluation",
+    "BatchEvaluation",
     "launch_dashboard",
     "close_dashboard",
     "utils",
     "data",
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY_SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    elif name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,8 +1,8 @@
 import os
 from datetime import datetime
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from .data.data_models import Base, ProjectInfoModel
+from .data import ProjectInfoModel, get_engine
+from .data.retention import prune_raw_spans
 from .utils import get_db_path
 
 
@@ -12,8 +12,7 @@ class AgentNeo:
             session_name or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         )
         self.db_path = get_db_path()
-        self.engine = create_engine(self.db_path)
-        Base.metadata.create_all(self.engine)
+        self.engine = get_engine(self.db_path)
         self.Session = sessionmaker(bind=self.engine)
         self.project_id = None
         self.project_name = None
@@ -57,8 +56,7 @@ class AgentNeo:
     @staticmethod
     def list_projects(num_projects: int = None):
         db_path = get_db_path()
-        engine = create_engine(db_path)
-        Session = sessionmaker(bind=engine)
+        Session = sessionmaker(bind=get_engine(db_path))
         with Session() as session:
             query = session.query(ProjectInfoModel).order_by(
                 ProjectInfoModel.start_time.desc()
@@ -71,6 +69,18 @@ class AgentNeo:
             for p in projects
         ]
 
+    @staticmethod
+    def prune_spans(retention_days: float):
+        """
+        Deletes the spans of finished traces that started more than
+        ``retention_days`` ago. Traces, their totals and the time-bucketed
+        rollups are kept.
+
+        :param retention_days: Age in days of the oldest spans kept
+        :return: The number of rows deleted, by table
+        """
+        return prune_raw_spans(get_engine(get_db_path()), retention_days)
+
     @staticmethod
     def launch_dashboard(port=3000):
         """
@@ -10,7 +10,15 @@ from .data_models import (
     TraceModel,
     UserInteractionModel,
     MetricModel,
+    IdSequenceModel,
+    JudgeCacheModel,
+    BlobModel,
+    MessageModel,
+    SpanUsageModel,
+    SpanRollupModel,
 )
+from .engine import get_engine
+from .trace_loader import TraceLoader, TraceRecord
 
 __all__ = [
     "Base",
@@ -27,4 +35,13 @@ __all__ = [
     "AgentCall",
     "UserInteractionModel",
     "MetricModel",
+    "IdSequenceModel",
+    "JudgeCacheModel",
+    "BlobModel",
+    "MessageModel",
+    "SpanUsageModel",
+    "SpanRollupModel",
+    "get_engine",
+    "TraceLoader",
+    "TraceRecord",
 ]
@@ -0,0 +1,143 @@
+"""Side storage for span payloads that exceed their size cap.
+
+A payload (see :mod:`agentneo.utils.serialization`) larger than the cap of
+its field is compressed into the ``blobs`` table, keyed by the sha256 of its
+text, so repeated payloads are stored once. The span row keeps a small JSON
+marker in its place::
+
+    {"__agentneo_blob__": "<sha256>", "size": 81234, "preview": "..."}
+
+Readers fetch the full payload on demand with :func:`load_blobs`.
+"""
+
+import hashlib
+import json
+import logging
+import zlib
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select
+
+from .data_models import BlobModel
+
+logger = logging.getLogger(__name__)
+
+BLOB_MARKER = "__agentneo_blob__"
+# Start of the JSON text of every marker
+BLOB_MARKER_PREFIX = '{"' + BLOB_MARKER + '"'
+
+# Characters of an oversized payload kept inline as its preview
+PREVIEW_LENGTH = 1000
+
+# Size caps in bytes of the UTF-8 payload, by column; None for no cap
+DEFAULT_PAYLOAD_LIMITS = {
+    "input_prompt": 256 * 1024,
+    "output": 256 * 1024,
+    "tool_call": 256 * 1024,
+    "input_parameters": 256 * 1024,
+}
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def default_codec() -> str:
+    """zstd if the zstandard package is installed, zlib otherwise."""
+    return "zstd" if _zstd() is not None else "zlib"
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, 6)
+    if codec == "zstd":
+        zstandard = _zstd()
+        if zstandard is None:
+            raise ImportError("zstd blobs need the zstandard package")
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    raise ValueError(f"Unknown blob codec {codec!r}")
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        zstandard = _zstd()
+        if zstandard is None:
+            raise ImportError("zstd blobs need the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown blob codec {codec!r}")
+
+
+def blob_ref(value) -> Optional[str]:
+    """The blob hash if ``value`` is a decoded blob marker, else None."""
+    if isinstance(value, dict) and BLOB_MARKER in value:
+        return value[BLOB_MARKER]
+    return None
+
+
+class PayloadPolicy:
+    """Decides which payloads are moved to the blob store.
+
+    Args:
+        limits: Size caps by column, merged over DEFAULT_PAYLOAD_LIMITS.
+        codec: 'zlib' or 'zstd'; the best available one if None.
+        preview_length: Characters kept inline in the marker.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Optional[int]]] = None,
+        codec: Optional[str] = None,
+        preview_length: int = PREVIEW_LENGTH,
+    ):
+        self.limits = {**DEFAULT_PAYLOAD_LIMITS, **(limits or {})}
+        self.codec = codec or default_codec()
+        self.preview_length = preview_length
+
+    def apply(self, field: str, text):
+        """Return ``(text, blob)``: the text to store inline and the
+        BlobModel to store alongside, or None if it fits."""
+        limit = self.limits.get(field)
+        if text is None or limit is None or len(text) <= limit // 4:
+            # Fits whatever its encoding (at most 4 UTF-8 bytes a character)
+            return text, None
+        data = text.encode("utf-8")
+        if len(data) <= limit:
+            return text, None
+        digest = hashlib.sha256(data).hexdigest()
+        blob = BlobModel(
+            hash=digest,
+            codec=self.codec,
+            size=len(data),
+            data=compress(data, self.codec),
+        )
+        marker = json.dumps(
+            {
+                BLOB_MARKER: digest,
+                "size": len(data),
+                # Kept within the cap itself
+                "preview": text[: min(self.preview_length, limit // 8)],
+            },
+            ensure_ascii=False,
+        )
+        return marker, blob
+
+
+def load_blobs(session, hashes: Iterable[str]) -> Dict[str, str]:
+    """The payload text of each of ``hashes``, fetched in one query."""
+    hashes = set(hashes)
+    if not hashes:
+        return {}
+    blobs = {}
+    query = select(BlobModel).where(BlobModel.hash.in_(hashes))
+    for blob in session.scalars(query):
+        blobs[blob.hash] = decompress(blob.data, blob.codec).decode("utf-8")
+    missing = hashes - blobs.keys()
+    if missing:
+        logger.warning(f"{len(missing)} payload blobs are missing")
+    return blobs
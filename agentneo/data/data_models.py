@@ -1,18 +1,36 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Integer,
+    String,
+    Float,
+    DateTime,
+    ForeignKey,
+    JSON,
+    Index,
+    LargeBinary,
+)
+from sqlalchemy.orm import object_session, relationship
 from datetime import datetime
+import hashlib
+import json
 
 Base = declarative_base()
 
 
 class UserInteractionModel(Base):
     __tablename__ = "user_interactions"
+    __table_args__ = (
+        Index("ix_user_interactions_trace_id_timestamp", "trace_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True)
-    project_id = Column(Integer, ForeignKey("project_info.id"), nullable=False)
+    project_id = Column(
+        Integer, ForeignKey("project_info.id"), nullable=False, index=True
+    )
     trace_id = Column(Integer, ForeignKey("traces.id"), nullable=False)
-    agent_id = Column(Integer, ForeignKey("agent_call.id"), nullable=True)
+    agent_id = Column(Integer, ForeignKey("agent_call.id"), nullable=True, index=True)
     interaction_type = Column(String, nullable=False)  # 'input' or 'output'
     content = Column(String, nullable=False)
     timestamp = Column(DateTime, default=datetime.now)
@@ -24,15 +42,39 @@ class UserInteractionModel(Base):
 
 class TraceModel(Base):
     __tablename__ = "traces"
+    __table_args__ = (
+        Index("ix_traces_project_id_start_time", "project_id", "start_time"),
+    )
 
     id = Column(Integer, primary_key=True)
     project_id = Column(Integer, ForeignKey("project_info.id"), nullable=False)
     start_time = Column(DateTime, default=datetime.now)
     end_time = Column(DateTime, nullable=True)
     duration = Column(Float, nullable=True)
+    # Rollups written when the trace stops; NULL while it is still running.
+    total_cost = Column(Float, nullable=True)
+    total_tokens = Column(Integer, nullable=True)
+    llm_call_count = Column(Integer, nullable=True)
+    tool_call_count = Column(Integer, nullable=True)
+    error_count = Column(Integer, nullable=True)
+    # Content hash of the shared SystemInfoModel row. Not declared as a
+    # foreign key, since system_info already references traces.
+    system_info_hash = Column(String, nullable=True, index=True)
+    # Bumped by every write to the trace, its spans or its metrics; see
+    # agentneo.data.trace_versions.
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Set once the spans are added to the span rollups, so that they are
+    # added only once; see agentneo.data.rollups.
+    rolled_up = Column(Boolean, nullable=False, default=False, server_default="0")
 
     project = relationship("ProjectInfoModel", back_populates="traces")
-    system_info = relationship("SystemInfoModel", uselist=False, back_populates="trace")
+    # System snapshots are shared by every trace recorded on the same machine
+    system_info = relationship(
+        "SystemInfoModel",
+        primaryjoin="foreign(TraceModel.system_info_hash) == SystemInfoModel.content_hash",
+        uselist=False,
+        viewonly=True,
+    )
     errors = relationship("ErrorModel", back_populates="trace")
     llm_calls = relationship("LLMCallModel", back_populates="trace")
     tool_calls = relationship("ToolCallModel", back_populates="trace")
@@ -46,7 +88,7 @@ class ProjectInfoModel(Base):
     __tablename__ = "project_info"
 
     id = Column(Integer, primary_key=True)
-    project_name = Column(String, nullable=False)
+    project_name = Column(String, nullable=False, index=True)
     start_time = Column(DateTime, default=datetime.now)
     end_time = Column(DateTime, nullable=True)
     duration = Column(Float, nullable=True)
@@ -60,12 +102,36 @@ class ProjectInfoModel(Base):
         back_populates="project",
     )
 
+    @property
+    def system_info(self):
+        """The system snapshot of the project's most recent trace.
+
+        Snapshots are shared by every trace recorded on the same machine,
+        whatever its project, so they are found through the traces rather
+        than by their own project_id.
+        """
+        session = object_session(self)
+        if session is None:
+            return None
+        return (
+            session.query(SystemInfoModel)
+            .join(
+                TraceModel,
+                TraceModel.system_info_hash == SystemInfoModel.content_hash,
+            )
+            .filter(TraceModel.project_id == self.id)
+            .order_by(TraceModel.start_time.desc(), TraceModel.id.desc())
+            .first()
+        )
+
 
 class SystemInfoModel(Base):
     __tablename__ = "system_info"
 
     id = Column(Integer, primary_key=True)
-    project_id = Column(Integer, ForeignKey("project_info.id"), nullable=False)
+    project_id = Column(
+        Integer, ForeignKey("project_info.id"), nullable=False, index=True
+    )
     os_name = Column(String, nullable=False)
     os_version = Column(String, nullable=False)
     python_version = Column(String, nullable=False)
@@ -74,23 +140,64 @@ class SystemInfoModel(Base):
     disk_info = Column(String, nullable=True)
     memory_total = Column(Float, nullable=False)
     installed_packages = Column(String, nullable=False)
-    trace_id = Column(Integer, ForeignKey("traces.id"), nullable=False)
-
-    trace = relationship("TraceModel", back_populates="system_info")
-    project = relationship("ProjectInfoModel", back_populates="system_info")
+    # Project and trace that first recorded this snapshot, which is shared
+    # by all traces with its content_hash: not the project or trace it
+    # belongs to (see TraceModel.system_info, ProjectInfoModel.system_info)
+    trace_id = Column(Integer, ForeignKey("traces.id"), nullable=False, index=True)
+    content_hash = Column(String, nullable=True, unique=True, index=True)
+
+    trace = relationship("TraceModel", foreign_keys=[trace_id])
+    project = relationship("ProjectInfoModel")
+
+    @staticmethod
+    def hash_content(
+        os_name,
+        os_version,
+        python_version,
+        cpu_info,
+        gpu_info,
+        disk_info,
+        memory_total,
+        installed_packages,
+    ) -> str:
+        """Content address of a snapshot, given its column values.
+
+        Free disk space changes from run to run and is left out, so the same
+        machine and environment always map to the same row.
+        """
+        disk = json.loads(disk_info) if disk_info else {}
+        content = {
+            "os_name": os_name,
+            "os_version": os_version,
+            "python_version": python_version,
+            "cpu_info": cpu_info,
+            "gpu_info": json.loads(gpu_info) if gpu_info else None,
+            "disk_total": disk.get("total"),
+            "memory_total": memory_total,
+            "installed_packages": json.loads(installed_packages),
+        }
+        encoded = json.dumps(content, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
 
 
 class ErrorModel(Base):
     __tablename__ = "errors"
+    __table_args__ = (Index("ix_errors_trace_id_timestamp", "trace_id", "timestamp"),)
 
     id = Column(Integer, primary_key=True)
-    project_id = Column(Integer, ForeignKey("project_info.id"), nullable=False)
+    project_id = Column(
+        Integer, ForeignKey("project_info.id"), nullable=False, index=True
+    )
     trace_id = Column(Integer, ForeignKey("traces.id"), nullable=False)
-    agent_id = Column(Integer, ForeignKey("agent_call.id"), nullable=True)
-    tool_call_id = Column(Integer, ForeignKey("tool_call.id"), nullable=True)
-    llm_call_id = Column(Integer, ForeignKey("llm_call.id"), nullable=True)
+    agent_id = Column(Integer, ForeignKey("agent_call.id"), nullable=True, index=True)
+    tool_call_id = Column(
+        Integer, ForeignKey("tool_call.id"), nullable=True, index=True
+    )
+    llm_call_id = Column(Integer, ForeignKey("llm_call.id"), nullable=True, index=True)
     error_type = Column(String, nullable=False)  # 'LLM', 'Tool', or 'Agent'
     error_message = Column(String, nullable=False)
+    # Model of a failed LLM call, which has no llm_call row
+    model = Column(String, nullable=True)
     timestamp = Column(DateTime, default=datetime.now)
 
     trace = relationship("TraceModel", back_populates="errors")
@@ -102,10 +209,15 @@ class ErrorModel(Base):
 
 class LLMCallModel(Base):
     __tablename__ = "llm_call"
+    __table_args__ = (
+        Index("ix_llm_call_trace_id_start_time", "trace_id", "start_time"),
+    )
 
     id = Column(Integer, primary_key=True)
-    project_id = Column(Integer, ForeignKey("project_info.id"), nullable=False)
-    agent_id = Column(Integer, ForeignKey("agent_call.id"), nullable=True)
+    project_id = Column(
+        Integer, ForeignKey("project_info.id"), nullable=False, index=True
+    )
+    agent_id = Column(Integer, ForeignKey("agent_call.id"), nullable=True, index=True)
     name = Column(String, nullable=False)
     model = Column(String, nullable=True)
     input_prompt = Column(String, nullable=False)
@@ -116,7 +228,15 @@ class LLMCallModel(Base):
     duration = Column(Float, nullable=True)
     token_usage = Column(JSON, nullable=False)
     cost = Column(JSON, nullable=False)
+    # Process memory delta during the call, see agentneo.tracing.memory
     memory_used = Column(Integer, nullable=False)
+    # Streaming latency; NULL for calls that were not streamed
+    time_to_first_token = Column(Float, nullable=True)  # seconds
+    inter_token_latency = Column(Float, nullable=True)  # mean seconds per chunk
+    chunk_count = Column(Integer, nullable=True)
+    # Hashes of the prompt's messages in the messages table, in order; the
+    # prompt is then not stored in input_prompt.
+    input_message_refs = Column(JSON, nullable=True)
     trace_id = Column(Integer, ForeignKey("traces.id"), nullable=False)
 
     trace = relationship("TraceModel", back_populates="llm_calls")
@@ -126,16 +246,22 @@ class LLMCallModel(Base):
 
 class ToolCallModel(Base):
     __tablename__ = "tool_call"
+    __table_args__ = (
+        Index("ix_tool_call_trace_id_start_time", "trace_id", "start_time"),
+    )
 
     id = Column(Integer, primary_key=True)
-    project_id = Column(Integer, ForeignKey("project_info.id"), nullable=False)
-    agent_id = Column(Integer, ForeignKey("agent_call.id"), nullable=True)
+    project_id = Column(
+        Integer, ForeignKey("project_info.id"), nullable=False, index=True
+    )
+    agent_id = Column(Integer, ForeignKey("agent_call.id"), nullable=True, index=True)
     name = Column(String, nullable=False)
     input_parameters = Column(String, nullable=False)
     output = Column(String, nullable=False)
     start_time = Column(DateTime, default=datetime.now)
     end_time = Column(DateTime, nullable=True)
     duration = Column(Float, nullable=True)
+    # Process memory delta during the call, see agentneo.tracing.memory
     memory_used = Column(Integer, nullable=False)
     trace_id = Column(Integer, ForeignKey("traces.id"), nullable=False)
     network_calls = Column(JSON, nullable=True)
@@ -146,9 +272,14 @@ class ToolCallModel(Base):
 
 class AgentCallModel(Base):
     __tablename__ = "agent_call"
+    __table_args__ = (
+        Index("ix_agent_call_trace_id_start_time", "trace_id", "start_time"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, unique=True)
-    project_id = Column(Integer, ForeignKey("project_info.id"), nullable=False)
+    project_id = Column(
+        Integer, ForeignKey("project_info.id"), nullable=False, index=True
+    )
     name = Column(String, nullable=False)
     start_time = Column(DateTime, default=datetime.now)
     end_time = Column(DateTime, nullable=True)
@@ -168,6 +299,9 @@ class AgentCallModel(Base):
 
 class MetricModel(Base):
     __tablename__ = "metrics"
+    __table_args__ = (
+        Index("ix_metrics_trace_id_metric_name", "trace_id", "metric_name"),
+    )
 
     id = Column(Integer, primary_key=True)
     trace_id = Column(Integer, ForeignKey("traces.id"), nullable=False)
@@ -199,9 +333,6 @@ ProjectInfoModel.tool_calls = relationship(
 ProjectInfoModel.agent_calls = relationship(
     "AgentCallModel", order_by=AgentCallModel.id, back_populates="project"
 )
-ProjectInfoModel.system_info = relationship(
-    "SystemInfoModel", uselist=False, back_populates="project"
-)
 ProjectInfoModel.errors = relationship(
     "ErrorModel", order_by=ErrorModel.id, back_populates="project"
 )
@@ -217,3 +348,91 @@ ToolCallModel.errors = relationship(
 LLMCallModel.errors = relationship(
     "ErrorModel", order_by=ErrorModel.id, back_populates="llm_call"
 )
+
+
+class IdSequenceModel(Base):
+    __tablename__ = "id_sequences"
+
+    table_name = Column(String, primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
+
+class JudgeCacheModel(Base):
+    __tablename__ = "judge_cache"
+
+    # sha256 of the canonical request, see agentneo.evaluation.judge_cache
+    key = Column(String, primary_key=True)
+    model = Column(String, nullable=True)
+    response = Column(JSON, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    last_used_at = Column(DateTime, default=datetime.now, index=True)
+
+
+class BlobModel(Base):
+    __tablename__ = "blobs"
+
+    # sha256 of the uncompressed payload, see agentneo.data.blob_store
+    hash = Column(String, primary_key=True)
+    codec = Column(String, nullable=False)  # 'zlib' or 'zstd'
+    size = Column(Integer, nullable=False)  # uncompressed bytes
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+
+
+class MessageModel(Base):
+    __tablename__ = "messages"
+
+    # sha256 of the message's JSON, see agentneo.data.message_store
+    hash = Column(String, primary_key=True)
+    content = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+
+
+class SpanUsageModel(Base):
+    __tablename__ = "span_usage"
+
+    # One row per finished trace and LLM model or tool name, see
+    # agentneo.data.span_usage
+    id = Column(Integer, primary_key=True)
+    project_id = Column(
+        Integer, ForeignKey("project_info.id"), nullable=False, index=True
+    )
+    trace_id = Column(Integer, ForeignKey("traces.id"), nullable=False, index=True)
+    span_type = Column(String, nullable=False)  # 'llm' or 'tool'
+    name = Column(String, nullable=True)  # model or tool name
+    call_count = Column(Integer, nullable=False)
+    # Calls that raised; they have no span row, so are not in call_count
+    error_count = Column(Integer, nullable=False)
+    total_duration = Column(Float, nullable=False)
+    total_cost = Column(Float, nullable=False)
+    total_tokens = Column(Integer, nullable=False)
+    # Histogram of the calls' durations, see agentneo.data.latency_sketch
+    durations = Column(JSON, nullable=False)
+
+
+class SpanRollupModel(Base):
+    __tablename__ = "span_rollups"
+    __table_args__ = (
+        Index(
+            "ix_span_rollups_project_id_granularity_bucket_start",
+            "project_id",
+            "granularity",
+            "bucket_start",
+        ),
+    )
+
+    # Spans of finished traces by time bucket, see agentneo.data.rollups
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("project_info.id"), nullable=False)
+    granularity = Column(String, nullable=False)  # 'minute', 'hour' or 'day'
+    bucket_start = Column(DateTime, nullable=False)
+    span_type = Column(String, nullable=False)  # 'llm', 'tool' or 'agent'
+    name = Column(String, nullable=True)  # model, tool or agent name
+    call_count = Column(Integer, nullable=False)
+    error_count = Column(Integer, nullable=False)
+    total_duration = Column(Float, nullable=False)
+    total_cost = Column(Float, nullable=False)
+    total_tokens = Column(Integer, nullable=False)
+    # Histogram of the calls' durations, see agentneo.data.latency_sketch
+    durations = Column(JSON, nullable=False)
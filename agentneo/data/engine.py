@@ -0,0 +1,81 @@
+import os
+import threading
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+
+from .data_models import Base
+from .migrations import migrate
+
+# Connection tuning applied to every SQLite connection AgentNeo opens. WAL
+# lets the dashboard read while tracers write; NORMAL sync is durable in WAL
+# mode except for the last transactions before a power loss.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,  # KiB, i.e. 64 MB of page cache
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 30000,  # ms
+}
+
+POOL_SIZE = 8
+MAX_OVERFLOW = 16
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _create_engine(db_path: str) -> Engine:
+    if not db_path.startswith("sqlite"):
+        return create_engine(db_path)
+
+    options = {"connect_args": {"timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000}}
+    if ":memory:" in db_path or db_path in ("sqlite://", "sqlite:///"):
+        # Each connection would have a database of its own: all threads
+        # share a single one instead.
+        options["poolclass"] = StaticPool
+    else:
+        options.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW)
+    # Connections are handed between the tracer and its writer thread.
+    options["connect_args"]["check_same_thread"] = False
+    engine = create_engine(db_path, **options)
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+def get_engine(db_path: str = None) -> Engine:
+    """Return the shared, tuned engine for ``db_path``.
+
+    One engine (and therefore one connection pool) is kept per database URL
+    per process, and the schema is created or migrated the first time it is
+    requested. Defaults to the AgentNeo trace database.
+    """
+    if db_path is None:
+        from ..utils import get_db_path
+
+        db_path = get_db_path()
+
+    key = (os.getpid(), db_path)
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _create_engine(db_path)
+            Base.metadata.create_all(engine)
+            migrate(engine)
+            _engines[key] = engine
+    return engine
@@ -0,0 +1,60 @@
+"""Mergeable duration histograms for approximate percentiles.
+
+Durations are counted in logarithmic buckets whose bounds grow by a fixed
+ratio, so that any value reported from a bucket is within
+``RELATIVE_ACCURACY`` of the durations counted in it, however long they
+are. A histogram is a ``{bucket index: count}`` mapping; histograms are
+merged by adding the counts of equal buckets, which is what makes them
+cheap to keep per trace (or per time bucket) and to combine in SQL.
+Indexes are strings once a histogram has been through JSON.
+"""
+
+import math
+from typing import Dict, Iterable, Mapping, Optional
+
+RELATIVE_ACCURACY = 0.02
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+# Shorter durations (including 0) are counted in the bucket of this one
+MIN_DURATION = 1e-6  # seconds
+
+
+def bucket_index(duration: float) -> int:
+    """The bucket that counts ``duration`` seconds."""
+    return math.ceil(math.log(max(duration, MIN_DURATION)) / _LOG_GAMMA)
+
+
+def bucket_value(index) -> float:
+    """The duration reported for the bucket ``index``."""
+    return 2 * _GAMMA ** int(index) / (_GAMMA + 1)
+
+
+def add(histogram: Dict, duration: Optional[float], count: int = 1):
+    """Count ``duration`` in ``histogram``; None durations are ignored."""
+    if duration is not None:
+        index = bucket_index(duration)
+        histogram[index] = histogram.get(index, 0) + count
+
+
+def merge(histograms: Iterable[Mapping]) -> Dict[int, int]:
+    merged = {}
+    for histogram in histograms:
+        for index, count in histogram.items():
+            merged[int(index)] = merged.get(int(index), 0) + count
+    return merged
+
+
+def quantile(histogram: Mapping, q: float) -> Optional[float]:
+    """The nearest-rank ``q`` quantile of the counted durations, or None
+    if the histogram is empty."""
+    counts = sorted((int(index), count) for index, count in histogram.items())
+    total = sum(count for _, count in counts)
+    if not total:
+        return None
+    rank = max(math.ceil(q * total), 1)
+    seen = 0
+    for index, count in counts:
+        seen += count
+        if seen >= rank:
+            return bucket_value(index)
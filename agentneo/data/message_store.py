@@ -0,0 +1,72 @@
+"""Content-addressed storage of prompt messages.
+
+Chat agents resend their system prompt and the conversation so far with
+every completion, so storing each prompt whole grows quadratically with the
+conversation. Instead, each message is stored once in the ``messages``
+table, keyed by the sha256 of its JSON, and an LLM call keeps the ordered
+list of its messages' hashes in ``input_message_refs``. Its
+``input_prompt`` then only holds a marker::
+
+    {"__agentneo_messages__": 12}
+
+Readers put the prompt back together with :func:`load_messages` and
+:func:`join_messages`.
+
+A message is a payload like any other: one larger than the prompt's size
+cap is moved to the blob store (see :mod:`agentneo.data.blob_store`) and
+its row holds the blob marker instead. Messages under the cap are stored
+as is, as are inline payloads.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from ..utils.serialization import dumps
+from .data_models import MessageModel
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_MARKER = "__agentneo_messages__"
+
+
+def split_messages(prompt) -> Optional[List[Tuple[str, str]]]:
+    """``(hash, JSON text)`` of each message of a chat prompt, or None if
+    ``prompt`` is not a list of messages."""
+    if not isinstance(prompt, (list, tuple)) or not prompt:
+        return None
+    messages = []
+    for message in prompt:
+        if isinstance(message, (str, int, float, bool, list, tuple)) or message is None:
+            return None
+        text = dumps(message)
+        messages.append((hashlib.sha256(text.encode("utf-8")).hexdigest(), text))
+    return messages
+
+
+def prompt_marker(count: int) -> str:
+    """The input_prompt of a call whose messages are stored by reference."""
+    return json.dumps({MESSAGES_MARKER: count})
+
+
+def join_messages(texts: Iterable[str]) -> str:
+    """The prompt's JSON text, as serialization.dumps writes it."""
+    return "[" + ", ".join(texts) + "]"
+
+
+def load_messages(session, hashes: Iterable[str]) -> Dict[str, str]:
+    """The JSON text of each of ``hashes``, fetched in one query."""
+    hashes = set(hashes)
+    if not hashes:
+        return {}
+    query = select(MessageModel.hash, MessageModel.content).where(
+        MessageModel.hash.in_(hashes)
+    )
+    messages = dict(session.execute(query).all())
+    missing = hashes - messages.keys()
+    if missing:
+        logger.warning(f"{len(missing)} prompt messages are missing")
+    return messages
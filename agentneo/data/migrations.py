@@ -0,0 +1,270 @@
+"""Lightweight, in-place upgrades of existing AgentNeo databases.
+
+``Base.metadata.create_all`` only creates tables that are missing; it never
+touches tables that already exist. Each migration below brings an older
+database up to the current models and is recorded in SQLite's
+``user_version`` pragma so it runs once per database file. Migrations must
+be idempotent, since a freshly created database already matches the models.
+
+Steps that go over every row commit a batch at a time, so that tracers and
+the dashboard are never locked out of the database for a whole rewrite. An
+upgrade interrupted between batches starts over when the database is next
+opened, which idempotent steps allow.
+"""
+
+import ast
+import json
+import logging
+
+from sqlalchemy import inspect
+
+from .data_models import (
+    Base,
+    ErrorModel,
+    LLMCallModel,
+    SystemInfoModel,
+    TraceModel,
+)
+from .rollups import roll_up_traces
+from .span_usage import summarize_traces
+from ..utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+def _create_missing_indexes(connection):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+# Sum of the numeric values of a JSON object column. Older rows hold the
+# object itself, rows written through json.dumps hold it as a JSON string.
+_JSON_SUM = """(
+    SELECT SUM(value) FROM json_each(
+        CASE WHEN json_type({column}) = 'text'
+        THEN json_extract({column}, '$') ELSE {column} END
+    )
+)"""
+
+
+def _add_trace_rollups(connection):
+    add_missing_columns(
+        connection,
+        TraceModel,
+        [
+            "total_cost",
+            "total_tokens",
+            "llm_call_count",
+            "tool_call_count",
+            "error_count",
+        ],
+    )
+    cost = _JSON_SUM.format(column="llm_call.cost")
+    tokens = _JSON_SUM.format(column="llm_call.token_usage")
+    connection.exec_driver_sql(
+        f"""
+        UPDATE traces SET
+            total_cost = (
+                SELECT COALESCE(SUM({cost}), 0)
+                FROM llm_call WHERE llm_call.trace_id = traces.id
+            ),
+            total_tokens = (
+                SELECT COALESCE(SUM({tokens}), 0)
+                FROM llm_call WHERE llm_call.trace_id = traces.id
+            ),
+            llm_call_count = (
+                SELECT COUNT(*) FROM llm_call WHERE llm_call.trace_id = traces.id
+            ),
+            tool_call_count = (
+                SELECT COUNT(*) FROM tool_call WHERE tool_call.trace_id = traces.id
+            ),
+            error_count = (
+                SELECT COUNT(*) FROM errors WHERE errors.trace_id = traces.id
+            )
+        WHERE end_time IS NOT NULL AND llm_call_count IS NULL
+        """
+    )
+
+
+def _share_system_info(connection):
+    add_missing_columns(connection, SystemInfoModel, ["content_hash"])
+    add_missing_columns(connection, TraceModel, ["system_info_hash"])
+    rows = connection.exec_driver_sql(
+        """
+        SELECT id, trace_id, os_name, os_version, python_version, cpu_info,
+               gpu_info, disk_info, memory_total, installed_packages
+        FROM system_info WHERE content_hash IS NULL ORDER BY id
+        """
+    ).fetchall()
+    kept = {}
+    for row in rows:
+        content_hash = SystemInfoModel.hash_content(*row[2:])
+        connection.exec_driver_sql(
+            "UPDATE traces SET system_info_hash = ? WHERE id = ?",
+            (content_hash, row.trace_id),
+        )
+        if content_hash in kept:
+            connection.exec_driver_sql(
+                "DELETE FROM system_info WHERE id = ?", (row.id,)
+            )
+        else:
+            kept[content_hash] = row.id
+            connection.exec_driver_sql(
+                "UPDATE system_info SET content_hash = ? WHERE id = ?",
+                (content_hash, row.id),
+            )
+
+
+def _add_stream_latency(connection):
+    add_missing_columns(
+        connection,
+        LLMCallModel,
+        ["time_to_first_token", "inter_token_latency", "chunk_count"],
+    )
+
+
+# Text columns that older versions filled with str() of the value
+_PAYLOAD_COLUMNS = {
+    "llm_call": ("input_prompt", "output", "tool_call"),
+    "tool_call": ("input_parameters", "output"),
+}
+# Rows rewritten per transaction
+_PAYLOAD_BATCH_SIZE = 500
+
+
+def _legacy_payload(text):
+    # What readers used to recover from a str()-ed or JSON payload
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    if text[:1] in ("[", "{", "("):
+        try:
+            return ast.literal_eval(text)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            pass
+    return text
+
+
+def _canonical_payloads(connection):
+    for table, columns in _PAYLOAD_COLUMNS.items():
+        column_list = ", ".join(columns)
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        last_id = -1
+        while True:
+            rows = connection.exec_driver_sql(
+                f"SELECT id, {column_list} FROM {table} "
+                f"WHERE id > ? ORDER BY id LIMIT {_PAYLOAD_BATCH_SIZE}",
+                (last_id,),
+            ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                values = tuple(
+                    dumps(_legacy_payload(text)) if text is not None else None
+                    for text in row[1:]
+                )
+                if values != tuple(row[1:]):
+                    updates.append(values + (row[0],))
+            if updates:
+                connection.exec_driver_sql(
+                    f"UPDATE {table} SET {assignments} WHERE id = ?", updates
+                )
+            connection.commit()
+            last_id = rows[-1][0]
+
+
+def _add_message_refs(connection):
+    add_missing_columns(connection, LLMCallModel, ["input_message_refs"])
+
+
+def _add_trace_versions(connection):
+    existing = {c["name"] for c in inspect(connection).get_columns("traces")}
+    if "version" not in existing:
+        # NOT NULL needs the default, which add_missing_columns doesn't add
+        connection.exec_driver_sql(
+            'ALTER TABLE "traces" ADD COLUMN "version" INTEGER NOT NULL DEFAULT 0'
+        )
+
+
+# Traces summarised or rolled up per transaction
+_SUMMARY_BATCH_SIZE = 500
+
+
+def _summarize_span_usage(connection):
+    # The summaries count LLM errors against the model they requested
+    add_missing_columns(connection, ErrorModel, ["model"])
+    trace_ids = connection.exec_driver_sql(
+        "SELECT id FROM traces WHERE end_time IS NOT NULL "
+        "AND id NOT IN (SELECT trace_id FROM span_usage) ORDER BY id"
+    ).scalars().all()
+    for start in range(0, len(trace_ids), _SUMMARY_BATCH_SIZE):
+        summarize_traces(connection, trace_ids[start : start + _SUMMARY_BATCH_SIZE])
+        connection.commit()
+
+
+def _roll_up_spans(connection):
+    existing = {c["name"] for c in inspect(connection).get_columns("traces")}
+    if "rolled_up" not in existing:
+        # Nothing was rolled up before, so every flag starts unset
+        connection.exec_driver_sql(
+            'ALTER TABLE "traces" ADD COLUMN "rolled_up" BOOLEAN NOT NULL DEFAULT 0'
+        )
+    trace_ids = connection.exec_driver_sql(
+        "SELECT id FROM traces WHERE end_time IS NOT NULL AND NOT rolled_up "
+        "ORDER BY id"
+    ).scalars().all()
+    for start in range(0, len(trace_ids), _SUMMARY_BATCH_SIZE):
+        roll_up_traces(connection, trace_ids[start : start + _SUMMARY_BATCH_SIZE])
+        connection.commit()
+
+
+# (schema version, upgrade step). Version 1 introduced the secondary
+# indexes, which are (re)created after every upgrade so that indexes on
+# columns added by later steps can be built as well.
+MIGRATIONS = [
+    (2, _add_trace_rollups),
+    (3, _share_system_info),
+    (4, _add_stream_latency),
+    (5, _canonical_payloads),
+    (6, _add_message_refs),
+    (7, _add_trace_versions),
+    (8, _summarize_span_usage),
+    (9, _roll_up_spans),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def add_missing_columns(connection, model, column_names):
+    """Add columns of ``model`` that an older table does not have yet."""
+    table = model.__table__
+    existing = {c["name"] for c in inspect(connection).get_columns(table.name)}
+    for name in column_names:
+        if name in existing:
+            continue
+        column = table.columns[name]
+        column_type = column.type.compile(dialect=connection.dialect)
+        connection.exec_driver_sql(
+            f'ALTER TABLE "{table.name}" ADD COLUMN "{name}" {column_type}'
+        )
+
+
+def migrate(engine):
+    """Apply all pending migrations to the database behind ``engine``."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    with engine.connect() as connection:
+        version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+        if version >= SCHEMA_VERSION:
+            return
+        for target, migration in MIGRATIONS:
+            if version < target:
+                logger.debug(f"Migrating AgentNeo database to schema version {target}")
+                migration(connection)
+        _create_missing_indexes(connection)
+        connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        connection.commit()
@@ -0,0 +1,147 @@
+"""Retention of raw spans.
+
+:func:`prune_raw_spans` deletes the spans (LLM, tool and agent calls, user
+interactions and errors) of the finished traces that started more than a
+given number of days ago. The traces themselves are kept with their
+totals, as are their per-trace usage summaries and the time-bucketed
+rollups, so project lists, analytics and historical views are unchanged;
+only the span detail of old traces goes. Blobs and prompt messages that
+no remaining span refers to are deleted along with them. Traces that were
+not rolled up (those that never ended) are left alone.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import delete, exists, func, or_, select, true, union_all
+from sqlalchemy.orm import Session
+
+from .blob_store import BLOB_MARKER, BLOB_MARKER_PREFIX
+from .data_models import (
+    AgentCallModel,
+    BlobModel,
+    ErrorModel,
+    LLMCallModel,
+    MessageModel,
+    ToolCallModel,
+    TraceModel,
+    UserInteractionModel,
+)
+from .trace_versions import bump_trace_versions
+
+logger = logging.getLogger(__name__)
+
+# Deleted in this order, children before the spans they refer to
+SPAN_MODELS = (
+    ErrorModel,
+    UserInteractionModel,
+    LLMCallModel,
+    ToolCallModel,
+    AgentCallModel,
+)
+
+# Columns that may hold a blob marker, see agentneo.data.blob_store
+BLOB_COLUMNS = (
+    LLMCallModel.input_prompt,
+    LLMCallModel.output,
+    LLMCallModel.tool_call,
+    ToolCallModel.input_parameters,
+    ToolCallModel.output,
+    MessageModel.content,
+)
+
+# Traces whose spans are deleted per transaction, so that tracers writing
+# meanwhile are not held up for long
+PRUNE_BATCH_SIZE = 100
+
+
+def _prunable_traces(session, cutoff):
+    has_spans = or_(
+        *(exists().where(model.trace_id == TraceModel.id) for model in SPAN_MODELS)
+    )
+    return session.scalars(
+        select(TraceModel.id)
+        .where(
+            TraceModel.rolled_up.is_(True),
+            TraceModel.start_time < cutoff,
+            has_spans,
+        )
+        .order_by(TraceModel.id)
+    ).all()
+
+
+def _blob_refs():
+    prefix = BLOB_MARKER_PREFIX
+    return union_all(
+        *(
+            select(func.json_extract(column, f"$.{BLOB_MARKER}")).where(
+                func.substr(column, 1, len(prefix)) == prefix
+            )
+            for column in BLOB_COLUMNS
+        )
+    )
+
+
+def _message_refs():
+    refs = func.json_each(LLMCallModel.input_message_refs).table_valued("value")
+    return (
+        select(refs.c.value)
+        .select_from(LLMCallModel)
+        .join(refs, true())
+        .where(LLMCallModel.input_message_refs.isnot(None))
+    )
+
+
+def prune_raw_spans(engine, retention_days: float, now: datetime = None) -> Dict:
+    """Delete the spans of finished traces that started more than
+    ``retention_days`` ago, and the blobs and messages left unreferenced.
+
+    Returns the number of rows deleted, by table name.
+    """
+    cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+    deleted = {model.__tablename__: 0 for model in SPAN_MODELS}
+    deleted.update({BlobModel.__tablename__: 0, MessageModel.__tablename__: 0})
+
+    with Session(engine) as session:
+        trace_ids = _prunable_traces(session, cutoff)
+    for start in range(0, len(trace_ids), PRUNE_BATCH_SIZE):
+        batch = trace_ids[start : start + PRUNE_BATCH_SIZE]
+        with Session(engine) as session:
+            for model in SPAN_MODELS:
+                result = session.execute(
+                    delete(model)
+                    .where(model.trace_id.in_(batch))
+                    .execution_options(synchronize_session=False)
+                )
+                deleted[model.__tablename__] += result.rowcount
+            bump_trace_versions(session, batch)
+            session.commit()
+
+    if trace_ids:
+        # Content stored since the cutoff may be referenced by spans still
+        # being recorded, and is kept.
+        # Messages first, as oversized ones refer to blobs.
+        with Session(engine) as session:
+            result = session.execute(
+                delete(MessageModel)
+                .where(
+                    MessageModel.created_at < cutoff,
+                    MessageModel.hash.not_in(_message_refs()),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            deleted[MessageModel.__tablename__] = result.rowcount
+            result = session.execute(
+                delete(BlobModel)
+                .where(
+                    BlobModel.created_at < cutoff,
+                    BlobModel.hash.not_in(_blob_refs()),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            deleted[BlobModel.__tablename__] = result.rowcount
+            session.commit()
+
+    logger.info(f"Pruned the spans of {len(trace_ids)} traces: {deleted}")
+    return deleted
@@ -0,0 +1,120 @@
+"""Time-bucketed rollups of spans, kept after the spans themselves.
+
+When a trace stops, its LLM, tool and agent calls (and the errors of calls
+that raised) are added into ``span_rollups`` rows per minute, hour and day
+of their start, by project, span type and model, tool or agent name: call
+and error counts, duration, cost and token sums and a duration histogram
+(see :mod:`agentneo.data.latency_sketch`). Historical views read these
+rows instead of the span tables, so that the spans of old traces can be
+pruned (see :mod:`agentneo.data.retention`). The traces rolled up are
+flagged ``rolled_up``, and rolling one up again adds nothing.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import insert, select, update
+
+from . import latency_sketch
+from .data_models import SpanRollupModel, TraceModel
+from .span_usage import add_usage, empty_usage, usage_records
+
+GRANULARITIES = ("minute", "hour", "day")
+
+_USAGE_COLUMNS = tuple(empty_usage())
+
+
+def bucket_start(time: datetime, granularity: str) -> datetime:
+    """Start of the ``granularity`` bucket that ``time`` falls in."""
+    if granularity == "minute":
+        return time.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return time.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return time.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown granularity {granularity!r}")
+
+
+def _merge_usage(usage, other):
+    for column in _USAGE_COLUMNS:
+        if column == "durations":
+            usage[column] = latency_sketch.merge([usage[column], other[column]])
+        else:
+            usage[column] += other[column]
+
+
+def roll_up_traces(connection, trace_ids: Iterable[int]):
+    """Add the spans of ``trace_ids`` to the rollups, once the traces have
+    ended. Traces already rolled up are skipped. ``connection`` is a
+    Connection or a Session."""
+    trace_ids = list(trace_ids)
+    if not trace_ids:
+        return
+    trace_ids = connection.execute(
+        select(TraceModel.id).where(
+            TraceModel.id.in_(trace_ids), TraceModel.rolled_up.is_(False)
+        )
+    ).scalars().all()
+    if not trace_ids:
+        return
+    connection.execute(
+        update(TraceModel).where(TraceModel.id.in_(trace_ids)).values(rolled_up=True)
+    )
+
+    increments = defaultdict(empty_usage)
+    for record in usage_records(connection, trace_ids):
+        if record.time is None:
+            continue
+        for granularity in GRANULARITIES:
+            key = (
+                record.project_id,
+                granularity,
+                bucket_start(record.time, granularity),
+                record.span_type,
+                record.name,
+            )
+            add_usage(increments[key], record)
+    if not increments:
+        return
+
+    # Rows of the buckets touched, to add to
+    buckets = defaultdict(set)
+    for project_id, granularity, start, _, _ in increments:
+        buckets[project_id, granularity].add(start)
+    table = SpanRollupModel.__table__
+    for (project_id, granularity), starts in buckets.items():
+        rows = connection.execute(
+            select(table).where(
+                table.c.project_id == project_id,
+                table.c.granularity == granularity,
+                table.c.bucket_start.in_(starts),
+            )
+        ).all()
+        for row in rows:
+            key = (project_id, granularity, row.bucket_start, row.span_type, row.name)
+            usage = increments.pop(key, None)
+            if usage is None:
+                continue
+            _merge_usage(usage, row._mapping)
+            connection.execute(
+                update(table).where(table.c.id == row.id).values(**usage)
+            )
+
+    if increments:
+        connection.execute(
+            insert(table),
+            [
+                {
+                    "project_id": project_id,
+                    "granularity": granularity,
+                    "bucket_start": start,
+                    "span_type": span_type,
+                    "name": name,
+                    **usage,
+                }
+                for (project_id, granularity, start, span_type, name), usage in (
+                    increments.items()
+                )
+            ],
+        )
@@ -0,0 +1,212 @@
+"""Per-trace usage summaries, the pre-aggregated input of project analytics.
+
+When a trace stops, its LLM calls are summarised per model and its tool
+calls per tool name into ``span_usage`` rows: call and error counts,
+duration, cost and token sums and a duration histogram (see
+:mod:`agentneo.data.latency_sketch`). Analytics over a project then add
+up a few rows per trace instead of scanning every span. Running traces
+have no summary yet, like the trace rollups. The time-bucketed rollups
+(:mod:`agentneo.data.rollups`) count the same records, from
+:func:`usage_records`.
+
+Calls that raise are recorded as errors only, with the tracer's
+``"<name>: <message>"`` error message; they are counted as errors of
+their tool or agent, and of the model they requested for LLM calls (an
+unknown (None) model for errors recorded before the model was).
+"""
+
+import json
+from datetime import datetime
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from sqlalchemy import delete, insert, select
+
+from . import latency_sketch
+from .data_models import (
+    AgentCallModel,
+    ErrorModel,
+    LLMCallModel,
+    SpanUsageModel,
+    ToolCallModel,
+)
+
+SPAN_TYPES = ("llm", "tool")
+
+# Span types read by usage_records
+USAGE_TYPES = ("llm", "tool", "agent")
+
+
+class UsageRecord(NamedTuple):
+    """One span, or one error of a call, as counted in usage aggregates."""
+
+    project_id: int
+    trace_id: int
+    span_type: str  # 'llm', 'tool' or 'agent'
+    name: Optional[str]  # model, tool or agent name
+    time: Optional[datetime]
+    duration: Optional[float] = None
+    cost: float = 0.0
+    tokens: int = 0
+    error: bool = False
+
+
+def _json_total(value):
+    # token_usage and cost hold a JSON object, or the object's JSON text
+    if isinstance(value, str):
+        value = json.loads(value)
+    return sum(
+        item for item in (value or {}).values() if isinstance(item, (int, float))
+    )
+
+
+def _error_name(error_type, error_message, model):
+    if error_type == "llm":
+        return model
+    if ": " in error_message:
+        return error_message.split(": ", 1)[0]
+    return None
+
+
+def usage_records(
+    connection, trace_ids: Iterable[int], span_types=USAGE_TYPES
+) -> Iterator[UsageRecord]:
+    """The spans and call errors of ``trace_ids`` of the given types.
+    ``connection`` is a Connection or a Session."""
+    trace_ids = list(trace_ids)
+    if "llm" in span_types:
+        llm_calls = connection.execute(
+            select(
+                LLMCallModel.project_id,
+                LLMCallModel.trace_id,
+                LLMCallModel.model,
+                LLMCallModel.start_time,
+                LLMCallModel.duration,
+                LLMCallModel.cost,
+                LLMCallModel.token_usage,
+            ).where(LLMCallModel.trace_id.in_(trace_ids))
+        )
+        for call in llm_calls:
+            yield UsageRecord(
+                call.project_id,
+                call.trace_id,
+                "llm",
+                call.model,
+                call.start_time,
+                call.duration,
+                _json_total(call.cost),
+                int(_json_total(call.token_usage)),
+            )
+
+    if "tool" in span_types:
+        tool_calls = connection.execute(
+            select(
+                ToolCallModel.project_id,
+                ToolCallModel.trace_id,
+                ToolCallModel.name,
+                ToolCallModel.start_time,
+                ToolCallModel.duration,
+            ).where(ToolCallModel.trace_id.in_(trace_ids))
+        )
+        for call in tool_calls:
+            yield UsageRecord(
+                call.project_id,
+                call.trace_id,
+                "tool",
+                call.name,
+                call.start_time,
+                call.duration,
+            )
+
+    if "agent" in span_types:
+        agent_calls = connection.execute(
+            select(
+                AgentCallModel.project_id,
+                AgentCallModel.trace_id,
+                AgentCallModel.name,
+                AgentCallModel.start_time,
+                AgentCallModel.end_time,
+            ).where(AgentCallModel.trace_id.in_(trace_ids))
+        )
+        for call in agent_calls:
+            ended = call.start_time is not None and call.end_time is not None
+            yield UsageRecord(
+                call.project_id,
+                call.trace_id,
+                "agent",
+                call.name,
+                call.start_time,
+                (call.end_time - call.start_time).total_seconds() if ended else None,
+            )
+
+    errors = connection.execute(
+        select(
+            ErrorModel.project_id,
+            ErrorModel.trace_id,
+            ErrorModel.error_type,
+            ErrorModel.error_message,
+            ErrorModel.model,
+            ErrorModel.timestamp,
+        ).where(
+            ErrorModel.trace_id.in_(trace_ids), ErrorModel.error_type.in_(span_types)
+        )
+    )
+    for error in errors:
+        yield UsageRecord(
+            error.project_id,
+            error.trace_id,
+            error.error_type,
+            _error_name(error.error_type, error.error_message, error.model),
+            error.timestamp,
+            error=True,
+        )
+
+
+def empty_usage():
+    """Column values of a usage aggregate that counts nothing yet."""
+    return {
+        "call_count": 0,
+        "error_count": 0,
+        "total_duration": 0.0,
+        "total_cost": 0.0,
+        "total_tokens": 0,
+        "durations": {},
+    }
+
+
+def add_usage(usage, record: UsageRecord):
+    """Count ``record`` in the aggregate column values ``usage``."""
+    if record.error:
+        usage["error_count"] += 1
+        return
+    usage["call_count"] += 1
+    usage["total_duration"] += record.duration or 0.0
+    usage["total_cost"] += record.cost
+    usage["total_tokens"] += record.tokens
+    latency_sketch.add(usage["durations"], record.duration)
+
+
+def summarize_traces(connection, trace_ids: Iterable[int]):
+    """(Re)write the ``span_usage`` rows of ``trace_ids`` from their spans
+    and errors. ``connection`` is a Connection or a Session."""
+    trace_ids = list(trace_ids)
+    if not trace_ids:
+        return
+
+    usage = {}
+    for record in usage_records(connection, trace_ids, SPAN_TYPES):
+        key = (record.trace_id, record.span_type, record.name)
+        if key not in usage:
+            usage[key] = {
+                "project_id": record.project_id,
+                "trace_id": record.trace_id,
+                "span_type": record.span_type,
+                "name": record.name,
+                **empty_usage(),
+            }
+        add_usage(usage[key], record)
+
+    connection.execute(
+        delete(SpanUsageModel).where(SpanUsageModel.trace_id.in_(trace_ids))
+    )
+    if usage:
+        connection.execute(insert(SpanUsageModel), list(usage.values()))
@@ -0,0 +1,531 @@
+"""Set-based loading of whole traces into typed records.
+
+A trace and all of its spans are loaded with one query per table (selectin
+eager loading), however many traces are requested, and every row becomes a
+plain dataclass record that stays usable after the session is closed.
+
+JSON held in the rows is decoded once, while the records are built. The
+decoder of each field is chosen by its column: ``JSON`` columns and the text
+columns holding serialized payloads (prompts, tool inputs and outputs, see
+:mod:`agentneo.utils.serialization`) are decoded, all other columns are
+passed through untouched. Payloads moved to the blob store are fetched
+for all requested traces in one query, unless ``resolve_blobs`` is off, and
+so are the messages of prompts stored by reference.
+
+The LLM and tool calls of a large trace can be read a page at a time
+instead, with :meth:`TraceLoader.iter_spans`, so that only one page of
+them is held in memory, or grouped by a column such as ``agent_id`` with
+:meth:`TraceLoader.iter_span_groups`.
+"""
+
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import JSON, select
+from sqlalchemy.orm import selectinload
+
+from ..utils.serialization import loads
+from .blob_store import BLOB_MARKER, BLOB_MARKER_PREFIX, blob_ref, load_blobs
+from .message_store import join_messages, load_messages
+from .data_models import (
+    AgentCallModel,
+    ErrorModel,
+    LLMCallModel,
+    MetricModel,
+    SystemInfoModel,
+    ToolCallModel,
+    TraceModel,
+    UserInteractionModel,
+)
+
+# Spans read per query by TraceLoader.iter_spans
+SPAN_PAGE_SIZE = 200
+
+# Text columns holding payloads written by agentneo.utils.serialization.dumps
+PAYLOAD_COLUMNS = {
+    "input_prompt",
+    "output",
+    "tool_call",
+    "input_parameters",
+    "disk_info",
+    "installed_packages",
+}
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+@dataclass
+class SystemInfoRecord:
+    os_name: str
+    os_version: str
+    python_version: str
+    cpu_info: str
+    gpu_info: Optional[str]
+    disk_info: Any
+    memory_total: float
+    installed_packages: Any
+
+
+@dataclass
+class AgentCallRecord:
+    id: int
+    name: str
+    start_time: Optional[datetime]
+    end_time: Optional[datetime]
+    llm_call_ids: Any
+    tool_call_ids: Any
+    user_interaction_ids: Any
+
+
+@dataclass
+class LLMCallRecord:
+    id: int
+    agent_id: Optional[int]
+    name: str
+    model: Optional[str]
+    input_prompt: Any
+    output: Any
+    tool_call: Any
+    start_time: Optional[datetime]
+    end_time: Optional[datetime]
+    duration: Optional[float]
+    token_usage: Any
+    cost: Any
+    memory_used: int
+    time_to_first_token: Optional[float]
+    inter_token_latency: Optional[float]
+    chunk_count: Optional[int]
+    # Hashes of the prompt's messages if they are stored by reference
+    input_message_refs: Optional[List[str]]
+
+
+@dataclass
+class ToolCallRecord:
+    id: int
+    agent_id: Optional[int]
+    name: str
+    input_parameters: Any
+    output: Any
+    start_time: Optional[datetime]
+    end_time: Optional[datetime]
+    duration: Optional[float]
+    memory_used: int
+    network_calls: Any
+
+
+@dataclass
+class ErrorRecord:
+    id: int
+    agent_id: Optional[int]
+    tool_call_id: Optional[int]
+    llm_call_id: Optional[int]
+    error_type: str
+    error_message: str
+    timestamp: Optional[datetime]
+
+
+@dataclass
+class UserInteractionRecord:
+    id: int
+    agent_id: Optional[int]
+    interaction_type: str
+    content: str
+    timestamp: Optional[datetime]
+
+
+@dataclass
+class MetricRecord:
+    id: int
+    metric_name: str
+    score: Optional[float]
+    reason: Optional[str]
+    result_detail: Any
+    config: Any
+    start_time: Optional[datetime]
+    end_time: Optional[datetime]
+    duration: Optional[float]
+    timestamp: Optional[datetime]
+
+
+@dataclass
+class TraceRecord:
+    id: int
+    project_id: int
+    project_name: Optional[str]
+    start_time: Optional[datetime]
+    end_time: Optional[datetime]
+    duration: Optional[float]
+    system_info: Optional[SystemInfoRecord]
+    agent_calls: List[AgentCallRecord] = field(default_factory=list)
+    llm_calls: List[LLMCallRecord] = field(default_factory=list)
+    tool_calls: List[ToolCallRecord] = field(default_factory=list)
+    errors: List[ErrorRecord] = field(default_factory=list)
+    user_interactions: List[UserInteractionRecord] = field(default_factory=list)
+    # Only loaded on request, see TraceLoader
+    metrics: List[MetricRecord] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The trace as the JSON document the evaluation metrics consume."""
+        system_info = self.system_info
+        return {
+            "id": self.id,
+            "project_id": self.project_id,
+            "start_time": _isoformat(self.start_time),
+            "end_time": _isoformat(self.end_time),
+            "duration": self.duration,
+            "project": self.project_name,
+            "system_info": {
+                "os_name": system_info.os_name,
+                "os_version": system_info.os_version,
+                "python_version": system_info.python_version,
+                "cpu_info": system_info.cpu_info,
+                "gpu_info": system_info.gpu_info,
+                "disk_info": system_info.disk_info,
+                "memory_total": system_info.memory_total,
+                "installed_packages": system_info.installed_packages,
+            }
+            if system_info
+            else None,
+            "agent_calls": [
+                {
+                    "id": call.id,
+                    "name": call.name,
+                    "start_time": _isoformat(call.start_time),
+                    "end_time": _isoformat(call.end_time),
+                    "llm_call_ids": call.llm_call_ids,
+                    "tool_call_ids": call.tool_call_ids,
+                    "user_interaction_ids": call.user_interaction_ids,
+                }
+                for call in self.agent_calls
+            ],
+            "llm_calls": [
+                {
+                    "id": call.id,
+                    "name": call.name,
+                    "model": call.model,
+                    "input_prompt": call.input_prompt,
+                    "output": call.output,
+                    "tool_call": call.tool_call,
+                    "start_time": _isoformat(call.start_time),
+                    "end_time": _isoformat(call.end_time),
+                    "duration": call.duration,
+                    "token_usage": call.token_usage,
+                    "cost": call.cost,
+                    "memory_used": call.memory_used,
+                }
+                for call in self.llm_calls
+            ],
+            "tool_calls": [
+                {
+                    "id": call.id,
+                    "name": call.name,
+                    "input_parameters": call.input_parameters,
+                    "output": call.output,
+                    "start_time": _isoformat(call.start_time),
+                    "end_time": _isoformat(call.end_time),
+                    "duration": call.duration,
+                    "memory_used": call.memory_used,
+                    "network_calls": call.network_calls,
+                }
+                for call in self.tool_calls
+            ],
+            "errors": [
+                {
+                    "id": error.id,
+                    "error_type": error.error_type,
+                    "error_message": error.error_message,
+                    "timestamp": _isoformat(error.timestamp),
+                }
+                for error in self.errors
+            ],
+            "user_interactions": [
+                {
+                    "id": interaction.id,
+                    "interaction_type": interaction.interaction_type,
+                    "content": interaction.content,
+                    "timestamp": _isoformat(interaction.timestamp),
+                }
+                for interaction in self.user_interactions
+            ],
+        }
+
+
+_SPAN_RECORDS = {
+    AgentCallModel: AgentCallRecord,
+    LLMCallModel: LLMCallRecord,
+    ToolCallModel: ToolCallRecord,
+    ErrorModel: ErrorRecord,
+    UserInteractionModel: UserInteractionRecord,
+}
+
+# (record class, model) -> [(field name, decoder or None)]
+_field_decoders = {}
+
+
+def _decoders(record_cls, model):
+    key = (record_cls, model)
+    decoders = _field_decoders.get(key)
+    if decoders is None:
+        columns = model.__table__.columns
+        decoders = []
+        for f in fields(record_cls):
+            column = columns[f.name]
+            if isinstance(column.type, JSON):
+                decoder = loads
+            elif f.name in PAYLOAD_COLUMNS:
+                decoder = loads
+            else:
+                decoder = None
+            decoders.append((f.name, decoder))
+        _field_decoders[key] = decoders
+    return decoders
+
+
+def _record(record_cls, model, row, decode):
+    values = {}
+    for name, decoder in _decoders(record_cls, model):
+        value = getattr(row, name)
+        values[name] = decoder(value) if decode and decoder else value
+    return record_cls(**values)
+
+
+class TraceLoader:
+    """Loads traces and their spans from ``session`` as TraceRecords.
+
+    Args:
+        session: SQLAlchemy session of the AgentNeo database.
+        decode: Decode JSON held in the rows; with False the records hold
+            the column values as stored.
+        metrics: Also load the evaluation results of each trace.
+        resolve_blobs: Replace the markers of payloads in the blob store
+            with the payloads; only applies when decoding.
+        calls: Also load the LLM and tool calls of each trace; without,
+            ``llm_calls`` and ``tool_calls`` are left empty, to be read
+            with :meth:`iter_spans`.
+    """
+
+    def __init__(
+        self,
+        session,
+        decode: bool = True,
+        metrics: bool = False,
+        resolve_blobs: bool = True,
+        calls: bool = True,
+    ):
+        self.session = session
+        self.decode = decode
+        self.metrics = metrics
+        self.resolve_blobs = resolve_blobs
+        self.calls = calls
+
+    def load(self, trace_id: int) -> Optional[TraceRecord]:
+        records = self.load_many([trace_id])
+        return records[0] if records else None
+
+    def load_many(self, trace_ids) -> List[TraceRecord]:
+        """Records of the given traces, in that order; unknown ids are
+        left out."""
+        trace_ids = list(trace_ids)
+        if not trace_ids:
+            return []
+        options = [
+            selectinload(TraceModel.project),
+            selectinload(TraceModel.system_info),
+            selectinload(TraceModel.agent_calls),
+            selectinload(TraceModel.errors),
+            selectinload(TraceModel.user_interactions),
+        ]
+        if self.calls:
+            options.append(selectinload(TraceModel.llm_calls))
+            options.append(selectinload(TraceModel.tool_calls))
+        if self.metrics:
+            options.append(selectinload(TraceModel.metrics))
+        query = select(TraceModel).where(TraceModel.id.in_(trace_ids)).options(*options)
+        traces = {trace.id: trace for trace in self.session.scalars(query)}
+        records = [
+            self.to_record(traces[trace_id])
+            for trace_id in trace_ids
+            if trace_id in traces
+        ]
+        self._resolve(records)
+        return records
+
+    def from_model(self, trace: TraceModel) -> TraceRecord:
+        """Record of an already loaded TraceModel, with prompts and
+        payloads resolved as by :meth:`load`."""
+        record = self.to_record(trace)
+        self._resolve([record])
+        return record
+
+    def _resolve(self, records):
+        self._rehydrate_prompts(
+            [call for trace in records for call in trace.llm_calls]
+        )
+        if self.decode and self.resolve_blobs:
+            self._resolve_blobs(
+                [
+                    span
+                    for trace in records
+                    for span in (*trace.llm_calls, *trace.tool_calls)
+                ]
+            )
+
+    def load_span(self, model, span_id: int):
+        """Record of a single span, e.g. ``load_span(LLMCallModel, 3)``, or
+        None if there is no such span."""
+        records = self.load_spans(model, [span_id])
+        return records[0] if records else None
+
+    def load_spans(self, model, span_ids) -> list:
+        """Records of the rows ``span_ids`` of ``model``, ordered by id;
+        unknown ids are left out."""
+        span_ids = list(span_ids)
+        if not span_ids:
+            return []
+        rows = self.session.scalars(
+            select(model).where(model.id.in_(span_ids)).order_by(model.id)
+        )
+        record_cls = _SPAN_RECORDS[model]
+        records = [_record(record_cls, model, row, self.decode) for row in rows]
+        if model is LLMCallModel:
+            self._rehydrate_prompts(records)
+        if self.decode and self.resolve_blobs:
+            self._resolve_blobs(records)
+        return records
+
+    def iter_spans(
+        self, model, trace_id: int, page_size: int = SPAN_PAGE_SIZE, **filters
+    ):
+        """Records of the spans of ``model`` in trace ``trace_id``, by start
+        time, read ``page_size`` at a time. ``filters`` select spans by
+        column value, e.g. ``agent_id=None``.
+
+        The session is used while the records are iterated.
+        """
+        span_ids = self.session.scalars(
+            select(model.id)
+            .where(
+                model.trace_id == trace_id,
+                *(getattr(model, name) == value for name, value in filters.items()),
+            )
+            .order_by(model.start_time, model.id)
+        ).all()
+        pages = self._iter_pages(model, [(None, i) for i in span_ids], page_size)
+        for _, record in pages:
+            yield record
+
+    def iter_span_groups(
+        self, model, trace_id: int, column: str, keys, page_size: int = SPAN_PAGE_SIZE
+    ):
+        """``(key, record)`` pairs of the spans of ``model`` in trace
+        ``trace_id`` whose ``column`` is one of ``keys``: in the order of
+        ``keys``, then by start time. Pages run across groups, so that the
+        spans are read in one id query and one query per page however many
+        groups there are.
+
+        The session is used while the pairs are iterated.
+        """
+        by_key = {key: [] for key in keys}
+        rows = self.session.execute(
+            select(getattr(model, column), model.id)
+            .where(model.trace_id == trace_id)
+            .order_by(model.start_time, model.id)
+        )
+        for key, span_id in rows:
+            if key in by_key:
+                by_key[key].append(span_id)
+        ordered = [(key, i) for key, span_ids in by_key.items() for i in span_ids]
+        yield from self._iter_pages(model, ordered, page_size)
+
+    def _iter_pages(self, model, keyed_ids, page_size):
+        # (key, span id) pairs to (key, record), in order; spans deleted
+        # meanwhile are left out
+        for start in range(0, len(keyed_ids), page_size):
+            page = keyed_ids[start : start + page_size]
+            records = self.load_spans(model, [span_id for _, span_id in page])
+            records = {record.id: record for record in records}
+            for key, span_id in page:
+                if span_id in records:
+                    yield key, records[span_id]
+
+    def _rehydrate_prompts(self, calls):
+        calls = [call for call in calls if call.input_message_refs]
+        if not calls:
+            return
+        refs = (digest for call in calls for digest in call.input_message_refs)
+        messages = load_messages(self.session, refs)
+        if self.decode and self.resolve_blobs:
+            self._resolve_message_blobs(messages)
+        for call in calls:
+            texts = [messages.get(digest) for digest in call.input_message_refs]
+            if None in texts:
+                continue
+            prompt = join_messages(texts)
+            call.input_prompt = loads(prompt) if self.decode else prompt
+
+    def _resolve_message_blobs(self, messages):
+        # Oversized messages are stored as blob markers
+        markers = {
+            digest: loads(text)[BLOB_MARKER]
+            for digest, text in messages.items()
+            if text.startswith(BLOB_MARKER_PREFIX)
+        }
+        if not markers:
+            return
+        payloads = load_blobs(self.session, markers.values())
+        for digest, blob_hash in markers.items():
+            if blob_hash in payloads:
+                messages[digest] = payloads[blob_hash]
+
+    def _resolve_blobs(self, spans):
+        refs = []
+        for span in spans:
+            for name in PAYLOAD_COLUMNS:
+                digest = blob_ref(getattr(span, name, None))
+                if digest is not None:
+                    refs.append((span, name, digest))
+        if not refs:
+            return
+        payloads = load_blobs(self.session, (digest for _, _, digest in refs))
+        for span, name, digest in refs:
+            if digest in payloads:
+                setattr(span, name, loads(payloads[digest]))
+
+    def to_record(self, trace: TraceModel) -> TraceRecord:
+        """Build the record of an already loaded TraceModel, leaving
+        message-store prompts and blob markers as stored."""
+        decode = self.decode
+
+        def records(record_cls, model, rows):
+            return [_record(record_cls, model, row, decode) for row in rows]
+
+        return TraceRecord(
+            id=trace.id,
+            project_id=trace.project_id,
+            project_name=trace.project.project_name if trace.project else None,
+            start_time=trace.start_time,
+            end_time=trace.end_time,
+            duration=trace.duration,
+            system_info=_record(
+                SystemInfoRecord, SystemInfoModel, trace.system_info, decode
+            )
+            if trace.system_info
+            else None,
+            agent_calls=records(AgentCallRecord, AgentCallModel, trace.agent_calls),
+            llm_calls=records(LLMCallRecord, LLMCallModel, trace.llm_calls)
+            if self.calls
+            else [],
+            tool_calls=records(ToolCallRecord, ToolCallModel, trace.tool_calls)
+            if self.calls
+            else [],
+            errors=records(ErrorRecord, ErrorModel, trace.errors),
+            user_interactions=records(
+                UserInteractionRecord, UserInteractionModel, trace.user_interactions
+            ),
+            metrics=records(MetricRecord, MetricModel, trace.metrics)
+            if self.metrics
+            else [],
+        )
@@ -0,0 +1,47 @@
+"""Per-trace version counters.
+
+Every write to a trace (its spans, its rollups, its evaluation results)
+bumps the ``version`` of the trace in the same transaction, so readers
+that keep anything derived from a trace can tell whether it is still
+current by comparing versions, e.g. the dashboard's response cache.
+"""
+
+from typing import Iterable
+
+from sqlalchemy import select, update
+
+from .data_models import TraceModel
+
+
+def bump_trace_versions(session, trace_ids: Iterable[int]):
+    """Bump the version of each of ``trace_ids``; None ids are ignored."""
+    trace_ids = {trace_id for trace_id in trace_ids if trace_id is not None}
+    if trace_ids:
+        session.execute(
+            update(TraceModel)
+            .where(TraceModel.id.in_(trace_ids))
+            .values(version=TraceModel.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def bump_span_trace_versions(session, model, span_ids: Iterable[int]):
+    """Bump the version of the traces that the rows ``span_ids`` of
+    ``model`` belong to."""
+    span_ids = set(span_ids)
+    if span_ids:
+        session.execute(
+            update(TraceModel)
+            .where(
+                TraceModel.id.in_(
+                    select(model.trace_id).where(model.id.in_(span_ids))
+                )
+            )
+            .values(version=TraceModel.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def trace_version(session, trace_id: int):
+    """The current version of a trace, or None if there is no such trace."""
+    return session.scalar(select(TraceModel.version).where(TraceModel.id == trace_id))
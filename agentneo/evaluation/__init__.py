@@ -1 +1,3 @@
-from .evaluation import Evaluation
\ No newline at end of file
+from .evaluation import Evaluation
+from .batch import BatchEvaluation
+from .judge_cache import JudgeCache
@@ -0,0 +1,217 @@
+"""Evaluation of many traces in one run.
+
+Traces are selected with a single query, loaded a chunk at a time with one
+query per relationship, and their metrics run on a shared worker pool. The
+results of each chunk are inserted in bulk and committed together, so an
+interrupted run resumes where it stopped: metrics already stored for a
+trace are skipped.
+"""
+
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from ..data import MetricModel, ProjectInfoModel, TraceLoader, TraceModel, get_engine
+from ..data.trace_versions import bump_trace_versions
+from .evaluation import metric_row, timed_metric
+from .executor import JudgeExecutor, use_executor
+from .judge_cache import JudgeCache
+
+logger = logging.getLogger(__name__)
+
+# Trace ids bound per IN (...) query, well below SQLite's limit on the
+# number of parameters of a statement
+QUERY_CHUNK_SIZE = 500
+
+
+def _chunks(ids):
+    for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+        yield ids[start : start + QUERY_CHUNK_SIZE]
+
+
+class BatchEvaluation:
+    """Runs metrics over the traces of a project, a list of trace ids or a
+    time range.
+
+    Args:
+        session: AgentNeo session.
+        trace_ids: Traces to evaluate. All traces of the project if None.
+        project_name: Project whose traces are evaluated. Defaults to the
+            session's project unless ``trace_ids`` are given.
+        start_time, end_time: Only evaluate traces started in this range.
+        max_workers: Metrics computed at the same time.
+        chunk_size: Traces loaded, evaluated and committed together.
+        max_concurrency, requests_per_minute, max_retries, judge_cache:
+            Judge call limits and cache, as for :class:`Evaluation`.
+    """
+
+    def __init__(
+        self,
+        session,
+        trace_ids: Optional[Iterable[int]] = None,
+        project_name: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        max_workers: int = 4,
+        chunk_size: int = 50,
+        max_concurrency: int = 8,
+        requests_per_minute: Optional[float] = None,
+        max_retries: int = 3,
+        judge_cache=True,
+    ):
+        if project_name is None and trace_ids is None:
+            project_name = session.project_name
+        self.trace_ids = None if trace_ids is None else list(trace_ids)
+        self.project_name = project_name
+        self.start_time = start_time
+        self.end_time = end_time
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+
+        self.engine = get_engine(session.db_path)
+        if judge_cache is True:
+            judge_cache = JudgeCache(self.engine)
+        self.executor = JudgeExecutor(
+            max_concurrency=max_concurrency,
+            requests_per_minute=requests_per_minute,
+            max_retries=max_retries,
+            cache=judge_cache or None,
+        )
+
+    def select_trace_ids(self, session: Session) -> list:
+        query = select(TraceModel.id).order_by(TraceModel.id)
+        if self.project_name is not None:
+            query = query.join(ProjectInfoModel).where(
+                ProjectInfoModel.project_name == self.project_name
+            )
+        if self.start_time is not None:
+            query = query.where(TraceModel.start_time >= self.start_time)
+        if self.end_time is not None:
+            query = query.where(TraceModel.start_time < self.end_time)
+        if self.trace_ids is None:
+            return list(session.scalars(query))
+        trace_ids = set()
+        for chunk in _chunks(self.trace_ids):
+            chunk_query = query.where(TraceModel.id.in_(chunk))
+            trace_ids.update(session.scalars(chunk_query))
+        return sorted(trace_ids)
+
+    def evaluate(self, metric_list=[], config={}, metadata={}, resume=True):
+        """Evaluate the selected traces and store the results.
+
+        With ``resume``, metrics already stored for a trace are not run
+        again. Failed metrics are logged and left out, so a later run
+        retries them. Returns the number of metrics evaluated, skipped
+        and failed.
+        """
+        summary = {"evaluated": 0, "skipped": 0, "failed": 0}
+        with Session(self.engine) as session:
+            trace_ids = self.select_trace_ids(session)
+            done = self._stored_metrics(session, trace_ids) if resume else set()
+
+            pending = {}
+            for trace_id in trace_ids:
+                metrics = [m for m in metric_list if (trace_id, m) not in done]
+                summary["skipped"] += len(metric_list) - len(metrics)
+                if metrics:
+                    pending[trace_id] = metrics
+
+            trace_ids = list(pending)
+            try:
+                with use_executor(self.executor), ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="agentneo-batch",
+                ) as pool:
+                    for i in range(0, len(trace_ids), self.chunk_size):
+                        chunk = trace_ids[i : i + self.chunk_size]
+                        traces = self._load_traces(session, chunk)
+                        rows = self._evaluate_chunk(
+                            pool, traces, pending, config, metadata, summary
+                        )
+                        if rows:
+                            session.execute(insert(MetricModel), rows)
+                            bump_trace_versions(
+                                session, {row["trace_id"] for row in rows}
+                            )
+                        session.commit()
+                        # The chunk's objects are no longer needed
+                        session.expunge_all()
+            finally:
+                self.executor.shutdown()
+        return summary
+
+    def get_results(self) -> dict:
+        """Stored metric results of the selected traces, by trace id."""
+        with Session(self.engine) as session:
+            trace_ids = self.select_trace_ids(session)
+            results = {trace_id: [] for trace_id in trace_ids}
+            query = select(MetricModel).order_by(MetricModel.trace_id, MetricModel.id)
+            for chunk in _chunks(trace_ids):
+                chunk_query = query.where(MetricModel.trace_id.in_(chunk))
+                for result in session.scalars(chunk_query):
+                    results[result.trace_id].append(
+                        {
+                            "metric_name": result.metric_name,
+                            "score": result.score,
+                            "reason": result.reason,
+                            "result_detail": result.result_detail,
+                            "config": result.config,
+                            "start_time": result.start_time.isoformat()
+                            if result.start_time
+                            else None,
+                            "end_time": result.end_time.isoformat()
+                            if result.end_time
+                            else None,
+                            "duration": result.duration,
+                        }
+                    )
+        return results
+
+    def _stored_metrics(self, session, trace_ids) -> set:
+        query = select(MetricModel.trace_id, MetricModel.metric_name)
+        stored = set()
+        for chunk in _chunks(trace_ids):
+            chunk_query = query.where(MetricModel.trace_id.in_(chunk))
+            stored.update(session.execute(chunk_query).tuples())
+        return stored
+
+    def _load_traces(self, session, trace_ids) -> list:
+        return [trace.to_dict() for trace in TraceLoader(session).load_many(trace_ids)]
+
+    def _evaluate_chunk(self, pool, traces, pending, config, metadata, summary):
+        futures = {
+            pool.submit(
+                contextvars.copy_context().run,
+                timed_metric,
+                metric,
+                trace,
+                config,
+                metadata,
+            ): (trace["id"], metric)
+            for trace in traces
+            for metric in pending[trace["id"]]
+        }
+        rows = []
+        for future in as_completed(futures):
+            trace_id, metric = futures[future]
+            try:
+                rows.append(metric_row(trace_id, metric, *future.result()))
+            except Exception as e:
+                summary["failed"] += 1
+                logger.error(f"Metric {metric} failed on trace {trace_id}: {e}")
+            else:
+                summary["evaluated"] += 1
+        # Stored in the order of metric_list, as by Evaluation
+        rows.sort(
+            key=lambda row: (
+                row["trace_id"],
+                pending[row["trace_id"]].index(row["metric_name"]),
+            )
+        )
+        return rows
+
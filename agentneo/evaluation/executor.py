@@ -0,0 +1,213 @@
+"""Concurrent, rate-limited execution of LLM judge calls.
+
+Metrics send their judge requests through :func:`complete` and fan out over
+independent items (tool calls, LLM calls) with :func:`judge_map`. Both go
+through the :class:`JudgeExecutor` that is active in the current context,
+which caps the number of requests in flight, spaces them out with a token
+bucket and retries transient failures with exponential backoff. An executor
+with a :class:`~agentneo.evaluation.judge_cache.JudgeCache` answers repeated
+requests from the cache.
+"""
+
+import contextvars
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from .judge_cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+# Exceptions raised by litellm (and the provider SDKs) for failures that
+# are worth retrying.
+RETRYABLE_ERRORS = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "InternalServerError",
+    "RateLimitError",
+    "ServiceUnavailableError",
+    "Timeout",
+}
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES:
+        return True
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing ``rate`` acquisitions per second,
+    with bursts of up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class JudgeExecutor:
+    """Runs judge completions concurrently within the configured limits.
+
+    Args:
+        max_concurrency: Maximum number of judge requests in flight.
+        requests_per_minute: Sustained request rate; unlimited if None.
+        max_retries: Retries of a request that failed with a transient
+            error (rate limit, timeout, server error).
+        backoff_base: Delay in seconds before the first retry; doubled on
+            each further retry, with jitter.
+        backoff_max: Upper bound of a single retry delay in seconds.
+        cache: Optional JudgeCache consulted before each request.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        requests_per_minute: float = None,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        cache=None,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache = cache
+        self._bucket = (
+            TokenBucket(requests_per_minute / 60.0) if requests_per_minute else None
+        )
+        self._in_flight = threading.BoundedSemaphore(max_concurrency)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+
+    def complete(self, **kwargs):
+        """``litellm.completion`` with caching, rate limiting and retries."""
+        if self.cache is None or kwargs.get("stream"):
+            return self._complete(**kwargs)
+        key = cache_key(**kwargs)
+        response = self.cache.get(key)
+        if response is None:
+            response = self._complete(**kwargs)
+            self.cache.put(key, response, model=kwargs.get("model"))
+        return response
+
+    def _complete(self, **kwargs):
+        import litellm
+
+        attempt = 0
+        while True:
+            if self._bucket is not None:
+                self._bucket.acquire()
+            try:
+                with self._in_flight:
+                    return litellm.completion(**kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+                delay = random.uniform(delay / 2, delay)
+                attempt += 1
+                logger.warning(
+                    f"Judge request failed ({e}), retry {attempt} of "
+                    f"{self.max_retries} in {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+    def map(self, fn, items):
+        """Return ``[fn(item) for item in items]``, computed concurrently.
+
+        Calls run with a copy of the caller's context. The first exception
+        raised by ``fn`` is re-raised once all calls have finished.
+        """
+        items = list(items)
+        if len(items) <= 1 or getattr(self._local, "in_pool", False):
+            # Nested fan-out runs inline so that workers never wait on
+            # work queued behind them.
+            return [fn(item) for item in items]
+        pool = self._get_pool()
+        futures = [
+            pool.submit(contextvars.copy_context().run, fn, item) for item in items
+        ]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix="agentneo-judge",
+                    initializer=self._mark_worker,
+                )
+            return self._pool
+
+    def _mark_worker(self):
+        self._local.in_pool = True
+
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+_current_executor = contextvars.ContextVar("agentneo_judge_executor", default=None)
+
+
+def get_executor() -> JudgeExecutor:
+    """The executor active in this context, or the shared default one."""
+    global _default_executor
+    executor = _current_executor.get()
+    if executor is not None:
+        return executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = JudgeExecutor()
+        return _default_executor
+
+
+@contextmanager
+def use_executor(executor: JudgeExecutor):
+    """Route the judge calls made within the block through ``executor``."""
+    token = _current_executor.set(executor)
+    try:
+        yield executor
+    finally:
+        _current_executor.reset(token)
+
+
+def complete(**kwargs):
+    """Send a judge completion request through the active executor."""
+    return get_executor().complete(**kwargs)
+
+
+def judge_map(fn, items):
+    """Apply ``fn`` to independent items concurrently, preserving order."""
+    return get_executor().map(fn, items)
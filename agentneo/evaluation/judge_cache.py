@@ -0,0 +1,228 @@
+"""Persistent, content-addressed cache of LLM judge responses.
+
+Judge requests are keyed by a hash of the model, the messages and every
+other parameter that affects the answer, so re-evaluating a trace (or
+running the test suite offline) replays the stored responses instead of
+calling the provider again. Entries expire after ``ttl`` seconds and the
+least recently used ones are evicted once the cache outgrows
+``max_entries`` or ``max_bytes`` of stored responses. An entry's last use
+is recorded at most once per ``TOUCH_INTERVAL``, so that hits seldom
+write to the database.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from ..data import JudgeCacheModel
+
+logger = logging.getLogger(__name__)
+
+# Request parameters that don't change the response
+IGNORED_PARAMS = {
+    "api_key",
+    "metadata",
+    "num_retries",
+    "request_timeout",
+    "timeout",
+}
+
+DEFAULT_TTL = 30 * 24 * 3600  # seconds
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+# Seconds within which a hit doesn't update the entry's last_used_at again
+TOUCH_INTERVAL = 60
+
+# Expired and surplus entries are pruned every this many insertions
+PRUNE_INTERVAL = 100
+
+
+def cache_key(**kwargs) -> str:
+    """sha256 of the canonical JSON of a completion request."""
+    request = {k: v for k, v in kwargs.items() if k not in IGNORED_PARAMS}
+    canonical = json.dumps(
+        request, sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _to_dict(response):
+    if isinstance(response, dict):
+        return response
+    for method in ("model_dump", "to_dict", "dict"):
+        if hasattr(response, method):
+            return getattr(response, method)()
+    return json.loads(json.dumps(response, default=lambda o: vars(o)))
+
+
+def _to_namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+def _from_dict(data):
+    import litellm
+
+    model_response = getattr(litellm, "ModelResponse", None)
+    if model_response is not None:
+        try:
+            return model_response(**data)
+        except Exception:
+            logger.debug("Cached judge response is not a ModelResponse")
+    # Attribute access, as on a litellm response
+    return _to_namespace(data)
+
+
+class JudgeCache:
+    """Judge responses stored in the ``judge_cache`` table of ``engine``.
+
+    Args:
+        engine: Engine of the AgentNeo database, or of a sidecar database.
+        ttl: Seconds an entry stays valid; entries never expire if None.
+        max_entries: Number of entries kept; unbounded if None.
+        max_bytes: Total size of the JSON responses kept; unbounded if None.
+
+    ``hits`` and ``misses`` count the lookups made through this instance.
+    """
+
+    def __init__(
+        self,
+        engine,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.engine = engine
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._inserts = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """The cached response for ``key``, or None."""
+        now = datetime.now()
+        data = None
+        with Session(self.engine) as session:
+            entry = session.get(JudgeCacheModel, key)
+            if entry is not None and not self._expired(entry, now):
+                data = entry.response
+                touched = entry.last_used_at
+                if touched is None or touched < now - timedelta(seconds=TOUCH_INTERVAL):
+                    session.execute(
+                        update(JudgeCacheModel)
+                        .where(JudgeCacheModel.key == key)
+                        .values(last_used_at=now)
+                    )
+                    session.commit()
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return _from_dict(data)
+
+    def put(self, key: str, response, model: str = None):
+        try:
+            data = _to_dict(response)
+            size = len(json.dumps(data, default=str))
+        except Exception as e:
+            logger.warning(f"Judge response could not be cached: {e}")
+            return
+        now = datetime.now()
+        with Session(self.engine) as session:
+            session.merge(
+                JudgeCacheModel(
+                    key=key,
+                    model=model,
+                    response=data,
+                    size=size,
+                    created_at=now,
+                    last_used_at=now,
+                )
+            )
+            session.commit()
+        with self._lock:
+            self._inserts += 1
+            prune = self._inserts % PRUNE_INTERVAL == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Drop expired entries and evict the least recently used ones
+        beyond ``max_entries`` or ``max_bytes``."""
+        with Session(self.engine) as session:
+            if self.ttl is not None:
+                cutoff = datetime.now() - timedelta(seconds=self.ttl)
+                session.execute(
+                    delete(JudgeCacheModel).where(JudgeCacheModel.created_at < cutoff)
+                )
+            if self.max_entries is not None:
+                count = session.scalar(select(func.count()).select_from(JudgeCacheModel))
+                surplus = count - self.max_entries
+                if surplus > 0:
+                    oldest = (
+                        select(JudgeCacheModel.key)
+                        .order_by(JudgeCacheModel.last_used_at)
+                        .limit(surplus)
+                    )
+                    session.execute(
+                        delete(JudgeCacheModel).where(JudgeCacheModel.key.in_(oldest))
+                    )
+            if self.max_bytes is not None:
+                total = session.scalar(
+                    select(func.coalesce(func.sum(JudgeCacheModel.size), 0))
+                )
+                if total > self.max_bytes:
+                    # Keep the most recently used entries that fit
+                    kept = func.sum(JudgeCacheModel.size).over(
+                        order_by=(
+                            JudgeCacheModel.last_used_at.desc(),
+                            JudgeCacheModel.key,
+                        )
+                    )
+                    ranked = select(JudgeCacheModel.key, kept.label("kept")).subquery()
+                    session.execute(
+                        delete(JudgeCacheModel).where(
+                            JudgeCacheModel.key.in_(
+                                select(ranked.c.key).where(
+                                    ranked.c.kept > self.max_bytes
+                                )
+                            )
+                        )
+                    )
+            session.commit()
+
+    def clear(self):
+        with Session(self.engine) as session:
+            session.execute(delete(JudgeCacheModel))
+            session.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else None,
+        }
+
+    def _expired(self, entry, now) -> bool:
+        return (
+            self.ttl is not None
+            and entry.created_at is not None
+            and entry.created_at < now - timedelta(seconds=self.ttl)
+        )
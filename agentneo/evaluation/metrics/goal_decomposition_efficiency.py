@@ -1,7 +1,7 @@
 import json
 from typing import Dict, Any
 from dotenv import load_dotenv
-import litellm
+from ..executor import complete
 import ast
 import os
 from typing import List, Optional
@@ -11,7 +11,7 @@ from datetime import datetime
 load_dotenv()
 
 def get_model_response(prompt, config):
-    evaluation = litellm.completion(
+    evaluation = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -215,7 +215,7 @@ def evaluate_goal_decomposition_efficiency(
     json"""
 
     try:
-        evaluation = litellm.completion(
+        evaluation = complete(
             model=config.get("model", "gpt-4o-mini"),
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
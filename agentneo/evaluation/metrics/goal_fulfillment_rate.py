@@ -1,6 +1,6 @@
 import json
 from typing import Dict, Any
-import litellm
+from ..executor import complete
 import ast
 import os
 
@@ -27,7 +27,7 @@ def evaluate_goal_fulfillment(
     """
 
     try:
-        evaluation = litellm.completion(
+        evaluation = complete(
             model=config.get("model", "gpt-4o-mini"),
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
@@ -45,7 +45,7 @@ def evaluate_goal_fulfillment(
     return result
 
 def get_model_response(prompt, config):
-    evaluation = litellm.completion(
+    evaluation = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -1,6 +1,6 @@
 import json
 from typing import Dict, Any, List, Union, Optional
-import litellm
+from ..executor import complete, judge_map
 import os
 import ast
 
@@ -194,7 +194,7 @@ Refinements or constraints: [List any specific requirements or limitations]
 
 After analyzing the traces and organizing your thoughts, provide your final output in the required JSON format with the 'intent' key and the summarized string as its value.
 """
-    response = litellm.completion(
+    response = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -267,7 +267,7 @@ Provide your output in the following format:
 }}
 </output>
 """
-    response = litellm.completion(
+    response = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -360,7 +360,7 @@ Remember to:
 
 Present your final output within <output> tags.
 """
-    response = litellm.completion(
+    response = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -407,7 +407,7 @@ Remember to be objective and thorough in your analysis. Consider all aspects of
 Ensure that your score accurately reflects the degree to which the outcome accomplishes the user's goal. A score of 1.0 should only be given if the outcome perfectly and completely fulfills the user's intent, while a score of 0.0 should be reserved for outcomes that entirely fail to address the user's goal.
 
 Now, proceed with your analysis and provide your evaluation in the specified JSON format."""
-    response = litellm.completion(
+    response = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -492,7 +492,7 @@ If you notice any patterns or trends across multiple traces, mention them in a s
 
 
 Remember, your goal is to provide an accurate and fair assessment of the AI's Plan Adaptability to help improve its performance in dynamic and uncertain environments."""
-    response = litellm.completion(
+    response = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -516,14 +516,22 @@ def execute_plan_adaptibility_metric(
     llm_calls_ = []
     # agent_thought_processes = []
     llm_traces = []
+    prior_llm_calls = []
     for llm_call in llm_calls:
         path = llm_call['path'].split('.')
         path = [int(element) if element.isdigit() else 'children' for element in path]
         llm_calls_.append({k: v for k, v in llm_call.items() if k != 'path'})
-        llm_call_trace = get_all_prior_trace(trace_json, path)
-        llm_traces.append(llm_call_trace)
-        agent_thought_process = extract_agent_thought_process(llm_calls_, config)
-        intent_task = extract_user_intent_task(llm_call_trace, config)
+        prior_llm_calls.append(list(llm_calls_))
+        llm_traces.append(get_all_prior_trace(trace_json, path))
+
+    # The judge calls for each LLM call are independent of each other
+    def judge_llm_call(index):
+        agent_thought_process = extract_agent_thought_process(prior_llm_calls[index], config)
+        intent_task = extract_user_intent_task(llm_traces[index], config)
+        return intent_task, agent_thought_process
+
+    judgements = judge_map(judge_llm_call, range(len(llm_calls)))
+    for llm_call, (intent_task, agent_thought_process) in zip(llm_calls, judgements):
         # agent_thought_processes.append(agent_thought_process)
         llm_call['task'] = intent_task['intent']
         llm_call['plan'] = agent_thought_process['plan']
@@ -545,8 +553,11 @@ def execute_plan_adaptibility_metric(
             },
         }
     
-    for trace, llm_call in zip(llm_traces, llm_calls):
-        plan_alterations_required = extract_plan_altering_info(trace, initial_plan, config)
+    plan_alterations = judge_map(
+        lambda trace: extract_plan_altering_info(trace, initial_plan, config),
+        llm_traces,
+    )
+    for plan_alterations_required, llm_call in zip(plan_alterations, llm_calls):
         llm_call['plan_alterations_required'] = plan_alterations_required['plan_alterations_required']
         llm_call['events_requiring_alteration'] = plan_alterations_required['events_requiring_alteration']
     
@@ -1,6 +1,6 @@
 import json
 from typing import Dict, Any
-import litellm
+from ..executor import complete
 import json
 
 def determine_intended_tools(query: str, tools: list, config: Dict[str, Any]) -> list:
@@ -23,7 +23,7 @@ def determine_intended_tools(query: str, tools: list, config: Dict[str, Any]) ->
     """
 
     try:
-        response = litellm.completion(
+        response = complete(
             model=config.get("model", "gpt-4o-mini"),
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
@@ -90,7 +90,7 @@ def execute_tool_call_correctness_rate(
     Provide a brief explanation for this correctness rate, considering the query, intended tools, and actual tool usage.
     """
 
-    reason_response = litellm.completion(
+    reason_response = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": reason_prompt}],
         temperature=0.0,
@@ -1,6 +1,6 @@
 import json
 from typing import Dict, Any
-import litellm
+from ..executor import complete, judge_map
 import os
 
 
@@ -14,9 +14,10 @@ def execute_tool_call_success_rate(
     total_calls = len(tool_calls)
     call_results = []
 
-    for call in tool_calls:
-        output = call["output"]
-        success, reason = judge_tool_call_success(output)
+    judgements = judge_map(
+        judge_tool_call_success, [call["output"] for call in tool_calls]
+    )
+    for success, reason in judgements:
         if success:
             successful_calls += 1
         call_results.append({"success": success, "reason": reason})
@@ -49,7 +50,7 @@ def judge_tool_call_success(output: str) -> tuple[bool, str]:
     JSON response:
     """
 
-    response = litellm.completion(
+    response = complete(
         model="gpt-3.5-turbo",
         messages=[{"role": "user", "content": prompt}],
         max_tokens=150,
@@ -72,7 +73,7 @@ def create_final_reason(success_rate: float, call_results: list) -> str:
     Final reason:
     """
 
-    response = litellm.completion(
+    response = complete(
         model="gpt-3.5-turbo",
         messages=[{"role": "user", "content": prompt}],
         max_tokens=200,
@@ -1,6 +1,6 @@
 import json
 from typing import Dict, Any, List, Union, Optional
-import litellm
+from ..executor import complete, judge_map
 import os
 import ast
 
@@ -220,7 +220,7 @@ Refinements or constraints: [List any specific requirements or limitations]
 
 After analyzing the traces and organizing your thoughts, provide your final output in the required JSON format with the 'intent' key and the summarized string as its value.
 """
-    response = litellm.completion(
+    response = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -295,7 +295,7 @@ Provide your output in the following format:
 }}
 </output>
 """
-    response = litellm.completion(
+    response = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -367,7 +367,7 @@ Remember, your goal is to provide an accurate and fair assessment of the AI's To
 Tool Selection Data:
 {json.dumps(all_tool_selection_input_parameters, indent=2)}
 """
-    response = litellm.completion(
+    response = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -390,8 +390,8 @@ def execute_tool_selection_accuracy_metric(
 
     tool_calls = tool_calls_with_path(trace_json, metadata)
 
-    tool_selection_input_parameters = []
-    for tool_call in tool_calls:
+    # The judge calls for each tool call are independent of each other
+    def tool_selection_inputs(tool_call):
         input_parameters = {}
         input_parameters["selected_tool"] = tool_call["name"]
         path = tool_call["path"].split(".")
@@ -408,7 +408,9 @@ def execute_tool_selection_accuracy_metric(
             input_parameters["tool_call_outcome"] = tool_call_outcome.get("outputs")
             input_parameters["tool_call_inputs"] = tool_call_outcome.get("inputs")
             input_parameters["all_available_tools"] = metadata["tools"]
-        tool_selection_input_parameters.append(input_parameters)
+        return input_parameters
+
+    tool_selection_input_parameters = judge_map(tool_selection_inputs, tool_calls)
 
     all_tool_selection_input_parameters = json.dumps(
         tool_selection_input_parameters, indent=2
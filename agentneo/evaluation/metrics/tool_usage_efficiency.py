@@ -1,6 +1,6 @@
 import json
 from typing import Dict, Any, List, Union, Optional
-import litellm
+from ..executor import complete, judge_map
 import os
 import ast
 
@@ -238,7 +238,7 @@ Refinements or constraints: [List any specific requirements or limitations]
 
 After analyzing the traces and organizing your thoughts, provide your final output in the required JSON format with the 'intent' key and the summarized string as its value.
 """
-    response = litellm.completion(
+    response = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -313,7 +313,7 @@ Provide your output in the following format:
 }}
 </output>
 """
-    response = litellm.completion(
+    response = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -383,7 +383,7 @@ Make sure that the evaluations for all tool calls adhere to this format, and tha
 Tool Usage Data:
 {json.dumps(all_tool_calls_w_parameters, indent=2)}
 """
-    response = litellm.completion(
+    response = complete(
         model=config.get("model", "gpt-4o-mini"),
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -406,8 +406,8 @@ def execute_tool_usage_efficiency_metric(
 
     tool_calls = tool_calls_with_path(trace_json, metadata)
 
-    tool_usage_efficiency_input_parameters = []
-    for tool_call in tool_calls:
+    # The judge calls for each tool call are independent of each other
+    def tool_usage_inputs(tool_call):
         input_parameters = {}
         input_parameters["tool_name"] = tool_call["name"]
         path = tool_call["path"].split(".")
@@ -427,7 +427,9 @@ def execute_tool_usage_efficiency_metric(
             input_parameters["tool_call_end"] = tool_call_outcome.get("end")
             input_parameters["all_available_tools"] = metadata["tools"]
 
-        tool_usage_efficiency_input_parameters.append(input_parameters)
+        return input_parameters
+
+    tool_usage_efficiency_input_parameters = judge_map(tool_usage_inputs, tool_calls)
 
     all_tool_usage_efficiency_input_parameters = json.dumps(
         tool_usage_efficiency_input_parameters, indent=2
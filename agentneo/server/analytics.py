@@ -0,0 +1,259 @@
+"""Cost and latency analytics of a project, aggregated in SQL.
+
+Span figures are added up from the per-trace ``span_usage`` summaries (see
+:mod:`agentneo.data.span_usage`) and trace figures from the trace rollups,
+so the work grows with the number of traces in range rather than with
+their spans. Percentiles of span durations come from the merged duration
+histograms and are within ``latency_sketch.RELATIVE_ACCURACY`` of the
+exact value; those of trace durations are exact. Only finished traces are
+counted: the summaries are written when a trace stops.
+
+:func:`project_rollups` reads the time-bucketed rollups instead (see
+:mod:`agentneo.data.rollups`), which outlive the spans of old traces.
+"""
+
+import math
+from datetime import datetime
+
+from sqlalchemy import case, func, select, true
+
+from ..data import SpanRollupModel, SpanUsageModel, TraceModel
+from ..data import latency_sketch
+
+PERCENTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+# strftime formats of the series' time buckets, by bucket name
+TIME_BUCKETS = {
+    "minute": "%Y-%m-%dT%H:%M:00",
+    "hour": "%Y-%m-%dT%H:00:00",
+    "day": "%Y-%m-%dT00:00:00",
+}
+
+
+def _error_rate(calls, errors):
+    # Calls that raised have no span, so are not among the calls
+    attempts = calls + errors
+    return errors / attempts if attempts else None
+
+
+def _percentiles(histogram):
+    return {
+        name: latency_sketch.quantile(histogram, q) for name, q in PERCENTILES.items()
+    }
+
+
+def _trace_filters(project_id, start_time, end_time):
+    filters = [TraceModel.project_id == project_id, TraceModel.end_time.isnot(None)]
+    if start_time is not None:
+        filters.append(TraceModel.start_time >= start_time)
+    if end_time is not None:
+        filters.append(TraceModel.start_time < end_time)
+    return filters
+
+
+def _trace_summary(session, filters):
+    totals = session.execute(
+        select(
+            func.count(TraceModel.id).label("trace_count"),
+            func.count(case((TraceModel.error_count > 0, 1))).label("failed"),
+            func.coalesce(func.sum(TraceModel.total_cost), 0.0).label("total_cost"),
+            func.coalesce(func.sum(TraceModel.total_tokens), 0).label("total_tokens"),
+            func.coalesce(func.sum(TraceModel.error_count), 0).label("error_count"),
+        ).where(*filters)
+    ).one()
+
+    durations = select(TraceModel.duration).where(
+        *filters, TraceModel.duration.isnot(None)
+    )
+    count = session.scalar(select(func.count()).select_from(durations.subquery()))
+    percentiles = dict.fromkeys(PERCENTILES)
+    if count:
+        for name, q in PERCENTILES.items():
+            # Nearest rank, as latency_sketch.quantile
+            percentiles[name] = session.scalar(
+                durations.order_by(TraceModel.duration)
+                .limit(1)
+                .offset(max(math.ceil(q * count), 1) - 1)
+            )
+
+    return {
+        "trace_count": totals.trace_count,
+        "total_cost": totals.total_cost,
+        "total_tokens": totals.total_tokens,
+        "error_count": totals.error_count,
+        # Share of traces with at least one error
+        "error_rate": (
+            totals.failed / totals.trace_count if totals.trace_count else None
+        ),
+        "duration": percentiles,
+    }
+
+
+def _span_usage(session, filters):
+    """Sums and merged duration histogram per (span type, name)."""
+    usage = session.execute(
+        select(
+            SpanUsageModel.span_type,
+            SpanUsageModel.name,
+            func.sum(SpanUsageModel.call_count).label("call_count"),
+            func.sum(SpanUsageModel.error_count).label("error_count"),
+            func.sum(SpanUsageModel.total_duration).label("total_duration"),
+            func.sum(SpanUsageModel.total_cost).label("total_cost"),
+            func.sum(SpanUsageModel.total_tokens).label("total_tokens"),
+        )
+        .join(TraceModel, TraceModel.id == SpanUsageModel.trace_id)
+        .where(*filters)
+        .group_by(SpanUsageModel.span_type, SpanUsageModel.name)
+    ).all()
+
+    buckets = func.json_each(SpanUsageModel.durations).table_valued("key", "value")
+    histograms = {}
+    for span_type, name, index, count in session.execute(
+        select(
+            SpanUsageModel.span_type,
+            SpanUsageModel.name,
+            buckets.c.key,
+            func.sum(buckets.c.value),
+        )
+        .join(TraceModel, TraceModel.id == SpanUsageModel.trace_id)
+        .join(buckets, true())
+        .where(*filters)
+        .group_by(SpanUsageModel.span_type, SpanUsageModel.name, buckets.c.key)
+    ):
+        histograms.setdefault((span_type, name), {})[int(index)] = count
+    return [(row, histograms.get((row.span_type, row.name), {})) for row in usage]
+
+
+def _span_totals(groups):
+    calls = sum(row.call_count for row, _ in groups)
+    errors = sum(row.error_count for row, _ in groups)
+    return {
+        "call_count": calls,
+        "error_count": errors,
+        "error_rate": _error_rate(calls, errors),
+        "total_duration": sum(row.total_duration for row, _ in groups),
+        "duration": _percentiles(
+            latency_sketch.merge(histogram for _, histogram in groups)
+        ),
+    }
+
+
+def _series(session, filters, bucket):
+    start = func.strftime(TIME_BUCKETS[bucket], TraceModel.start_time).label("start")
+    rows = session.execute(
+        select(
+            start,
+            func.count(TraceModel.id).label("trace_count"),
+            func.coalesce(func.sum(TraceModel.total_cost), 0.0).label("total_cost"),
+            func.coalesce(func.sum(TraceModel.total_tokens), 0).label("total_tokens"),
+            func.coalesce(func.sum(TraceModel.llm_call_count), 0).label(
+                "llm_call_count"
+            ),
+            func.coalesce(func.sum(TraceModel.tool_call_count), 0).label(
+                "tool_call_count"
+            ),
+            func.coalesce(func.sum(TraceModel.error_count), 0).label("error_count"),
+            func.avg(TraceModel.duration).label("mean_duration"),
+        )
+        .where(*filters)
+        .group_by(start)
+        .order_by(start)
+    )
+    return [
+        {**row._asdict(), "start": datetime.fromisoformat(row.start)} for row in rows
+    ]
+
+
+def project_analytics(
+    session, project_id: int, start_time=None, end_time=None, bucket: str = "day"
+):
+    """Analytics of the finished traces of a project that started in
+    ``[start_time, end_time)``, with a series by ``bucket`` (a key of
+    ``TIME_BUCKETS``)."""
+    filters = _trace_filters(project_id, start_time, end_time)
+    groups = _span_usage(session, filters)
+    llm_groups = [group for group in groups if group[0].span_type == "llm"]
+    tool_groups = [group for group in groups if group[0].span_type == "tool"]
+
+    return {
+        "project_id": project_id,
+        "start_time": start_time,
+        "end_time": end_time,
+        "bucket": bucket,
+        "traces": _trace_summary(session, filters),
+        "llm_calls": {
+            **_span_totals(llm_groups),
+            "total_cost": sum(row.total_cost for row, _ in llm_groups),
+            "total_tokens": sum(row.total_tokens for row, _ in llm_groups),
+        },
+        "tool_calls": _span_totals(tool_groups),
+        "models": [
+            {
+                "model": row.name,
+                "call_count": row.call_count,
+                "error_count": row.error_count,
+                "error_rate": _error_rate(row.call_count, row.error_count),
+                "total_cost": row.total_cost,
+                "total_tokens": row.total_tokens,
+                "total_duration": row.total_duration,
+                "duration": _percentiles(histogram),
+            }
+            for row, histogram in llm_groups
+        ],
+        "tools": [
+            {
+                "name": row.name,
+                "call_count": row.call_count,
+                "error_count": row.error_count,
+                "error_rate": _error_rate(row.call_count, row.error_count),
+                "total_duration": row.total_duration,
+                "duration": _percentiles(histogram),
+            }
+            for row, histogram in tool_groups
+        ],
+        "series": _series(session, filters, bucket),
+    }
+
+
+def project_rollups(
+    session,
+    project_id: int,
+    granularity: str,
+    start_time=None,
+    end_time=None,
+    span_type: str = None,
+    name: str = None,
+):
+    """The rollups of a project at ``granularity`` whose bucket starts in
+    ``[start_time, end_time)``, oldest first, optionally of one span type
+    and name."""
+    query = select(SpanRollupModel).where(
+        SpanRollupModel.project_id == project_id,
+        SpanRollupModel.granularity == granularity,
+    )
+    if start_time is not None:
+        query = query.where(SpanRollupModel.bucket_start >= start_time)
+    if end_time is not None:
+        query = query.where(SpanRollupModel.bucket_start < end_time)
+    if span_type is not None:
+        query = query.where(SpanRollupModel.span_type == span_type)
+    if name is not None:
+        query = query.where(SpanRollupModel.name == name)
+    query = query.order_by(
+        SpanRollupModel.bucket_start, SpanRollupModel.span_type, SpanRollupModel.name
+    )
+    return [
+        {
+            "start": rollup.bucket_start,
+            "span_type": rollup.span_type,
+            "name": rollup.name,
+            "call_count": rollup.call_count,
+            "error_count": rollup.error_count,
+            "error_rate": _error_rate(rollup.call_count, rollup.error_count),
+            "total_duration": rollup.total_duration,
+            "total_cost": rollup.total_cost,
+            "total_tokens": rollup.total_tokens,
+            "duration": _percentiles(rollup.durations),
+        }
+        for rollup in session.scalars(query)
+    ]
@@ -0,0 +1,59 @@
+"""Content-Encoding negotiation for dashboard responses.
+
+Bodies are compressed with Brotli when the client accepts it and the
+``brotli`` package is installed, with gzip otherwise. Small bodies are
+sent as they are.
+"""
+
+import zlib
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def available_encodings():
+    """Content codings this server can produce, preferred first."""
+    return ["br", "gzip"] if _brotli() is not None else ["gzip"]
+
+
+def negotiate(accept_encodings):
+    """The content coding to use for a request's ``Accept-Encoding``
+    header (werkzeug's parsed ``request.accept_encodings``), or None to
+    send the body as is."""
+    return accept_encodings.best_match(available_encodings())
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = _brotli().Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+def compressor(encoding):
+    """An incremental compressor with ``compress(data)`` and ``flush()``."""
+    if encoding == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if encoding == "br":
+        return _Brotli()
+    raise ValueError(f"Unknown content coding {encoding!r}")
+
+
+def compress(data: bytes, encoding) -> bytes:
+    stream = compressor(encoding)
+    return stream.compress(data) + stream.flush()
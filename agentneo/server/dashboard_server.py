@@ -1,23 +1,25 @@
 # dashboard_server.py
 
+import functools
+import hashlib
 import os
 import sys
 import time
 import logging
 import threading
+from collections import defaultdict
 from flask import Flask, send_from_directory
 from waitress import serve
 from flask import request, abort
 from flask_cors import CORS
-from flask_caching import Cache
 
 from flask import jsonify
-from sqlalchemy import create_engine, func
+from sqlalchemy import func, select
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.exc import SQLAlchemyError
 
 from ..utils import get_db_path
+from ..utils.serialization import as_text, loads
 from ..data import (
     ProjectInfoModel,
     TraceModel,
@@ -25,10 +27,31 @@ from ..data import (
     LLMCallModel,
     ToolCallModel,
     UserInteractionModel,
-    SystemInfoModel,
     ErrorModel,
     MetricModel,
+    TraceLoader,
+    get_engine,
 )
+from ..data.blob_store import blob_ref, load_blobs
+from ..data.retention import prune_raw_spans
+from ..data.rollups import GRANULARITIES
+from ..data.span_usage import USAGE_TYPES
+from ..data.trace_versions import trace_version
+from .pagination import (
+    CURSOR_HEADER,
+    InvalidQuery,
+    Page,
+    paged_response,
+    parse_bool,
+    parse_datetime,
+    parse_float,
+    without_sort_key,
+)
+from .analytics import TIME_BUCKETS, project_analytics, project_rollups
+from .compression import MIN_COMPRESS_SIZE, compress, compressor, negotiate
+from .response_cache import ResponseCache
+from .streaming import StreamedJSON, iter_json
+from .trace_tail import TraceTail
 
 # Configure logging
 logging.basicConfig(
@@ -40,18 +63,162 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 ui_folder = os.path.join(current_dir, "../ui/dist")
 
 app = Flask(__name__, static_folder=ui_folder)
-CORS(app)  # Enable CORS
+CORS(app, expose_headers=[CURSOR_HEADER])  # Enable CORS
 
 
 db_path = get_db_path()
 # Setup database connection
-engine = create_engine(db_path)
+engine = get_engine(db_path)
 Session = sessionmaker(bind=engine)
 
 
-cache = Cache(
-    app, config={"CACHE_TYPE": "simple", "CACHE_DEFAULT_TIMEOUT": 600}
-)  # Cache for 10 minutes
+response_cache = ResponseCache(
+    max_bytes=int(os.environ.get("AGENTNEO_DASHBOARD_CACHE_MB", "256")) * 1024 * 1024
+)
+
+# Streamed responses up to this size are kept in the response cache; larger
+# ones are sent without being held in memory
+STREAMED_CACHE_LIMIT = 4 * 1024 * 1024
+
+# Seconds between two runs of the span retention policy, if one is set
+RETENTION_INTERVAL = 24 * 3600
+
+
+def _etag(key, version):
+    return hashlib.sha1(repr((key, version)).encode("utf-8")).hexdigest()
+
+
+def _cached_body(key, entry, encoding):
+    """The body of a cached response in ``encoding``, compressed once and
+    kept in the cache."""
+    if encoding is None or len(entry.body) < MIN_COMPRESS_SIZE:
+        return entry.body, None
+    data = entry.encoded.get(encoding)
+    if data is None:
+        data = compress(entry.body, encoding)
+        response_cache.add_encoding(key, entry, encoding, data)
+    return data, encoding
+
+
+def _streamed_response(streamed, key, version, encoding):
+    """A response writing ``streamed`` while it is encoded, compressed on the
+    fly; the body is cached once complete if it is no larger than
+    ``STREAMED_CACHE_LIMIT``."""
+    chunks = iter_json(streamed.document, app.json)
+    limit = min(STREAMED_CACHE_LIMIT, response_cache.max_bytes)
+
+    def generate():
+        body, size = [], 0
+        stream = compressor(encoding) if encoding else None
+        for chunk in chunks:
+            if body is not None:
+                size += len(chunk)
+                if size > limit:
+                    body = None
+                else:
+                    body.append(chunk)
+            data = stream.compress(chunk) if stream else chunk
+            if data:
+                yield data
+        if stream:
+            yield stream.flush()
+        if body is not None:
+            response_cache.put(
+                key, version, b"".join(body), [("Content-Type", app.json.mimetype)]
+            )
+
+    response = app.response_class(generate(), mimetype=app.json.mimetype)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def _cached(version_of):
+    """Serve the view's successful responses from the response cache for as
+    long as ``version_of(session, **view_args)`` is unchanged, compressed as
+    negotiated and tagged with an ETag of the version, so that a matching
+    If-None-Match is answered with a 304 without building anything.
+
+    Views may return a StreamedJSON, which is sent while it is encoded.
+    Goes below @app.route, so that Flask registers the cached view.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def cached_view(**kwargs):
+            # Read before the response is built: a write landing meanwhile
+            # can only make a cached response newer than its version.
+            try:
+                with Session() as session:
+                    version = version_of(session, **kwargs)
+            except SQLAlchemyError as e:
+                return jsonify({"error": str(e)}), 500
+            if version is None:
+                return view(**kwargs)
+
+            key = (request.path, request.query_string)
+            etag = _etag(key, version)
+            encoding = negotiate(request.accept_encodings)
+            if request.if_none_match.contains_weak(etag):
+                response = app.response_class(status=304)
+            else:
+                entry = response_cache.get(key, version)
+                if entry is None:
+                    result = view(**kwargs)
+                    if isinstance(result, StreamedJSON):
+                        response = _streamed_response(result, key, version, encoding)
+                    else:
+                        response = app.make_response(result)
+                        if response.status_code != 200:
+                            return response
+                        headers = [
+                            (name, value)
+                            for name, value in response.headers.items()
+                            if name.lower() != "content-length"
+                        ]
+                        entry = response_cache.put(
+                            key, version, response.get_data(), headers
+                        )
+                if entry is not None:
+                    body, body_encoding = _cached_body(key, entry, encoding)
+                    response = app.response_class(body, headers=list(entry.headers))
+                    if body_encoding:
+                        response.headers["Content-Encoding"] = body_encoding
+            # Weak, as the compressed variants share it
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = "no-cache"
+            response.vary.add("Accept-Encoding")
+            return response
+
+        return cached_view
+
+    return decorator
+
+
+def _trace_version(session, trace_id, **_):
+    return trace_version(session, trace_id)
+
+
+def _project_version(session, project_id):
+    return tuple(
+        session.execute(
+            select(
+                func.count(TraceModel.id),
+                func.max(TraceModel.id),
+                func.sum(TraceModel.version),
+            ).where(TraceModel.project_id == project_id)
+        ).one()
+    )
+
+
+def _projects_version(session):
+    projects = session.execute(
+        select(func.count(ProjectInfoModel.id), func.max(ProjectInfoModel.id))
+    ).one()
+    traces = session.execute(
+        select(func.count(TraceModel.id), func.sum(TraceModel.version))
+    ).one()
+    return (*projects, *traces)
 
 
 # Remove X-Frame-Options header
@@ -61,41 +228,56 @@ def add_header(response):
     return response
 
 
+PROJECT_SORT_FIELDS = {
+    "id": ProjectInfoModel.id,
+    "project_name": ProjectInfoModel.project_name,
+    "start_time": ProjectInfoModel.start_time,
+}
+
+
 @app.route("/api/projects", methods=["GET"])
+@_cached(_projects_version)
 def get_projects():
     try:
+        page = Page(request.args, PROJECT_SORT_FIELDS, default_sort="id")
         with Session() as session:
-            projects = session.query(ProjectInfoModel).all()
-            return jsonify(
-                [
-                    {
-                        "id": p.id,
-                        "project_name": p.project_name,
-                        "start_time": p.start_time,
-                        "end_time": p.end_time,
-                        "duration": p.duration,
-                        "total_cost": p.total_cost,
-                        "total_tokens": p.total_tokens,
-                    }
-                    for p in projects
-                ]
+            query = page.apply(session.query(ProjectInfoModel), ProjectInfoModel.id)
+            rows, next_cursor = page.split(query.all(), lambda row: row[0].id)
+            return paged_response(
+                jsonify(
+                    [
+                        {
+                            "id": p.id,
+                            "project_name": p.project_name,
+                            "start_time": p.start_time,
+                            "end_time": p.end_time,
+                            "duration": p.duration,
+                            "total_cost": p.total_cost,
+                            "total_tokens": p.total_tokens,
+                        }
+                        for p, _ in rows
+                    ]
+                ),
+                next_cursor,
             )
+    except InvalidQuery as e:
+        return jsonify({"error": str(e)}), 400
     except SQLAlchemyError as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/api/projects/<int:project_id>", methods=["GET"])
+@_cached(_project_version)
 def get_project(project_id):
     try:
         with Session() as session:
-            project = (
-                session.query(ProjectInfoModel)
-                .options(joinedload(ProjectInfoModel.system_info))  
-                .get(project_id)
-            )
+            project = session.get(ProjectInfoModel, project_id)
             if project is None:
                 return jsonify({"error": "Project not found"}), 404
-            
+
+            # That of the project's most recent trace
+            system_info = project.system_info
+
             # Add system_info to the response
             return jsonify({
                 "id": project.id,
@@ -106,351 +288,816 @@ def get_project(project_id):
                 "total_cost": project.total_cost,
                 "total_tokens": project.total_tokens,
                 "system_info": {
-                    "os_name": project.system_info.os_name if project.system_info else None,
-                    "os_version": project.system_info.os_version if project.system_info else None,
-                    "python_version": project.system_info.python_version if project.system_info else None,
-                    "cpu_info": project.system_info.cpu_info if project.system_info else None,
-                    "gpu_info": project.system_info.gpu_info if project.system_info else None,
-                    "disk_info": project.system_info.disk_info if project.system_info else None,
-                    "memory_total": project.system_info.memory_total if project.system_info else None,
-                    "installed_packages": project.system_info.installed_packages if project.system_info else None,
-                } if project.system_info else None
+                    "os_name": system_info.os_name,
+                    "os_version": system_info.os_version,
+                    "python_version": system_info.python_version,
+                    "cpu_info": system_info.cpu_info,
+                    "gpu_info": system_info.gpu_info,
+                    "disk_info": system_info.disk_info,
+                    "memory_total": system_info.memory_total,
+                    "installed_packages": system_info.installed_packages,
+                } if system_info else None
             })
     except SQLAlchemyError as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _span_count(model):
+    return (
+        select(func.count(model.id))
+        .where(model.trace_id == TraceModel.id)
+        .correlate(TraceModel)
+        .scalar_subquery()
+    )
+
+
+# Finished traces carry their rollups; running ones are counted.
+_trace_errors = func.coalesce(TraceModel.error_count, _span_count(ErrorModel))
+
+TRACE_SORT_FIELDS = {
+    "id": TraceModel.id,
+    "start_time": TraceModel.start_time,
+    "duration": func.coalesce(TraceModel.duration, 0.0),
+    "total_cost": func.coalesce(TraceModel.total_cost, 0.0),
+    "total_tokens": func.coalesce(TraceModel.total_tokens, 0),
+    "total_errors": _trace_errors,
+}
+
+
 @app.route("/api/projects/<int:project_id>/traces", methods=["GET"])
+@_cached(_project_version)
 def get_project_traces(project_id):
+    """Traces of a project with their span counts.
+
+    Pagination and sorting as described in server/pagination.py. Filters:
+    ``start_time`` and ``end_time`` bound the traces' start (ISO 8601),
+    ``has_errors`` is true or false and ``min_cost`` a total cost.
+    """
     try:
+        page = Page(request.args, TRACE_SORT_FIELDS, default_sort="id")
+        start_time = parse_datetime(request.args, "start_time")
+        end_time = parse_datetime(request.args, "end_time")
+        has_errors = parse_bool(request.args, "has_errors")
+        min_cost = parse_float(request.args, "min_cost")
         with Session() as session:
-            traces = (
-                session.query(TraceModel)
-                .filter_by(project_id=project_id)
-                .options(
-                    joinedload(TraceModel.agent_calls),
-                    joinedload(TraceModel.llm_calls),
-                    joinedload(TraceModel.tool_calls),
-                    joinedload(TraceModel.user_interactions),
-                    joinedload(TraceModel.errors),
+            query = session.query(
+                TraceModel.id,
+                TraceModel.start_time,
+                TraceModel.end_time,
+                TraceModel.duration,
+                TraceModel.total_cost,
+                TraceModel.total_tokens,
+                _span_count(AgentCallModel).label("total_agent_calls"),
+                func.coalesce(
+                    TraceModel.llm_call_count, _span_count(LLMCallModel)
+                ).label("total_llm_calls"),
+                func.coalesce(
+                    TraceModel.tool_call_count, _span_count(ToolCallModel)
+                ).label("total_tool_calls"),
+                _span_count(UserInteractionModel).label("total_user_interactions"),
+                _trace_errors.label("total_errors"),
+            ).filter(TraceModel.project_id == project_id)
+            if start_time is not None:
+                query = query.filter(TraceModel.start_time >= start_time)
+            if end_time is not None:
+                query = query.filter(TraceModel.start_time < end_time)
+            if has_errors is not None:
+                query = query.filter(
+                    _trace_errors > 0 if has_errors else _trace_errors == 0
                 )
-                .all()
+            if min_cost is not None:
+                query = query.filter(TraceModel.total_cost >= min_cost)
+
+            query = page.apply(query, TraceModel.id)
+            rows, next_cursor = page.split(query.all(), lambda row: row.id)
+            return paged_response(
+                jsonify([without_sort_key(row) for row in rows]), next_cursor
             )
+    except InvalidQuery as e:
+        return jsonify({"error": str(e)}), 400
+    except SQLAlchemyError as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/projects/<int:project_id>/analytics", methods=["GET"])
+@_cached(_project_version)
+def get_project_analytics(project_id):
+    """Cost, token, latency and error figures of a project's finished traces.
+
+    See server/analytics.py. ``start_time`` and ``end_time`` bound the
+    traces' start (ISO 8601); ``bucket`` is minute, hour or day (default)
+    for the time series. Traces are summarised when they stop, so the
+    calls of a running trace are not counted until then.
+    """
+    try:
+        start_time = parse_datetime(request.args, "start_time")
+        end_time = parse_datetime(request.args, "end_time")
+        bucket = request.args.get("bucket", "day")
+        if bucket not in TIME_BUCKETS:
+            raise InvalidQuery(f"bucket must be one of {', '.join(TIME_BUCKETS)}")
+        with Session() as session:
+            if session.get(ProjectInfoModel, project_id) is None:
+                return jsonify({"error": "Project not found"}), 404
             return jsonify(
-                [
-                    {
-                        "id": t.id,
-                        "start_time": t.start_time,
-                        "end_time": t.end_time,
-                        "duration": t.duration,
-                        "total_agent_calls": len(t.agent_calls),
-                        "total_llm_calls": len(t.llm_calls),
-                        "total_tool_calls": len(t.tool_calls),
-                        "total_user_interactions": len(t.user_interactions),
-                        "total_errors": len(t.errors),
-                    }
-                    for t in traces
-                ]
+                project_analytics(session, project_id, start_time, end_time, bucket)
             )
+    except InvalidQuery as e:
+        return jsonify({"error": str(e)}), 400
     except SQLAlchemyError as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/analysis_traces/<int:trace_id>", methods=["GET"])
-def get_analysis_trace(trace_id):
+@app.route("/api/projects/<int:project_id>/rollups", methods=["GET"])
+@_cached(_project_version)
+def get_project_rollups(project_id):
+    """Time-bucketed rollups of a project's spans, kept after old spans are
+    pruned.
+
+    ``granularity`` is minute, hour (default) or day; ``start_time`` and
+    ``end_time`` bound the buckets' start (ISO 8601). ``span_type`` (llm,
+    tool or agent) and ``name`` (model, tool or agent name) select one
+    series.
+    """
     try:
-        with Session() as session:
-            trace = (
-                session.query(TraceModel)
-                .options(
-                    joinedload(TraceModel.llm_calls),
-                    joinedload(TraceModel.tool_calls),
-                    joinedload(TraceModel.agent_calls),
-                    joinedload(TraceModel.user_interactions),
-                    joinedload(TraceModel.errors),
-                    joinedload(TraceModel.system_info),
-                    joinedload(TraceModel.metrics),
-                )
-                .get(trace_id)
+        start_time = parse_datetime(request.args, "start_time")
+        end_time = parse_datetime(request.args, "end_time")
+        granularity = request.args.get("granularity", "hour")
+        if granularity not in GRANULARITIES:
+            raise InvalidQuery(
+                f"granularity must be one of {', '.join(GRANULARITIES)}"
             )
-            if trace is None:
-                return jsonify({"error": "Trace not found"}), 404
+        span_type = request.args.get("span_type")
+        if span_type is not None and span_type not in USAGE_TYPES:
+            raise InvalidQuery(f"span_type must be one of {', '.join(USAGE_TYPES)}")
+        with Session() as session:
+            if session.get(ProjectInfoModel, project_id) is None:
+                return jsonify({"error": "Project not found"}), 404
             return jsonify(
-                {
-                    "id": trace.id,
-                    "project_id": trace.project_id,
-                    "start_time": trace.start_time,
-                    "end_time": trace.end_time,
-                    "duration": trace.duration,
-                    "llm_calls": [
-                        {
-                            "id": call.id,
-                            "name": call.name,
-                            "model": call.model,
-                            "input_prompt": call.input_prompt,
-                            "output": call.output,
-                            "tool_call": call.tool_call,
-                            "start_time": call.start_time,
-                            "end_time": call.end_time,
-                            "duration": call.duration,
-                            "token_usage": call.token_usage,
-                            "cost": call.cost,
-                            "memory_used": call.memory_used,
-                        }
-                        for call in trace.llm_calls
-                    ],
-                    "tool_calls": [
-                        {
-                            "id": call.id,
-                            "name": call.name,
-                            "input_parameters": call.input_parameters,
-                            "output": call.output,
-                            "start_time": call.start_time,
-                            "end_time": call.end_time,
-                            "duration": call.duration,
-                            "memory_used": call.memory_used,
-                            "network_calls": call.network_calls,
-                        }
-                        for call in trace.tool_calls
-                    ],
-                    "agent_calls": [
-                        {
-                            "id": call.id,
-                            "name": call.name,
-                            "start_time": call.start_time,
-                            "end_time": call.end_time,
-                            "llm_call_ids": call.llm_call_ids,
-                            "tool_call_ids": call.tool_call_ids,
-                            "user_interaction_ids": call.user_interaction_ids,
-                        }
-                        for call in trace.agent_calls
-                    ],
-                    "user_interactions": [
-                        {
-                            "id": interaction.id,
-                            "interaction_type": interaction.interaction_type,
-                            "content": interaction.content,
-                            "timestamp": interaction.timestamp,
-                        }
-                        for interaction in trace.user_interactions
-                    ],
-                    "errors": [
-                        {
-                            "id": error.id,
-                            "error_type": error.error_type,
-                            "error_message": error.error_message,
-                            "timestamp": error.timestamp,
-                        }
-                        for error in trace.errors
-                    ],
-                    "system_info": (
-                        {
-                            "os_name": trace.system_info.os_name,
-                            "os_version": trace.system_info.os_version,
-                            "python_version": trace.system_info.python_version,
-                            "cpu_info": trace.system_info.cpu_info,
-                            "gpu_info": trace.system_info.gpu_info,
-                            "disk_info": trace.system_info.disk_info,
-                            "memory_total": trace.system_info.memory_total,
-                            "installed_packages": trace.system_info.installed_packages,
-                        }
-                        if trace.system_info
-                        else None
-                    ),
-                    "metrics": [
-                        {
-                            "id": metric.id,
-                            "metric_name": metric.metric_name,
-                            "score": metric.score,
-                            "reason": metric.reason,
-                            "result_detail": metric.result_detail,
-                            "config": metric.config,
-                            "start_time": metric.start_time,
-                            "end_time": metric.end_time,
-                            "duration": metric.duration,
-                            "timestamp": metric.timestamp,
-                        }
-                        for metric in trace.metrics
-                    ],
-                }
+                project_rollups(
+                    session,
+                    project_id,
+                    granularity,
+                    start_time,
+                    end_time,
+                    span_type,
+                    request.args.get("name"),
+                )
             )
+    except InvalidQuery as e:
+        return jsonify({"error": str(e)}), 400
     except SQLAlchemyError as e:
         return jsonify({"error": str(e)}), 500
-    
-    
 
-@cache.memoize(timeout=600)
+
+def _format_system_info(system_info):
+    if system_info is None:
+        return None
+    return {
+        "os_name": system_info.os_name,
+        "os_version": system_info.os_version,
+        "python_version": system_info.python_version,
+        "cpu_info": system_info.cpu_info,
+        "gpu_info": system_info.gpu_info,
+        "disk_info": system_info.disk_info,
+        "memory_total": system_info.memory_total,
+        "installed_packages": system_info.installed_packages,
+    }
+
+
+def _payload_text(text):
+    # Oversized payloads are shown by their preview; the full payload is
+    # served by /api/blobs/<hash>.
+    value = loads(text)
+    digest = blob_ref(value)
+    if digest is None:
+        return as_text(text)
+    return (
+        f"{value.get('preview', '')}... "
+        f"[{value.get('size')} bytes, see /api/blobs/{digest}]"
+    )
+
+
+def _format_llm_call(call):
+    return {
+        "id": call.id,
+        "name": call.name,
+        "model": call.model,
+        "input_prompt": _payload_text(call.input_prompt),
+        "output": _payload_text(call.output),
+        "tool_call": _payload_text(call.tool_call),
+        "start_time": call.start_time,
+        "end_time": call.end_time,
+        "duration": call.duration,
+        "token_usage": call.token_usage,
+        "cost": call.cost,
+        "memory_used": call.memory_used,
+    }
+
+
+def _format_tool_call(call):
+    return {
+        "id": call.id,
+        "name": call.name,
+        "input_parameters": call.input_parameters,
+        "output": _payload_text(call.output),
+        "start_time": call.start_time,
+        "end_time": call.end_time,
+        "duration": call.duration,
+        "memory_used": call.memory_used,
+        "network_calls": call.network_calls,
+    }
+
+
+def _format_user_interaction(interaction):
+    return {
+        "id": interaction.id,
+        "interaction_type": interaction.interaction_type,
+        "content": interaction.content,
+        "timestamp": interaction.timestamp,
+    }
+
+
+def _format_error(error):
+    return {
+        "id": error.id,
+        "error_type": error.error_type,
+        "error_message": error.error_message,
+        "timestamp": error.timestamp,
+    }
+
+
+def _load_trace(session, trace_id, metrics=False):
+    # The UI decodes the JSON columns itself, so they are sent as stored;
+    # prompts and outputs are sent as display text. LLM and tool calls are
+    # read by _spans while the response is written.
+    return TraceLoader(session, decode=False, metrics=metrics, calls=False).load(
+        trace_id
+    )
+
+
+def _spans(model, trace_id, **filters):
+    """The span records of a trace, read a page at a time in a session of
+    their own as the response is written, see TraceLoader.iter_spans."""
+    with Session() as session:
+        loader = TraceLoader(session, decode=False)
+        yield from loader.iter_spans(model, trace_id, **filters)
+
+
+def _span_groups(model, trace_id, column, keys):
+    """The span records of a trace by ``column`` value, as a generator per
+    key of ``keys``. The groups are to be iterated in the order of ``keys``;
+    they share one read of the table, a page at a time, in a session of its
+    own (see TraceLoader.iter_span_groups), and a group skipped is passed
+    over."""
+    keys = list(keys)
+    position = {key: n for n, key in enumerate(keys)}
+
+    def pairs():
+        with Session() as session:
+            loader = TraceLoader(session, decode=False)
+            yield from loader.iter_span_groups(model, trace_id, column, keys)
+
+    stream = pairs()
+    pending = []
+
+    def group(key):
+        while True:
+            if not pending:
+                pair = next(stream, None)
+                if pair is None:
+                    return
+                pending.append(pair)
+            pair_key, record = pending[0]
+            if position[pair_key] > position[key]:
+                return
+            pending.pop()
+            if pair_key == key:
+                yield record
+
+    return {key: group(key) for key in keys}
+
+
+@app.route("/api/analysis_traces/<int:trace_id>", methods=["GET"])
+@_cached(_trace_version)
+def get_analysis_trace(trace_id):
+    try:
+        with Session() as session:
+            trace = _load_trace(session, trace_id, metrics=True)
+        if trace is None:
+            return jsonify({"error": "Trace not found"}), 404
+        # Spans are formatted one at a time while the response is written
+        return StreamedJSON(
+            {
+                "id": trace.id,
+                "project_id": trace.project_id,
+                "start_time": trace.start_time,
+                "end_time": trace.end_time,
+                "duration": trace.duration,
+                "llm_calls": (
+                    _format_llm_call(call) for call in _spans(LLMCallModel, trace_id)
+                ),
+                "tool_calls": (
+                    _format_tool_call(call) for call in _spans(ToolCallModel, trace_id)
+                ),
+                "agent_calls": [
+                    {
+                        "id": call.id,
+                        "name": call.name,
+                        "start_time": call.start_time,
+                        "end_time": call.end_time,
+                        "llm_call_ids": call.llm_call_ids,
+                        "tool_call_ids": call.tool_call_ids,
+                        "user_interaction_ids": call.user_interaction_ids,
+                    }
+                    for call in trace.agent_calls
+                ],
+                "user_interactions": [
+                    _format_user_interaction(interaction)
+                    for interaction in trace.user_interactions
+                ],
+                "errors": [_format_error(error) for error in trace.errors],
+                "system_info": _format_system_info(trace.system_info),
+                "metrics": [
+                    {
+                        "id": metric.id,
+                        "metric_name": metric.metric_name,
+                        "score": metric.score,
+                        "reason": metric.reason,
+                        "result_detail": metric.result_detail,
+                        "config": metric.config,
+                        "start_time": metric.start_time,
+                        "end_time": metric.end_time,
+                        "duration": metric.duration,
+                        "timestamp": metric.timestamp,
+                    }
+                    for metric in trace.metrics
+                ],
+            }
+        )
+    except SQLAlchemyError as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/api/traces/<int:trace_id>", methods=["GET"])
+@_cached(_trace_version)
 def get_trace(trace_id):
     start_time = time.time()
     try:
         with Session() as session:
-            trace = (
-                session.query(TraceModel)
-                .options(
-                    selectinload(TraceModel.agent_calls).selectinload(
-                        AgentCallModel.llm_calls
-                    ),
-                    selectinload(TraceModel.agent_calls).selectinload(
-                        AgentCallModel.tool_calls
-                    ),
-                    selectinload(TraceModel.agent_calls).selectinload(
-                        AgentCallModel.user_interactions
-                    ),
-                    selectinload(TraceModel.agent_calls).selectinload(
-                        AgentCallModel.errors
-                    ),
-                    selectinload(TraceModel.llm_calls),
-                    selectinload(TraceModel.tool_calls),
-                    selectinload(TraceModel.user_interactions),
-                    selectinload(TraceModel.errors),
-                    selectinload(TraceModel.system_info),
-                    selectinload(TraceModel.metrics),
-                )
-                .get(trace_id)
-            )
+            trace = _load_trace(session, trace_id)
+        if trace is None:
+            return jsonify({"error": "Trace not found"}), 404
+
+        # Spans are nested under the agent that made them; errors under
+        # the span that raised them.
+        by_agent = defaultdict(lambda: {"user_interactions": [], "errors": []})
+        llm_errors = defaultdict(list)
+        tool_errors = defaultdict(list)
+        trace_errors = []
+        for error in trace.errors:
+            formatted = _format_error(error)
+            if error.llm_call_id is not None:
+                llm_errors[error.llm_call_id].append(formatted)
+            elif error.tool_call_id is not None:
+                tool_errors[error.tool_call_id].append(formatted)
+            if error.agent_id is not None:
+                by_agent[error.agent_id]["errors"].append(formatted)
+            elif error.tool_call_id is None and error.llm_call_id is None:
+                trace_errors.append(formatted)
+
+        for interaction in trace.user_interactions:
+            by_agent[interaction.agent_id]["user_interactions"].append(interaction)
+
+        # Spans are read and formatted a page at a time while the response
+        # is written, each table in one pass over the agents in their order
+        agent_ids = [call.id for call in trace.agent_calls] + [None]
+        llm_groups = _span_groups(LLMCallModel, trace_id, "agent_id", agent_ids)
+        tool_groups = _span_groups(ToolCallModel, trace_id, "agent_id", agent_ids)
+
+        def llm_calls(agent_id):
+            for call in llm_groups[agent_id]:
+                formatted = _format_llm_call(call)
+                formatted["errors"] = llm_errors[call.id]
+                yield formatted
+
+        def tool_calls(agent_id):
+            for call in tool_groups[agent_id]:
+                formatted = _format_tool_call(call)
+                formatted["errors"] = tool_errors[call.id]
+                yield formatted
+
+        def spans(agent_id):
+            group = by_agent[agent_id]
+            return {
+                "llm_calls": llm_calls(agent_id),
+                "tool_calls": tool_calls(agent_id),
+                "user_interactions": (
+                    _format_user_interaction(interaction)
+                    for interaction in group["user_interactions"]
+                ),
+                "errors": group["errors"],
+            }
+
+        unassigned = spans(None)
+        response = StreamedJSON(
+            {
+                "id": trace.id,
+                "project_id": trace.project_id,
+                "start_time": trace.start_time,
+                "end_time": trace.end_time,
+                "duration": trace.duration,
+                "agent_calls": (
+                    {
+                        "id": call.id,
+                        "name": call.name,
+                        "start_time": call.start_time,
+                        "end_time": call.end_time,
+                        **spans(call.id),
+                    }
+                    for call in trace.agent_calls
+                ),
+                "llm_calls": unassigned["llm_calls"],
+                "tool_calls": unassigned["tool_calls"],
+                "user_interactions": unassigned["user_interactions"],
+                "errors": trace_errors,
+                "system_info": _format_system_info(trace.system_info),
+            }
+        )
+        duration = time.time() - start_time
+        logging.info(f"get_trace({trace_id}) loaded in {duration:.2f} seconds")
+        return response
+    except SQLAlchemyError as e:
+        duration = time.time() - start_time
+        logging.error(
+            f"get_trace({trace_id}) failed after {duration:.2f} seconds: {str(e)}"
+        )
+        return jsonify({"error": str(e)}), 500
+
+
+def _span_status(span, error_count):
+    if error_count:
+        return "error"
+    return "ok" if span.end_time is not None else "running"
+
+
+@app.route("/api/traces/<int:trace_id>/skeleton", methods=["GET"])
+@_cached(_trace_version)
+def get_trace_skeleton(trace_id):
+    """The span tree of a trace, nested as by /api/traces/<id>, with the
+    timing, cost and status of each span but none of its payloads.
+
+    Payloads are fetched span by span from
+    /api/traces/<id>/spans/<kind>/<span_id>.
+    """
+    try:
+        with Session() as session:
+            trace = session.get(TraceModel, trace_id)
             if trace is None:
                 return jsonify({"error": "Trace not found"}), 404
 
-            def format_agent_call(agent_call):
-                return {
-                    "id": agent_call.id,
-                    "name": agent_call.name,
-                    "start_time": agent_call.start_time,
-                    "end_time": agent_call.end_time,
-                    "llm_calls": [
-                        format_llm_call(call) for call in agent_call.llm_calls
-                    ],
-                    "tool_calls": [
-                        format_tool_call(call) for call in agent_call.tool_calls
-                    ],
-                    "user_interactions": [
-                        format_user_interaction(ui)
-                        for ui in agent_call.user_interactions
-                    ],
-                    "errors": [format_error(error) for error in agent_call.errors],
-                }
+            def rows(*columns):
+                model = columns[0].class_
+                return session.execute(
+                    select(*columns)
+                    .where(model.trace_id == trace_id)
+                    .order_by(model.id)
+                ).all()
+
+            agent_calls = rows(
+                AgentCallModel.id,
+                AgentCallModel.name,
+                AgentCallModel.start_time,
+                AgentCallModel.end_time,
+            )
+            llm_calls = rows(
+                LLMCallModel.id,
+                LLMCallModel.agent_id,
+                LLMCallModel.name,
+                LLMCallModel.model,
+                LLMCallModel.start_time,
+                LLMCallModel.end_time,
+                LLMCallModel.duration,
+                LLMCallModel.token_usage,
+                LLMCallModel.cost,
+                LLMCallModel.time_to_first_token,
+            )
+            tool_calls = rows(
+                ToolCallModel.id,
+                ToolCallModel.agent_id,
+                ToolCallModel.name,
+                ToolCallModel.start_time,
+                ToolCallModel.end_time,
+                ToolCallModel.duration,
+            )
+            interactions = rows(
+                UserInteractionModel.id,
+                UserInteractionModel.agent_id,
+                UserInteractionModel.interaction_type,
+                UserInteractionModel.timestamp,
+            )
+            errors = rows(
+                ErrorModel.id,
+                ErrorModel.agent_id,
+                ErrorModel.llm_call_id,
+                ErrorModel.tool_call_id,
+                ErrorModel.error_type,
+                ErrorModel.timestamp,
+            )
 
-            def format_llm_call(call):
-                return {
+        by_agent = defaultdict(
+            lambda: {
+                "llm_calls": [],
+                "tool_calls": [],
+                "user_interactions": [],
+                "errors": [],
+            }
+        )
+        llm_errors = defaultdict(int)
+        tool_errors = defaultdict(int)
+        trace_errors = []
+        for error in errors:
+            formatted = {
+                "id": error.id,
+                "error_type": error.error_type,
+                "timestamp": error.timestamp,
+            }
+            if error.llm_call_id is not None:
+                llm_errors[error.llm_call_id] += 1
+            elif error.tool_call_id is not None:
+                tool_errors[error.tool_call_id] += 1
+            if error.agent_id is not None:
+                by_agent[error.agent_id]["errors"].append(formatted)
+            elif error.tool_call_id is None and error.llm_call_id is None:
+                trace_errors.append(formatted)
+
+        for call in llm_calls:
+            by_agent[call.agent_id]["llm_calls"].append(
+                {
                     "id": call.id,
                     "name": call.name,
                     "model": call.model,
-                    "input_prompt": call.input_prompt,
-                    "output": call.output,
-                    "tool_call": call.tool_call,
                     "start_time": call.start_time,
                     "end_time": call.end_time,
                     "duration": call.duration,
+                    "time_to_first_token": call.time_to_first_token,
                     "token_usage": call.token_usage,
                     "cost": call.cost,
-                    "memory_used": call.memory_used,
-                    "errors": [format_error(error) for error in call.errors],
-                    # "user_interactions": [
-                    #     format_user_interaction(ui) for ui in call.user_interactions
-                    # ],
+                    "error_count": llm_errors[call.id],
+                    "status": _span_status(call, llm_errors[call.id]),
                 }
-
-            def format_tool_call(call):
-                return {
+            )
+        for call in tool_calls:
+            by_agent[call.agent_id]["tool_calls"].append(
+                {
                     "id": call.id,
                     "name": call.name,
-                    "input_parameters": call.input_parameters,
-                    "output": call.output,
                     "start_time": call.start_time,
                     "end_time": call.end_time,
                     "duration": call.duration,
-                    "memory_used": call.memory_used,
-                    "network_calls": call.network_calls,
-                    "errors": [format_error(error) for error in call.errors],
-                    # "user_interactions": [
-                    #     format_user_interaction(ui) for ui in call.user_interactions
-                    # ],
-                }
-
-            def format_user_interaction(ui):
-                return {
-                    "id": ui.id,
-                    "interaction_type": ui.interaction_type,
-                    "content": ui.content,
-                    "timestamp": ui.timestamp,
-                }
-
-            def format_error(error):
-                return {
-                    "id": error.id,
-                    "error_type": error.error_type,
-                    "error_message": error.error_message,
-                    "timestamp": error.timestamp,
+                    "error_count": tool_errors[call.id],
+                    "status": _span_status(call, tool_errors[call.id]),
                 }
-
-            return jsonify(
+            )
+        for interaction in interactions:
+            by_agent[interaction.agent_id]["user_interactions"].append(
                 {
-                    "id": trace.id,
-                    "project_id": trace.project_id,
-                    "start_time": trace.start_time,
-                    "end_time": trace.end_time,
-                    "duration": trace.duration,
-                    "agent_calls": [
-                        format_agent_call(call) for call in trace.agent_calls
-                    ],
-                    "llm_calls": [
-                        format_llm_call(call)
-                        for call in trace.llm_calls
-                        if call.agent_id is None
-                    ],
-                    "tool_calls": [
-                        format_tool_call(call)
-                        for call in trace.tool_calls
-                        if call.agent_id is None
-                    ],
-                    "user_interactions": [
-                        format_user_interaction(ui)
-                        for ui in trace.user_interactions
-                        if ui.agent_id is None
-                    ],
-                    "errors": [
-                        format_error(error)
-                        for error in trace.errors
-                        if error.agent_id is None
-                        and error.tool_call_id is None
-                        and error.llm_call_id is None
-                    ],
-                    "system_info": (
-                        {
-                            "os_name": trace.system_info.os_name,
-                            "os_version": trace.system_info.os_version,
-                            "python_version": trace.system_info.python_version,
-                            "cpu_info": trace.system_info.cpu_info,
-                            "gpu_info": trace.system_info.gpu_info,
-                            "disk_info": trace.system_info.disk_info,
-                            "memory_total": trace.system_info.memory_total,
-                            "installed_packages": trace.system_info.installed_packages,
-                        }
-                        if trace.system_info
-                        else None
-                    ),
+                    "id": interaction.id,
+                    "interaction_type": interaction.interaction_type,
+                    "timestamp": interaction.timestamp,
                 }
             )
-            end_time = time.time()
-            duration = end_time - start_time
-            logging.info(f"get_trace({trace_id}) took {duration:.2f} seconds")
 
-            return response
+        unassigned = by_agent[None]
+        return jsonify(
+            {
+                "id": trace.id,
+                "project_id": trace.project_id,
+                "start_time": trace.start_time,
+                "end_time": trace.end_time,
+                "duration": trace.duration,
+                "total_cost": trace.total_cost,
+                "total_tokens": trace.total_tokens,
+                "agent_calls": [
+                    {
+                        "id": call.id,
+                        "name": call.name,
+                        "start_time": call.start_time,
+                        "end_time": call.end_time,
+                        **by_agent[call.id],
+                    }
+                    for call in agent_calls
+                ],
+                "llm_calls": unassigned["llm_calls"],
+                "tool_calls": unassigned["tool_calls"],
+                "user_interactions": unassigned["user_interactions"],
+                "errors": trace_errors,
+            }
+        )
     except SQLAlchemyError as e:
-        end_time = time.time()
-        duration = end_time - start_time
-        logging.error(
-            f"get_trace({trace_id}) failed after {duration:.2f} seconds: {str(e)}"
+        return jsonify({"error": str(e)}), 500
+
+
+# Span kinds served by get_span: model, formatter, error column
+SPAN_KINDS = {
+    "llm_call": (LLMCallModel, _format_llm_call, ErrorModel.llm_call_id),
+    "tool_call": (ToolCallModel, _format_tool_call, ErrorModel.tool_call_id),
+    "user_interaction": (UserInteractionModel, _format_user_interaction, None),
+    "error": (ErrorModel, _format_error, None),
+}
+
+
+@app.route(
+    "/api/traces/<int:trace_id>/spans/<string:kind>/<int:span_id>",
+    methods=["GET"],
+)
+@_cached(_trace_version)
+def get_span(trace_id, kind, span_id):
+    """A span with its payloads, formatted as in /api/traces/<id>."""
+    if kind not in SPAN_KINDS:
+        return jsonify({"error": f"Unknown span kind {kind!r}"}), 404
+    model, format_span, error_column = SPAN_KINDS[kind]
+    try:
+        with Session() as session:
+            owner = session.scalar(select(model.trace_id).where(model.id == span_id))
+            if owner != trace_id:
+                return jsonify({"error": "Span not found"}), 404
+            span = TraceLoader(session, decode=False).load_span(model, span_id)
+            formatted = format_span(span)
+            if error_column is not None:
+                formatted["errors"] = [
+                    _format_error(error)
+                    for error in session.scalars(
+                        select(ErrorModel)
+                        .where(error_column == span_id)
+                        .order_by(ErrorModel.id)
+                    )
+                ]
+        return jsonify(formatted)
+    except SQLAlchemyError as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Seconds between two looks at a streamed trace, and between keep-alives
+STREAM_POLL_INTERVAL = 0.5
+STREAM_KEEPALIVE_INTERVAL = 15
+# Milliseconds the browser waits before reconnecting a dropped stream
+STREAM_RETRY = 2000
+
+# Threads serving requests. Each open trace stream holds one for as long as
+# it is open, so at most MAX_TRACE_STREAMS streams are served at once and
+# further ones are turned away, leaving the other threads to the rest of
+# the dashboard.
+SERVER_THREADS = int(os.environ.get("AGENTNEO_DASHBOARD_THREADS", "16"))
+MAX_TRACE_STREAMS = int(
+    os.environ.get("AGENTNEO_DASHBOARD_MAX_STREAMS", str(SERVER_THREADS // 2))
+)
+# Seconds a client turned away is asked to wait before trying again
+STREAM_BUSY_RETRY_AFTER = 10
+
+_open_streams = 0
+_open_streams_lock = threading.Lock()
+
+
+def _open_stream():
+    """Count a new trace stream in, or return False if MAX_TRACE_STREAMS
+    are already open."""
+    global _open_streams
+    with _open_streams_lock:
+        if _open_streams >= MAX_TRACE_STREAMS:
+            return False
+        _open_streams += 1
+        return True
+
+
+def _close_stream():
+    global _open_streams
+    with _open_streams_lock:
+        _open_streams -= 1
+
+
+def _format_agent_call(call):
+    return {
+        "id": call.id,
+        "name": call.name,
+        "start_time": call.start_time,
+        "end_time": call.end_time,
+    }
+
+
+def _format_streamed_span(kind, span):
+    if kind == "agent_call":
+        return _format_agent_call(span)
+    formatted = SPAN_KINDS[kind][1](span)
+    # Where the span belongs in the trace tree
+    formatted["agent_id"] = span.agent_id
+    if kind == "error":
+        formatted["llm_call_id"] = span.llm_call_id
+        formatted["tool_call_id"] = span.tool_call_id
+    return formatted
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+
+
+@app.route("/api/traces/<int:trace_id>/stream", methods=["GET"])
+def stream_trace(trace_id):
+    """Server-Sent Events of the spans of a trace as they are written.
+
+    The stream starts with the spans recorded so far. Each span is an event
+    named after its kind (agent_call, llm_call, tool_call,
+    user_interaction, or trace_error, since EventSource reserves 'error'),
+    formatted as in /api/traces/<id> plus its agent_id. An 'end' event
+    with the trace's totals closes the stream once the trace has ended.
+
+    Answers 503 with a Retry-After header while MAX_TRACE_STREAMS streams
+    are open.
+    """
+    try:
+        with Session() as session:
+            if session.get(TraceModel, trace_id) is None:
+                return jsonify({"error": "Trace not found"}), 404
+    except SQLAlchemyError as e:
+        return jsonify({"error": str(e)}), 500
+    if not _open_stream():
+        response = jsonify({"error": "Too many open trace streams"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(STREAM_BUSY_RETRY_AFTER)
+        return response
+
+    def events():
+        tail = TraceTail(trace_id)
+        yield f"retry: {STREAM_RETRY}\n\n"
+        quiet = 0.0
+        while True:
+            try:
+                with Session() as session:
+                    changes = tail.poll(session)
+            except SQLAlchemyError as e:
+                # e.g. the database is locked by a writer; try again
+                logging.warning(f"stream_trace({trace_id}) poll failed: {e}")
+                changes = []
+            if changes is None:
+                return
+            for kind, span in changes:
+                event = "trace_error" if kind == "error" else kind
+                yield _sse(event, _format_streamed_span(kind, span))
+            if tail.finished:
+                yield _sse(
+                    "end",
+                    {
+                        "id": trace_id,
+                        "end_time": tail.trace.end_time,
+                        "duration": tail.trace.duration,
+                        "total_cost": tail.trace.total_cost,
+                        "total_tokens": tail.trace.total_tokens,
+                    },
+                )
+                return
+            quiet = 0.0 if changes else quiet + STREAM_POLL_INTERVAL
+            if quiet >= STREAM_KEEPALIVE_INTERVAL:
+                yield ": keep-alive\n\n"
+                quiet = 0.0
+            time.sleep(STREAM_POLL_INTERVAL)
+
+    response = app.response_class(events(), mimetype="text/event-stream")
+    # Called by the server once the stream ends or the client goes away
+    response.call_on_close(_close_stream)
+    response.headers["Cache-Control"] = "no-cache"
+    # Keep reverse proxies from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/api/blobs/<string:digest>", methods=["GET"])
+def get_blob(digest):
+    try:
+        with Session() as session:
+            payloads = load_blobs(session, [digest])
+        if digest not in payloads:
+            return jsonify({"error": "Blob not found"}), 404
+        return jsonify(
+            {"hash": digest, "content": as_text(payloads[digest])}
         )
+    except SQLAlchemyError as e:
         return jsonify({"error": str(e)}), 500
-    
+
+
+METRIC_SORT_FIELDS = {
+    "id": MetricModel.id,
+    "trace_id": MetricModel.trace_id,
+    "timestamp": MetricModel.timestamp,
+    "score": func.coalesce(MetricModel.score, 0.0),
+}
 
 
 @app.route("/api/projects/<int:project_id>/evaluation", methods=["GET"])
+@_cached(_project_version)
 def get_evaluation_data(project_id):
     trace_id = request.args.get('trace_id')
+    metric_name = request.args.get('metric_name')
     try:
+        page = Page(request.args, METRIC_SORT_FIELDS, default_sort="id")
         with Session() as session:
             # First get all traces for the project
             trace_ids = session.query(TraceModel.id).filter(TraceModel.project_id == project_id)
@@ -460,10 +1107,14 @@ def get_evaluation_data(project_id):
             
             if trace_id and trace_id != 'all':
                 query = query.filter(MetricModel.trace_id == trace_id)
+            if metric_name:
+                query = query.filter(MetricModel.metric_name == metric_name)
             
-            metrics = query.all()
+            query = page.apply(query, MetricModel.id)
+            rows, next_cursor = page.split(query.all(), lambda row: row[0].id)
+            metrics = [metric for metric, _ in rows]
             
-            return jsonify([{
+            return paged_response(jsonify([{
                 'trace_id': metric.trace_id,
                 'metric_name': metric.metric_name,
                 'score': metric.score,
@@ -474,7 +1125,9 @@ def get_evaluation_data(project_id):
                 'end_time': metric.end_time,
                 'duration': metric.duration,
                 'timestamp': metric.timestamp
-            } for metric in metrics])
+            } for metric in metrics]), next_cursor)
+    except InvalidQuery as e:
+        return jsonify({"error": str(e)}), 400
     except SQLAlchemyError as e:
         return jsonify({"error": str(e)}), 500
 
@@ -488,12 +1141,17 @@ def health_check():
 @app.route("/api/cache/clear", methods=["POST"])
 def clear_cache():
     try:
-        cache.clear()
+        response_cache.clear()
         return jsonify({"message": "Cache cleared successfully"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/cache/stats", methods=["GET"])
+def get_cache_stats():
+    return jsonify(response_cache.stats())
+
+
 @app.route("/api/port")
 def get_port():
     return jsonify({"port": os.environ.get("AGENTNEO_DASHBOARD_PORT", "3000")})
@@ -522,19 +1180,39 @@ def shutdown():
     return jsonify({"message": "Server shutting down..."}), 200
 
 
+def _prune_periodically(retention_days):
+    while True:
+        try:
+            prune_raw_spans(engine, retention_days)
+        except SQLAlchemyError as e:
+            logging.warning(f"Pruning old spans failed: {e}")
+        time.sleep(RETENTION_INTERVAL)
+
+
 def main():
     import argparse
 
     parser = argparse.ArgumentParser(description="Dashboard Server")
     parser.add_argument("--port", type=int, default=3000, help="Port number")
+    parser.add_argument(
+        "--retention-days",
+        type=float,
+        default=os.environ.get("AGENTNEO_RETENTION_DAYS"),
+        help="Prune the spans of traces older than this many days",
+    )
     args = parser.parse_args()
 
     port = args.port
     os.environ["AGENTNEO_DASHBOARD_PORT"] = str(port)
 
+    if args.retention_days is not None:
+        threading.Thread(
+            target=_prune_periodically, args=(args.retention_days,), daemon=True
+        ).start()
+
     # Start the server
     logging.info(f"Starting dashboard server on port {port}")
-    serve(app, host="0.0.0.0", port=port)
+    serve(app, host="0.0.0.0", port=port, threads=SERVER_THREADS)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,180 @@
+"""Cursor pagination of the dashboard's list endpoints.
+
+A page is requested with ``?limit=<n>`` and, for the pages after the first,
+``&cursor=<token>`` where the token is the ``X-Next-Cursor`` header of the
+previous page; the header is absent on the last page. ``?sort=<field>``
+orders by one of the fields an endpoint allows, descending with a leading
+``-``. Pages are cut by the sort value and id of the last row (keyset
+pagination), so a page costs the same wherever it is in the list and rows
+inserted meanwhile don't shift the pages.
+
+Without ``limit`` the whole list is returned, as before.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import DateTime, and_, or_
+
+# Largest page served, whatever limit is asked for
+MAX_PAGE_SIZE = 1000
+
+CURSOR_HEADER = "X-Next-Cursor"
+
+# Label of the sort value column added to a paged query
+SORT_KEY = "sort_key"
+
+
+class InvalidQuery(ValueError):
+    """A query parameter that can't be used; reported as a 400."""
+
+
+def parse_datetime(args, name) -> Optional[datetime]:
+    value = args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidQuery(f"{name} must be an ISO 8601 datetime")
+
+
+def parse_float(args, name) -> Optional[float]:
+    value = args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise InvalidQuery(f"{name} must be a number")
+
+
+def parse_bool(args, name) -> Optional[bool]:
+    value = args.get(name)
+    if value in (None, ""):
+        return None
+    value = value.lower()
+    if value in ("1", "true", "yes"):
+        return True
+    if value in ("0", "false", "no"):
+        return False
+    raise InvalidQuery(f"{name} must be true or false")
+
+
+def _encode_cursor(sort, value, row_id) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    data = json.dumps([sort, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(token):
+    try:
+        sort, value, row_id = json.loads(base64.urlsafe_b64decode(token))
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidQuery("Malformed cursor")
+    return sort, value, row_id
+
+
+class Page:
+    """The page asked for by the query parameters ``args``.
+
+    Args:
+        args: The request's query parameters.
+        sort_fields: SQL expressions that may be sorted on, by name. Nullable
+            columns should be coalesced, as rows are compared by value.
+        default_sort: Sort applied when none is given, e.g. '-start_time'.
+    """
+
+    def __init__(self, args, sort_fields: Dict[str, object], default_sort: str):
+        sort = args.get("sort") or default_sort
+        self.descending = sort.startswith("-")
+        self.sort = sort.lstrip("-")
+        if self.sort not in sort_fields:
+            allowed = ", ".join(sorted(sort_fields))
+            raise InvalidQuery(f"sort must be one of {allowed}")
+        self.sort_expression = sort_fields[self.sort]
+
+        limit = args.get("limit")
+        if limit in (None, ""):
+            self.limit = None
+        else:
+            try:
+                self.limit = int(limit)
+            except ValueError:
+                raise InvalidQuery("limit must be an integer")
+            if self.limit < 1:
+                raise InvalidQuery("limit must be positive")
+            self.limit = min(self.limit, MAX_PAGE_SIZE)
+
+        self.after = None
+        token = args.get("cursor")
+        if token:
+            sort, value, row_id = _decode_cursor(token)
+            if sort != self._cursor_sort():
+                raise InvalidQuery("cursor belongs to a different sort")
+            if value is not None and isinstance(self.sort_expression.type, DateTime):
+                try:
+                    value = datetime.fromisoformat(value)
+                except (TypeError, ValueError):
+                    raise InvalidQuery("Malformed cursor")
+            self.after = (value, row_id)
+
+    def _cursor_sort(self):
+        # Ascending and descending pages of a field don't share cursors
+        return f"{self.sort}.desc" if self.descending else self.sort
+
+    def apply(self, query, id_column):
+        """Order ``query``, skip to the cursor and limit it to the page plus
+        one row, which tells whether there is a next page.
+
+        The sort value is added as the last column of the rows, labelled
+        SORT_KEY.
+        """
+        key = self.sort_expression
+        query = query.add_columns(key.label(SORT_KEY))
+        if self.after is not None:
+            value, row_id = self.after
+            if self.descending:
+                query = query.filter(
+                    or_(key < value, and_(key == value, id_column < row_id))
+                )
+            else:
+                query = query.filter(
+                    or_(key > value, and_(key == value, id_column > row_id))
+                )
+        if self.descending:
+            query = query.order_by(key.desc(), id_column.desc())
+        else:
+            query = query.order_by(key.asc(), id_column.asc())
+        if self.limit is not None:
+            query = query.limit(self.limit + 1)
+        return query
+
+    def split(self, rows, row_id):
+        """Return the page's rows and the cursor of the next page, or None.
+
+        ``row_id(row)`` gives the id of a row of the query.
+        """
+        if self.limit is None or len(rows) <= self.limit:
+            return rows, None
+        rows = rows[: self.limit]
+        last = rows[-1]
+        return rows, _encode_cursor(
+            self._cursor_sort(), last._mapping[SORT_KEY], row_id(last)
+        )
+
+
+def without_sort_key(row) -> dict:
+    """The columns of a paged row, as a dict."""
+    return {name: value for name, value in row._mapping.items() if name != SORT_KEY}
+
+
+def paged_response(response, next_cursor):
+    """Add the ``X-Next-Cursor`` header to a page's response."""
+    if next_cursor is not None:
+        response.headers[CURSOR_HEADER] = next_cursor
+    return response
@@ -0,0 +1,113 @@
+"""In-memory cache of the dashboard's JSON responses.
+
+Responses are kept with the version of the data they were built from (see
+:mod:`agentneo.data.trace_versions`) and only served while that version is
+current, so a finished trace is served from memory while a running one is
+rebuilt after each write. The cache is a least-recently-used one bounded
+by the total size of the bodies it holds, compressed variants included.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Bookkeeping bytes counted per entry on top of its bodies
+ENTRY_OVERHEAD = 512
+
+
+class CachedResponse:
+    """A cached body, with the variants of it compressed so far by
+    content coding."""
+
+    __slots__ = ("version", "body", "headers", "encoded")
+
+    def __init__(self, version, body: bytes, headers: Tuple[Tuple[str, str], ...]):
+        self.version = version
+        self.body = body
+        self.headers = headers
+        self.encoded: Dict[str, bytes] = {}
+
+    @property
+    def size(self) -> int:
+        return (
+            len(self.body)
+            + sum(len(data) for data in self.encoded.values())
+            + ENTRY_OVERHEAD
+        )
+
+
+class ResponseCache:
+    """LRU cache of response bodies, holding at most ``max_bytes``.
+
+    Thread-safe; responses larger than the whole cache are not stored.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version) -> Optional[CachedResponse]:
+        """The response stored under ``key`` if it was built from
+        ``version`` of the data, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body: bytes, headers=()) -> CachedResponse:
+        """Store a response and return its entry."""
+        entry = CachedResponse(version, body, tuple(headers))
+        with self._lock:
+            self._discard(key)
+            if entry.size <= self.max_bytes:
+                self._entries[key] = entry
+                self._size += entry.size
+                self._evict()
+        return entry
+
+    def add_encoding(self, key, entry: CachedResponse, encoding: str, data: bytes):
+        """Keep ``data``, the body of ``entry`` compressed with
+        ``encoding``, along with it."""
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                entry.encoded[encoding] = data
+                return
+            self._size -= entry.size
+            entry.encoded[encoding] = data
+            self._size += entry.size
+            self._evict()
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
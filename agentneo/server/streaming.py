@@ -0,0 +1,78 @@
+"""Incremental JSON encoding of large dashboard responses.
+
+A view returns a :class:`StreamedJSON` holding the document, in which the
+long arrays (the spans of a trace) are generators. The document is
+written out chunk by chunk as the generators yield, so only one span at
+a time exists in its formatted form. The bytes are the same ``jsonify``
+produces for the equivalent document.
+"""
+
+import json
+from types import GeneratorType
+
+# Encoded text buffered before a chunk is handed to the server
+CHUNK_SIZE = 64 * 1024
+
+
+class StreamedJSON:
+    """A JSON document to be encoded incrementally; any generator in it is
+    written out as an array."""
+
+    def __init__(self, document):
+        self.document = document
+
+
+def _encoder(json_provider):
+    return json.JSONEncoder(
+        default=json_provider.default,
+        ensure_ascii=json_provider.ensure_ascii,
+        sort_keys=json_provider.sort_keys,
+        separators=(",", ":"),
+    )
+
+
+def _is_lazy(value):
+    if isinstance(value, GeneratorType):
+        return True
+    return isinstance(value, dict) and any(_is_lazy(item) for item in value.values())
+
+
+def _iter_value(value, encoder):
+    if not _is_lazy(value):
+        # Encoded in one go by the C encoder
+        yield encoder.encode(value)
+    elif isinstance(value, dict):
+        yield "{"
+        items = value.items()
+        if encoder.sort_keys:
+            items = sorted(items, key=lambda item: item[0])
+        for i, (key, item) in enumerate(items):
+            if i:
+                yield ","
+            yield encoder.encode(key)
+            yield ":"
+            yield from _iter_value(item, encoder)
+        yield "}"
+    elif isinstance(value, GeneratorType):
+        yield "["
+        for i, item in enumerate(value):
+            if i:
+                yield ","
+            yield from _iter_value(item, encoder)
+        yield "]"
+
+
+def iter_json(document, json_provider, chunk_size: int = CHUNK_SIZE):
+    """Yield the UTF-8 encoded JSON of ``document`` in chunks of about
+    ``chunk_size`` bytes, encoded as ``json_provider`` (``app.json``)
+    encodes compact responses."""
+    encoder = _encoder(json_provider)
+    buffer, size = [], 0
+    for text in _iter_value(document, encoder):
+        buffer.append(text)
+        size += len(text)
+        if size >= chunk_size:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    buffer.append("\n")
+    yield "".join(buffer).encode("utf-8")
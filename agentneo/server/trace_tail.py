@@ -0,0 +1,103 @@
+"""Following the spans of a trace as they are written.
+
+The tracer may run in another process than the dashboard, so changes are
+picked up from the database: the trace's version (see
+:mod:`agentneo.data.trace_versions`) tells whether anything was written
+since the last poll, and only then are the span ids of the trace listed,
+from the ``trace_id`` indexes, to load the rows not seen yet. Span ids are
+handed out when a span starts but its row is written when it ends, so
+new rows are found by id set rather than by a high-water mark.
+"""
+
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select
+
+from ..data import (
+    AgentCallModel,
+    ErrorModel,
+    LLMCallModel,
+    ToolCallModel,
+    TraceLoader,
+    TraceModel,
+    UserInteractionModel,
+)
+
+# Polled in this order, so that agents come before their spans and spans
+# before their errors
+SPAN_MODELS = {
+    "agent_call": AgentCallModel,
+    "llm_call": LLMCallModel,
+    "tool_call": ToolCallModel,
+    "user_interaction": UserInteractionModel,
+    "error": ErrorModel,
+}
+
+
+class TraceTail:
+    """Finds the spans of a trace written since the previous poll.
+
+    The first poll returns every span recorded so far. Agent calls, whose
+    row is written when they start, are returned again once they end.
+    """
+
+    def __init__(self, trace_id: int):
+        self.trace_id = trace_id
+        self.version = None
+        # The trace's row as of the last poll
+        self.trace = None
+        self._seen = {kind: set() for kind in SPAN_MODELS}
+        self._ended_agents = set()
+
+    @property
+    def finished(self) -> bool:
+        """Whether the trace has ended, so that no span will follow."""
+        return self.trace is not None and self.trace.end_time is not None
+
+    def poll(self, session) -> Optional[List[Tuple[str, object]]]:
+        """``(kind, record)`` of each new span, or None if the trace does
+        not exist."""
+        trace = session.execute(
+            select(
+                TraceModel.version,
+                TraceModel.end_time,
+                TraceModel.duration,
+                TraceModel.total_cost,
+                TraceModel.total_tokens,
+            ).where(TraceModel.id == self.trace_id)
+        ).first()
+        if trace is None:
+            return None
+        self.trace = trace
+        if trace.version == self.version:
+            return []
+        # Read first: spans written meanwhile are found now and again
+        # looked for at the next version, never missed.
+        self.version = trace.version
+
+        loader = TraceLoader(session, decode=False)
+        changes = []
+        for kind, model in SPAN_MODELS.items():
+            if model is AgentCallModel:
+                new = self._changed_agents(session)
+            else:
+                ids = session.scalars(
+                    select(model.id).where(model.trace_id == self.trace_id)
+                )
+                new = set(ids) - self._seen[kind]
+            if new:
+                changes.extend((kind, record) for record in loader.load_spans(model, new))
+                self._seen[kind] |= new
+        return changes
+
+    def _changed_agents(self, session):
+        agents = session.execute(
+            select(AgentCallModel.id, AgentCallModel.end_time).where(
+                AgentCallModel.trace_id == self.trace_id
+            )
+        ).all()
+        ended = {agent.id for agent in agents if agent.end_time is not None}
+        changed = {agent.id for agent in agents} - self._seen["agent_call"]
+        changed |= ended - self._ended_agents
+        self._ended_agents |= ended
+        return changed
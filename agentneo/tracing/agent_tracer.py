@@ -1,5 +1,4 @@
 import asyncio
-import psutil
 import json
 import functools
 from datetime import datetime
@@ -15,6 +14,11 @@ logger.setLevel(logging.DEBUG)
 
 
 class AgentTracerMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Agent calls that have started but not yet finished, by id.
+        self._open_agent_calls = {}
+
     def trace_agent(self, name: str):
         def decorator(func_or_class):
             if isinstance(func_or_class, type):
@@ -33,9 +37,6 @@ class AgentTracerMixin:
                 def wrapped_init(self_instance, *args, **kwargs):
                     self_instance._agent_name = name
                     self_instance._agent_start_time = datetime.now()
-                    self_instance._agent_start_memory = (
-                        psutil.Process().memory_info().rss
-                    )
                     self_instance._agent_tracer = (
                         self  # Use the current tracer instance
                     )
@@ -88,6 +89,7 @@ class AgentTracerMixin:
     def _start_agent_call(self, name, args, kwargs):
         start_time = datetime.now()
         agent_call = AgentCallModel(
+            id=self._next_id(AgentCallModel),
             project_id=self.project_id,
             trace_id=self.trace_id,
             name=name,
@@ -96,51 +98,31 @@ class AgentTracerMixin:
             tool_call_ids=json.dumps([]),
             user_interaction_ids=json.dumps([]),
         )
-        with self.Session() as session:
-            session.add(agent_call)
-            session.commit()
-            return agent_call.id
+        self.writer.add(agent_call)
+        self._open_agent_calls[agent_call.id] = (name, start_time)
+        return agent_call.id
 
     def _end_agent_call(self, agent_id):
-        with self.Session() as session:
-            agent_call = session.query(AgentCallModel).get(agent_id)
-            if agent_call:
-                agent_call.end_time = datetime.now()
-                agent_call.llm_call_ids = json.dumps(
-                    self.current_llm_call_ids.get() or []
-                )
-                agent_call.tool_call_ids = json.dumps(
-                    self.current_tool_call_ids.get() or []
-                )
-                agent_call.user_interaction_ids = json.dumps(
-                    self.current_user_interaction_ids.get() or []
-                )
-
-                try:
-                    session.add(agent_call)
-                    session.commit()
-                    logger.debug(
-                        f"Successfully updated and committed AgentCallModel with id {agent_id}"
-                    )
-                except Exception as e:
-                    logger.error(
-                        f"Error committing AgentCallModel with id {agent_id}: {str(e)}"
-                    )
-                    session.rollback()
-
-                self.trace_data.setdefault("agent_calls", []).append(
-                    {
-                        "id": agent_call.id,
-                        "name": agent_call.name,
-                        "start_time": agent_call.start_time,
-                        "end_time": agent_call.end_time,
-                        "llm_call_ids": agent_call.llm_call_ids,
-                        "tool_call_ids": agent_call.tool_call_ids,
-                        "user_interaction_ids": agent_call.user_interaction_ids,
-                    }
-                )
-            else:
-                print(f"Warning: AgentCallModel with id {agent_id} not found")
+        open_call = self._open_agent_calls.pop(agent_id, None)
+        if open_call is None:
+            print(f"Warning: AgentCallModel with id {agent_id} not found")
+            return
+
+        name, start_time = open_call
+        values = {
+            "end_time": datetime.now(),
+            "llm_call_ids": json.dumps(self.current_llm_call_ids.get() or []),
+            "tool_call_ids": json.dumps(self.current_tool_call_ids.get() or []),
+            "user_interaction_ids": json.dumps(
+                self.current_user_interaction_ids.get() or []
+            ),
+        }
+        self.writer.update(AgentCallModel, agent_id, values)
+        logger.debug(f"Queued update of AgentCallModel with id {agent_id}")
+
+        self.trace_data.setdefault("agent_calls", []).append(
+            {"id": agent_id, "name": name, "start_time": start_time, **values}
+        )
 
     def _trace_agent_call_sync(self, func, name, *args, **kwargs):
         agent_id = self._start_agent_call(name, args, kwargs)
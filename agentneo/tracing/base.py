@@ -1,16 +1,13 @@
 import asyncio
-import platform
-import cpuinfo
+import functools
+import threading
 import json
 import sys
 from pathlib import Path
 import contextvars
 from typing import Optional
 import traceback
-import psutil
-import GPUtil
-import pkg_resources
-from sqlalchemy import create_engine
+from collections import OrderedDict
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime, timedelta
@@ -18,27 +15,82 @@ import logging
 
 
 from ..data import (
-    Base,
+    MessageModel,
     ProjectInfoModel,
     SystemInfoModel,
     ErrorModel,
     TraceModel,
-    LLMCallModel,
+    get_engine,
 )
+from ..data.blob_store import PayloadPolicy
+from ..data.message_store import prompt_marker, split_messages
+from ..data.rollups import roll_up_traces
+from ..data.span_usage import summarize_traces
+from ..data.trace_versions import bump_trace_versions
+from ..utils.serialization import dumps
+from .span_writer import IdAllocator, SpanWriter
+from .system_info import get_system_info
+
+# Seconds stop() waits for the spans of the trace to be written, e.g. while
+# another process holds the database lock
+WRITER_CLOSE_TIMEOUT = 30
+
+# Content hashes of blobs and prompt messages a tracer remembers having
+# queued, each
+STORED_HASHES_LIMIT = 10000
+
+
+class _RecentHashes:
+    """The ``limit`` most recently used hashes. Forgetting one only costs
+    queueing its row again, which the writer then skips as a duplicate."""
+
+    def __init__(self, limit: int = STORED_HASHES_LIMIT):
+        self.limit = limit
+        self._hashes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, digest):
+        with self._lock:
+            if digest not in self._hashes:
+                return False
+            self._hashes.move_to_end(digest)
+            return True
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def add(self, digest):
+        with self._lock:
+            self._hashes[digest] = None
+            self._hashes.move_to_end(digest)
+            if len(self._hashes) > self.limit:
+                self._hashes.popitem(last=False)
 
 
 class BaseTracer:
-    def __init__(self, session):
+    def __init__(self, session, payload_limits=None):
         self.user_session = session
         project_name = session.project_name
 
         # Setup DB
         self.db_path = session.db_path
-        self.engine = create_engine(self.db_path)
-
-        Base.metadata.create_all(self.engine)
+        self.engine = get_engine(self.db_path)
         self.Session = sessionmaker(bind=self.engine)
 
+        # Spans are persisted asynchronously; ids are allocated up front so
+        # callers never wait on a commit to learn them.
+        self.id_allocator = IdAllocator(self.Session)
+        self.writer = SpanWriter(self.Session)
+        # Payloads over their size cap go to the blob store
+        self.payload_policy = PayloadPolicy(payload_limits)
+        self._stored_blobs = _RecentHashes()
+        # Prompt messages are stored once each, see agentneo.data.message_store
+        self._stored_messages = _RecentHashes()
+
+        # Collected once per process in the background; start() only waits
+        # for it if it is already available.
+        get_system_info()
+
         self.project_info = self._get_project(project_name)
         if self.project_info is None:
             raise ValueError(
@@ -59,6 +111,12 @@ class BaseTracer:
 
         self.trace_id = None
         self.trace = None
+        # Whether a trace is between start() and stop()
+        self._running = False
+
+        # Running totals for the current trace, kept as spans are recorded
+        self._totals_lock = threading.Lock()
+        self._trace_totals = self._empty_trace_totals()
 
         # Initialize context variables as instance variables
         self.current_agent_id = contextvars.ContextVar("current_agent_id", default=None)
@@ -98,17 +156,37 @@ class BaseTracer:
         print("Tracing Started.")
 
         # Create a new trace
-        with self.Session() as session:
-            trace = TraceModel(project_id=self.project_id, start_time=datetime.now())
-            session.add(trace)
-            session.commit()
-            self.trace_id = trace.id
-            self.trace = trace
-
-        # Save the system information
-        self._save_system_info()
+        trace = TraceModel(
+            id=self._next_id(TraceModel),
+            project_id=self.project_id,
+            start_time=datetime.now(),
+        )
+        self.writer.add(trace)
+        self.trace_id = trace.id
+        self.trace = trace
+        self._running = True
+        with self._totals_lock:
+            self._trace_totals = self._empty_trace_totals()
+
+        # Save the system information once the snapshot is ready, possibly
+        # after the trace has stopped
+        get_system_info().add_done_callback(
+            functools.partial(self._save_system_info, self.trace_id)
+        )
 
     def stop(self):
+        self._running = False
+        # Everything recorded so far must be on disk before the trace is
+        # finalised. If it is not in time, the writer carries on in the
+        # background and the trace is left unfinished, as if the process
+        # had died, rather than summarised without some of its spans.
+        if not self.writer.close(timeout=WRITER_CLOSE_TIMEOUT):
+            logging.error(
+                f"Trace {self.trace_id} left unfinished: its spans were not "
+                f"written within {WRITER_CLOSE_TIMEOUT}s"
+            )
+            return
+
         with self.Session() as session:
             project = session.query(ProjectInfoModel).get(self.project_id)
             if project is None:
@@ -121,19 +199,18 @@ class BaseTracer:
             trace.end_time = datetime.now()
             trace.duration = (trace.end_time - trace.start_time).total_seconds()
 
+            with self._totals_lock:
+                totals = dict(self._trace_totals)
+            for column, value in totals.items():
+                setattr(trace, column, value)
+            trace_cost = totals["total_cost"]
+            trace_tokens = totals["total_tokens"]
+
             project.end_time = trace.end_time
             if project.duration is None:
                 project.duration = 0
             project.duration += trace.duration  # Accumulate duration
 
-            llm_calls = session.query(LLMCallModel).filter_by(trace_id=self.trace_id).all()
-            trace_cost = sum(
-                sum(json.loads(llm_call.cost).values()) for llm_call in llm_calls
-            )
-            trace_tokens = sum(
-                sum(json.loads(llm_call.token_usage).values()) for llm_call in llm_calls
-            )
-
             # Accumulate costs and tokens instead of overwriting
             if project.total_cost is None:
                 project.total_cost = 0
@@ -143,6 +220,9 @@ class BaseTracer:
                 project.total_tokens = 0
             project.total_tokens += trace_tokens
 
+            summarize_traces(session, [self.trace_id])
+            roll_up_traces(session, [self.trace_id])
+            bump_trace_versions(session, [self.trace_id])
             session.commit()
 
             end_time = trace.end_time
@@ -179,61 +259,79 @@ class BaseTracer:
                 print(f"An error occurred while accessing the database: {e}")
                 raise
 
-    def _save_system_info(self):
-        os_name = platform.system()
-        if os_name == "Darwin":
-            os_version = platform.mac_ver()[0]
-        else:
-            os_version = platform.version()
-
-        # Get GPU information
+    def _save_system_info(self, trace_id, snapshot):
         try:
-            gpus = GPUtil.getGPUs()
-            gpu_info = [
-                {"name": gpu.name, "memory_total": gpu.memoryTotal} for gpu in gpus
-            ]
+            self._write_system_info(trace_id, snapshot.result())
+            if not self._running:
+                # Queued after stop() closed the writer: commit it now
+                # rather than leave a writer thread behind.
+                self.writer.close(timeout=WRITER_CLOSE_TIMEOUT)
         except Exception as e:
-            logging.warning(f"Failed to get GPU information: {e}")
-            gpu_info = None
-
-        # Get disk information
-        disk = psutil.disk_usage("/")
-        disk_info = {
-            "total": disk.total / (1024**3),  # GB
-            "available": disk.free / (1024**3),  # GB
-        }
+            logging.warning(f"Failed to collect system information: {e}")
 
+    def _write_system_info(self, trace_id, info):
+
+        content_hash = SystemInfoModel.hash_content(**info)
         system_info = SystemInfoModel(
+            id=self._next_id(SystemInfoModel),
             project_id=self.project_id,
-            trace_id=self.trace_id,
-            os_name=os_name,
-            os_version=os_version,
-            python_version=platform.python_version(),
-            cpu_info=cpuinfo.get_cpu_info()["brand_raw"],
-            gpu_info=json.dumps(gpu_info) if gpu_info else None,
-            disk_info=json.dumps(disk_info),
-            memory_total=psutil.virtual_memory().total / (1024**3),  # GB
-            installed_packages=json.dumps(
-                {pkg.key: pkg.version for pkg in pkg_resources.working_set}
-            ),
+            trace_id=trace_id,
+            content_hash=content_hash,
+            **info,
         )
+        self.writer.add_unique(system_info, content_hash=content_hash)
+        self.writer.update(TraceModel, trace_id, {"system_info_hash": content_hash})
+
+        self.trace_data["system_info"] = {
+            "os_name": info["os_name"],
+            "os_version": info["os_version"],
+            "python_version": info["python_version"],
+            "cpu_info": info["cpu_info"],
+            "gpu_info": json.loads(info["gpu_info"]) if info["gpu_info"] else None,
+            "disk_info": json.loads(info["disk_info"]),
+            "memory_total": info["memory_total"],
+            "installed_packages": json.loads(info["installed_packages"]),
+        }
 
-        with self.Session() as session:
-            session.add(system_info)
-            session.commit()
+    def _next_id(self, model) -> int:
+        return self.id_allocator.next_id(model)
+
+    def _store_payload(self, field, text):
+        """The text to store in the ``field`` column for a payload."""
+        text, blob = self.payload_policy.apply(field, text)
+        if blob is not None and blob.hash not in self._stored_blobs:
+            self._stored_blobs.add(blob.hash)
+            self.writer.add_unique(blob, hash=blob.hash)
+        return text
+
+    def _store_prompt(self, prompt):
+        """Return ``(input_prompt, input_message_refs)`` for a prompt."""
+        messages = split_messages(prompt)
+        if messages is None:
+            return self._store_payload("input_prompt", dumps(prompt)), None
+        for digest, text in messages:
+            if digest not in self._stored_messages:
+                self._stored_messages.add(digest)
+                content = self._store_payload("input_prompt", text)
+                self.writer.add_unique(
+                    MessageModel(hash=digest, content=content), hash=digest
+                )
+        return prompt_marker(len(messages)), [digest for digest, _ in messages]
+
+    @staticmethod
+    def _empty_trace_totals():
+        return {
+            "total_cost": 0.0,
+            "total_tokens": 0,
+            "llm_call_count": 0,
+            "tool_call_count": 0,
+            "error_count": 0,
+        }
 
-            self.trace_data["system_info"] = {
-                "os_name": system_info.os_name,
-                "os_version": system_info.os_version,
-                "python_version": system_info.python_version,
-                "cpu_info": system_info.cpu_info,
-                "gpu_info": (
-                    json.loads(system_info.gpu_info) if system_info.gpu_info else None
-                ),
-                "disk_info": json.loads(system_info.disk_info),
-                "memory_total": system_info.memory_total,
-                "installed_packages": json.loads(system_info.installed_packages),
-            }
+    def _add_to_trace_totals(self, **increments):
+        with self._totals_lock:
+            for column, value in increments.items():
+                self._trace_totals[column] += value
 
     def _save_to_json(self, log_file_path):
         def default_converter(o):
@@ -251,7 +349,12 @@ class BaseTracer:
             json.dump(self.trace_data, f, indent=2, default=default_converter)
 
     def _log_error(
-        self, error: Exception, call_type: str, call_name: str, call_id: int = None
+        self,
+        error: Exception,
+        call_type: str,
+        call_name: str,
+        call_id: int = None,
+        model: str = None,
     ):
         error_info = {
             "type": call_type,
@@ -277,6 +380,7 @@ class BaseTracer:
 
         # Save error to the database
         error_model = ErrorModel(
+            id=self._next_id(ErrorModel),
             project_id=self.project_id,
             trace_id=self.trace_id,
             agent_id=agent_id,
@@ -284,8 +388,8 @@ class BaseTracer:
             llm_call_id=llm_call_id,
             error_type=call_type,
             error_message=f"{call_name}: {str(error)}",
+            model=model,
             timestamp=error_info["timestamp"],
         )
-        with self.Session() as session:
-            session.add(error_model)
-            session.commit()
+        self.writer.add(error_model)
+        self._add_to_trace_totals(error_count=1)
@@ -0,0 +1,225 @@
+"""Tracing of streamed (``stream=True``) LLM responses.
+
+The stream returned by the provider is wrapped in a transparent proxy that
+hands every chunk straight to the caller and only notes its arrival time.
+Once the stream is exhausted, closed or garbage collected, the chunks are
+assembled into a response shaped like a regular chat completion, so the
+usual result processing applies to it.
+"""
+
+import time
+import weakref
+from types import SimpleNamespace
+
+import wrapt
+
+
+def _get(obj, name, default=None):
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+class StreamRecorder:
+    """Collects the chunks of one streamed LLM call and their timings.
+
+    ``on_finish(recorder, error)`` is called exactly once, when the stream
+    ends, fails or is abandoned.
+    """
+
+    def __init__(self, on_finish, start=None):
+        self.on_finish = on_finish
+        self.start = time.perf_counter() if start is None else start
+        self.first_chunk_at = None
+        self.last_chunk_at = None
+        self.chunks = []
+        self.finished = False
+
+    def add(self, chunk):
+        now = time.perf_counter()
+        if self.first_chunk_at is None:
+            self.first_chunk_at = now
+        self.last_chunk_at = now
+        self.chunks.append(chunk)
+
+    def finish(self, error=None):
+        if self.finished:
+            return
+        self.finished = True
+        self.on_finish(self, error)
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def time_to_first_token(self):
+        """Seconds from the request to the first chunk."""
+        if self.first_chunk_at is None:
+            return None
+        return self.first_chunk_at - self.start
+
+    @property
+    def inter_token_latency(self):
+        """Mean seconds between consecutive chunks."""
+        if self.chunk_count < 2:
+            return None
+        return (self.last_chunk_at - self.first_chunk_at) / (self.chunk_count - 1)
+
+    def assemble(self):
+        """Build a chat-completion-like response from the received chunks."""
+        model = None
+        usage = None
+        content = []
+        finish_reason = None
+        tool_calls = {}
+        for chunk in self.chunks:
+            model = _get(chunk, "model") or model
+            usage = _get(chunk, "usage") or usage
+            for choice in _get(chunk, "choices") or []:
+                if (_get(choice, "index") or 0) != 0:
+                    continue
+                finish_reason = _get(choice, "finish_reason") or finish_reason
+                delta = _get(choice, "delta")
+                if delta is None:
+                    # Legacy completions stream the text itself
+                    content.append(_get(choice, "text") or "")
+                    continue
+                content.append(_get(delta, "content") or "")
+                for tool_call in _get(delta, "tool_calls") or []:
+                    _merge_tool_call(tool_calls, tool_call)
+
+        message = SimpleNamespace(
+            role="assistant",
+            content="".join(content),
+            tool_calls=[tool_calls[index] for index in sorted(tool_calls)] or None,
+            function_call=None,
+        )
+        return SimpleNamespace(
+            model=model,
+            choices=[
+                SimpleNamespace(index=0, message=message, finish_reason=finish_reason)
+            ],
+            usage=usage,
+        )
+
+
+def _merge_tool_call(tool_calls, delta):
+    index = _get(delta, "index") or 0
+    call = tool_calls.get(index)
+    if call is None:
+        call = tool_calls[index] = SimpleNamespace(
+            id=None,
+            type="function",
+            function=SimpleNamespace(name="", arguments=""),
+        )
+    call.id = _get(delta, "id") or call.id
+    function = _get(delta, "function")
+    if function is not None:
+        call.function.name += _get(function, "name") or ""
+        call.function.arguments += _get(function, "arguments") or ""
+
+
+class TracedStream(wrapt.ObjectProxy):
+    """Proxy for a synchronous stream of chunks."""
+
+    def __init__(self, wrapped, recorder):
+        super().__init__(wrapped)
+        self._self_recorder = recorder
+        # Streams that are dropped before the end are recorded as far as
+        # they were read.
+        weakref.finalize(self, recorder.finish)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self.__wrapped__)
+        except StopIteration:
+            self._self_recorder.finish()
+            raise
+        except Exception as e:
+            self._self_recorder.finish(e)
+            raise
+        self._self_recorder.add(chunk)
+        return chunk
+
+    def __enter__(self):
+        if hasattr(self.__wrapped__, "__enter__"):
+            self.__wrapped__.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if hasattr(self.__wrapped__, "__exit__"):
+                return self.__wrapped__.__exit__(exc_type, exc_value, traceback)
+        finally:
+            self._self_recorder.finish(exc_value)
+
+    def close(self):
+        try:
+            if hasattr(self.__wrapped__, "close"):
+                self.__wrapped__.close()
+        finally:
+            self._self_recorder.finish()
+
+
+class TracedAsyncStream(wrapt.ObjectProxy):
+    """Proxy for an asynchronous stream of chunks."""
+
+    def __init__(self, wrapped, recorder):
+        super().__init__(wrapped)
+        self._self_recorder = recorder
+        weakref.finalize(self, recorder.finish)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            chunk = await self.__wrapped__.__anext__()
+        except StopAsyncIteration:
+            self._self_recorder.finish()
+            raise
+        except Exception as e:
+            self._self_recorder.finish(e)
+            raise
+        self._self_recorder.add(chunk)
+        return chunk
+
+    async def __aenter__(self):
+        if hasattr(self.__wrapped__, "__aenter__"):
+            await self.__wrapped__.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        try:
+            if hasattr(self.__wrapped__, "__aexit__"):
+                return await self.__wrapped__.__aexit__(
+                    exc_type, exc_value, traceback
+                )
+        finally:
+            self._self_recorder.finish(exc_value)
+
+    async def aclose(self):
+        try:
+            if hasattr(self.__wrapped__, "aclose"):
+                await self.__wrapped__.aclose()
+            elif hasattr(self.__wrapped__, "close"):
+                await self.__wrapped__.close()
+        finally:
+            self._self_recorder.finish()
+
+
+def is_stream(result, asynchronous=False) -> bool:
+    """Whether ``result`` is a stream of chunks rather than a response."""
+    if asynchronous:
+        return hasattr(result, "__anext__")
+    return hasattr(result, "__next__")
+
+
+def wrap_stream(stream, recorder, asynchronous=False):
+    if asynchronous:
+        return TracedAsyncStream(stream, recorder)
+    return TracedStream(stream, recorder)
@@ -1,22 +1,38 @@
 import asyncio
-import psutil
+from collections import namedtuple
 import json
 import wrapt
 import functools
+import inspect
+import logging
+import time
 from datetime import datetime
 import os
 
 from .user_interaction_tracer import UserInteractionTracer
-from ..utils.trace_utils import calculate_cost, load_model_costs, convert_usage_to_dict
+from .llm_stream import StreamRecorder, is_stream, wrap_stream
+from ..utils.trace_utils import calculate_cost, convert_usage_to_dict
+from ..utils.model_costs import get_model_costs
 from ..utils.llm_utils import extract_llm_output
+from ..utils.serialization import dumps
 from ..data import LLMCallModel
 
 
+# An LLM call in progress
+_LLMSpan = namedtuple(
+    "_LLMSpan",
+    "name args kwargs start_time request_started memory_span agent_id",
+)
+
+
 class LLMTracerMixin:
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.patches = []
-        self.model_costs = load_model_costs()
+
+    @property
+    def model_costs(self):
+        return get_model_costs()
 
     def instrument_llm_calls(self):
         # Use wrapt to register post-import hooks
@@ -51,9 +67,17 @@ class LLMTracerMixin:
     def wrap_method(self, obj, method_name):
         original_method = getattr(obj, method_name)
 
-        @wrapt.decorator
-        def wrapper(wrapped, instance, args, kwargs):
-            return self.trace_llm_call(wrapped, *args, **kwargs)
+        if asyncio.iscoroutinefunction(original_method):
+
+            @wrapt.decorator
+            async def wrapper(wrapped, instance, args, kwargs):
+                return await self.trace_llm_call_async(wrapped, *args, **kwargs)
+
+        else:
+
+            @wrapt.decorator
+            def wrapper(wrapped, instance, args, kwargs):
+                return self.trace_llm_call(wrapped, *args, **kwargs)
 
         wrapped_method = wrapper(original_method)
         setattr(obj, method_name, wrapped_method)
@@ -64,58 +88,176 @@ class LLMTracerMixin:
         if not self.is_active:
             return original_func(*args, **kwargs)
         
-        start_time = datetime.now()
-        start_memory = psutil.Process().memory_info().rss
-
-        agent_id = self.current_agent_id.get()
-        llm_call_name = self.current_llm_call_name.get() or original_func.__name__
+        span = self._start_llm_span(original_func, args, kwargs)
 
         try:
             result = original_func(*args, **kwargs)
+            if inspect.isawaitable(result):
+                # An async method that does not look like one, such as
+                # AsyncOpenAI's chat.completions.create
+                return self._await_llm_result(result, span)
+            return self._handle_llm_result(result, span)
+        except Exception as e:
+            self._log_llm_error(e, span.name, span.kwargs)
+            raise
 
-            end_time = datetime.now()
-            end_memory = psutil.Process().memory_info().rss
-            memory_used = max(0, end_memory - start_memory)
+    async def trace_llm_call_async(self, original_func, *args, **kwargs):
+        """Trace a coroutine LLM call such as ``litellm.acompletion``."""
+        if not self.is_active:
+            return await original_func(*args, **kwargs)
 
-            sanitized_args = self._sanitize_api_keys(args)
-            sanitized_kwargs = self._sanitize_api_keys(kwargs)
+        span = self._start_llm_span(original_func, args, kwargs)
+        try:
+            awaitable = original_func(*args, **kwargs)
+        except Exception as e:
+            self._log_llm_error(e, span.name, span.kwargs)
+            raise
+        return await self._await_llm_result(awaitable, span)
 
-            model_name = self._extract_model_name(sanitized_kwargs)
-            try:
-                model = (
-                    os.path.join("groq", model_name) if result.x_groq else model_name
-                )
-            except:
-                model = model_name
+    async def _await_llm_result(self, awaitable, span):
+        try:
+            result = await awaitable
+            return self._handle_llm_result(result, span, asynchronous=True)
+        except Exception as e:
+            self._log_llm_error(e, span.name, span.kwargs)
+            raise
+
+    def _log_llm_error(self, error, name, kwargs):
+        # With the requested model, so that failures count against it
+        self._log_error(error, "llm", name, model=self._extract_model_name(kwargs))
+
+    def _start_llm_span(self, original_func, args, kwargs):
+        return _LLMSpan(
+            name=self.current_llm_call_name.get() or original_func.__name__,
+            args=args,
+            kwargs=kwargs,
+            start_time=datetime.now(),
+            request_started=time.perf_counter(),
+            memory_span=self.memory_probe.start_span(),
+            agent_id=self.current_agent_id.get(),
+        )
 
-            llm_call = self.process_llm_result(
-                result,
+    def _handle_llm_result(self, result, span, asynchronous=False):
+        if span.kwargs.get("stream") and is_stream(result, asynchronous):
+            # Recorded once the caller has consumed the stream
+            recorder = StreamRecorder(
+                functools.partial(
+                    self._finish_llm_stream,
+                    span.name,
+                    span.args,
+                    span.kwargs,
+                    span.start_time,
+                    span.memory_span,
+                    span.agent_id,
+                    self._llm_call_ids(),
+                ),
+                start=span.request_started,
+            )
+            return wrap_stream(result, recorder, asynchronous)
+
+        end_time = datetime.now()
+        memory_used = self.memory_probe.end_span(span.memory_span)
+
+        llm_call = self._record_llm_call(
+            result,
+            span.name,
+            span.args,
+            span.kwargs,
+            span.start_time,
+            end_time,
+            memory_used,
+            span.agent_id,
+        )
+        self._llm_call_ids().append(llm_call.id)
+
+        return result
+
+    def _finish_llm_stream(
+        self,
+        llm_call_name,
+        args,
+        kwargs,
+        start_time,
+        memory_span,
+        agent_id,
+        llm_call_ids,
+        recorder,
+        error,
+    ):
+        if error is not None:
+            self._log_llm_error(error, llm_call_name, kwargs)
+            return
+        try:
+            llm_call = self._record_llm_call(
+                recorder.assemble(),
                 llm_call_name,
-                model,
-                self._extract_input(sanitized_args, sanitized_kwargs),
+                args,
+                kwargs,
                 start_time,
-                end_time,
-                memory_used,
+                datetime.now(),
+                self.memory_probe.end_span(memory_span),
                 agent_id,
+                stream=recorder,
             )
-
-            # Append llm_call_id to current_llm_call_ids
-            llm_call_ids = self.current_llm_call_ids.get()
-            if llm_call_ids is None:
-                llm_call_ids = []
-                self.current_llm_call_ids.set(llm_call_ids)
             llm_call_ids.append(llm_call.id)
-
-            return result
         except Exception as e:
-            self._log_error(e, "llm", llm_call_name)
-            raise
+            # Runs when the caller finishes the stream, possibly after the
+            # traced call returned; never let it break the caller.
+            logging.error(f"Error recording streamed LLM call: {e}")
+
+    def _record_llm_call(
+        self,
+        result,
+        llm_call_name,
+        args,
+        kwargs,
+        start_time,
+        end_time,
+        memory_used,
+        agent_id,
+        stream=None,
+    ):
+        sanitized_args = self._sanitize_api_keys(args)
+        sanitized_kwargs = self._sanitize_api_keys(kwargs)
+
+        model_name = self._extract_model_name(sanitized_kwargs)
+        try:
+            model = os.path.join("groq", model_name) if result.x_groq else model_name
+        except:
+            model = model_name
+
+        return self.process_llm_result(
+            result,
+            llm_call_name,
+            model,
+            self._extract_input(sanitized_args, sanitized_kwargs),
+            start_time,
+            end_time,
+            memory_used,
+            agent_id,
+            stream=stream,
+        )
+
+    def _llm_call_ids(self):
+        llm_call_ids = self.current_llm_call_ids.get()
+        if llm_call_ids is None:
+            llm_call_ids = []
+            self.current_llm_call_ids.set(llm_call_ids)
+        return llm_call_ids
 
     def process_llm_result(
-        self, result, name, model, prompt, start_time, end_time, memory_used, agent_id
+        self,
+        result,
+        name,
+        model,
+        prompt,
+        start_time,
+        end_time,
+        memory_used,
+        agent_id,
+        stream=None,
     ):
         llm_data = extract_llm_output(result)
-        agent_id = self.current_agent_id.get()
 
         token_usage = {"input": 0, "completion": 0, "reasoning": 0}
 
@@ -125,31 +267,32 @@ class LLMTracerMixin:
             token_usage["completion"] = getattr(usage, "completion_tokens", 0)
             token_usage["reasoning"] = getattr(usage, "reasoning_tokens", 0)
 
-        # Default cost values if the model or default is not found
-        default_cost = {"input": 0.0, "output": 0.0, "reasoning": 0.0}
-
-        # Try to get the model-specific cost, fall back to default, then to default_cost
-        model_cost = self.model_costs.get(
-            model, self.model_costs.get("default", default_cost)
-        )
+        # Unknown models are recorded at zero cost
+        model_cost = self.model_costs.lookup(model) or {}
 
         cost = {
-            "input": token_usage["input"] * model_cost["input_cost_per_token"],
-            "output": token_usage["completion"] * model_cost["output_cost_per_token"],
+            "input": token_usage["input"] * model_cost.get("input_cost_per_token", 0),
+            "output": token_usage["completion"]
+            * model_cost.get("output_cost_per_token", 0),
             "reasoning": token_usage["reasoning"]
             * model_cost.get("reasoning_cost_per_token", 0),
         }
 
+        input_prompt, input_message_refs = self._store_prompt(prompt)
         llm_call = LLMCallModel(
+            id=self._next_id(LLMCallModel),
             project_id=self.project_id,
             trace_id=self.trace_id,
             agent_id=agent_id,
             name=name,
             model=llm_data.model_name,
-            input_prompt=str(prompt),
-            output=str(llm_data.output_response),
+            input_prompt=input_prompt,
+            input_message_refs=input_message_refs,
+            output=self._store_payload("output", dumps(llm_data.output_response)),
             tool_call=(
-                str(llm_data.tool_call) if llm_data.tool_call else llm_data.tool_call
+                self._store_payload("tool_call", dumps(llm_data.tool_call))
+                if llm_data.tool_call
+                else None
             ),
             start_time=start_time,
             end_time=end_time,
@@ -157,36 +300,37 @@ class LLMTracerMixin:
             token_usage=json.dumps(token_usage),
             cost=json.dumps(cost),
             memory_used=memory_used,
+            time_to_first_token=stream.time_to_first_token if stream else None,
+            inter_token_latency=stream.inter_token_latency if stream else None,
+            chunk_count=stream.chunk_count if stream else None,
         )
 
-        with self.Session() as session:
-            session.add(llm_call)
-            session.commit()
-            session.refresh(llm_call)
-
-            # Create a dictionary with all the necessary information
-            llm_call_data = {
-                "id": llm_call.id,
-                "name": name,
-                "model": llm_data.model_name,
-                "input_prompt": prompt,
-                "output": llm_data.output_response,
-                "tool_call": llm_data.tool_call,
-                "start_time": start_time,
-                "end_time": end_time,
-                "duration": (end_time - start_time).total_seconds(),
-                "token_usage": token_usage,
-                "cost": cost,
-                "memory_used": memory_used,
-                "agent_id": agent_id,
-            }
-
-        if agent_id:
-            llm_call_ids = self.current_llm_call_ids.get()
-            if llm_call_ids is None:
-                llm_call_ids = []
-                self.current_llm_call_ids.set(llm_call_ids)
-            llm_call_ids.append(llm_call.id)
+        self.writer.add(llm_call)
+        self._add_to_trace_totals(
+            total_cost=sum(value or 0 for value in cost.values()),
+            total_tokens=sum(value or 0 for value in token_usage.values()),
+            llm_call_count=1,
+        )
+
+        # Create a dictionary with all the necessary information
+        llm_call_data = {
+            "id": llm_call.id,
+            "name": name,
+            "model": llm_data.model_name,
+            "input_prompt": prompt,
+            "output": llm_data.output_response,
+            "tool_call": llm_data.tool_call,
+            "start_time": start_time,
+            "end_time": end_time,
+            "duration": (end_time - start_time).total_seconds(),
+            "token_usage": token_usage,
+            "cost": cost,
+            "memory_used": memory_used,
+            "time_to_first_token": llm_call.time_to_first_token,
+            "inter_token_latency": llm_call.inter_token_latency,
+            "chunk_count": llm_call.chunk_count,
+            "agent_id": agent_id,
+        }
 
         # Append the data to trace_data outside the session
         self.trace_data.setdefault("llm_calls", []).append(llm_call_data)
@@ -0,0 +1,129 @@
+"""Process memory deltas of traced spans.
+
+Every span asks the tracer's probe for a token when it starts and hands it
+back when it ends; the probe returns how much the process's memory grew
+while the span ran, in bytes, which spans store as ``memory_used``. This
+is not the memory the span itself allocated: neither RSS nor tracemalloc
+can be broken down by thread or task, so the allocations of spans that
+overlap in time (threads, tasks) and of anything else the process does
+meanwhile are counted too, in every mode. Three modes are available:
+
+``"off"``
+    Nothing is measured and spans report 0.
+``"sampled"`` (default)
+    A background thread samples the process RSS every ``interval`` seconds.
+    Spans only read the latest sample, so starting and ending a span costs
+    no system call. A span reports the growth of the sampled RSS over its
+    lifetime, so spans shorter than the interval usually report 0.
+``"tracemalloc"``
+    Python allocations are traced with :mod:`tracemalloc` and a span
+    reports the growth of the process's traced memory over its lifetime.
+    This is exact for the process but slows it down noticeably; use it
+    for debugging.
+"""
+
+import threading
+import tracemalloc
+
+MEMORY_MODES = ("off", "sampled", "tracemalloc")
+
+
+class MemoryProbe:
+    """Probe for ``memory_mode="off"``; also the interface of the others."""
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def start_span(self):
+        return None
+
+    def end_span(self, token) -> int:
+        """Bytes the process's memory grew by since ``start_span`` returned
+        ``token``; 0 if it shrank."""
+        return 0
+
+
+class SampledRSSProbe(MemoryProbe):
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self._rss = 0
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        import psutil
+
+        self._process = psutil.Process()
+        self._rss = self._process.memory_info().rss
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._sample, name="agentneo-memory-probe", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self._rss = self._process.memory_info().rss
+            except Exception:
+                # The probe must never take the traced program down.
+                return
+
+    def start_span(self):
+        return self._rss
+
+    def end_span(self, token) -> int:
+        if token is None:
+            return 0
+        return max(0, self._rss - token)
+
+
+class TracemallocProbe(MemoryProbe):
+    def __init__(self):
+        self._started_tracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        # Leave tracing alone if somebody else turned it on.
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def start_span(self):
+        if not tracemalloc.is_tracing():
+            return None
+        return tracemalloc.get_traced_memory()[0]
+
+    def end_span(self, token) -> int:
+        if token is None or not tracemalloc.is_tracing():
+            return 0
+        return max(0, tracemalloc.get_traced_memory()[0] - token)
+
+
+def create_memory_probe(mode: str = "sampled") -> MemoryProbe:
+    """Return the probe implementing ``mode``, one of :data:`MEMORY_MODES`."""
+    if mode == "off":
+        return MemoryProbe()
+    if mode == "sampled":
+        return SampledRSSProbe()
+    if mode == "tracemalloc":
+        return TracemallocProbe()
+    raise ValueError(
+        f"Unknown memory_mode '{mode}', expected one of {', '.join(MEMORY_MODES)}"
+    )
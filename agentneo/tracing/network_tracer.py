@@ -1,21 +1,67 @@
+from contextlib import contextmanager
 from datetime import datetime
+import contextvars
+import json
 import socket
-from http.client import HTTPConnection, HTTPSConnection
-import aiohttp
-import requests
-import urllib
+import sys
+from http.client import HTTPConnection
+import urllib.request
+
+import wrapt
+
+# Request and response bodies are truncated to this many characters
+MAX_BODY_LENGTH = 1000
+
+
+def _body_text(body):
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body, default=str)
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="ignore")
+    if isinstance(body, str):
+        return body[:MAX_BODY_LENGTH]
+    # Files, iterators and other streamed bodies can't be read without
+    # consuming them.
+    return None
 
 
 class NetworkTracer:
+    """Records the network calls made inside traced tool spans.
+
+    The patches are installed once, when the tracer starts, and removed when
+    it stops. Each tool span opens its own call buffer with :meth:`span`;
+    the buffer is tracked in a context variable, so concurrent tools on
+    other threads or tasks never see each other's calls. Calls made outside
+    a span pass straight through without being recorded.
+    """
+
     def __init__(self):
-        self.network_calls = []
         self.patches_applied = False  # Track whether patches are active
-        # Store original functions for restoration
-        self._original_urlopen = None
-        self._original_requests_request = None
-        self._original_http_request = None
-        self._original_https_request = None
-        self._original_socket_create_connection = None
+        # (owner, attribute, original, replacement) of each installed patch
+        self._patches = []
+        self._requests_hook_registered = False
+        self._calls = contextvars.ContextVar(
+            f"agentneo_network_calls_{id(self)}", default=None
+        )
+
+    @property
+    def network_calls(self):
+        """Calls recorded so far by the span active in this context."""
+        calls = self._calls.get()
+        return calls if calls is not None else []
+
+    def is_recording(self) -> bool:
+        return self.patches_applied and self._calls.get() is not None
+
+    @contextmanager
+    def span(self):
+        """Collect the network calls made within the block into a new list."""
+        calls = []
+        token = self._calls.set(calls)
+        try:
+            yield calls
+        finally:
+            self._calls.reset(token)
 
     def record_call(
         self,
@@ -30,10 +76,13 @@ class NetworkTracer:
         request_body=None,
         response_body=None,
     ):
+        calls = self._calls.get()
+        if calls is None:
+            return
         duration = (
             (end_time - start_time).total_seconds() if start_time and end_time else None
         )
-        self.network_calls.append(
+        calls.append(
             {
                 "method": method,
                 "url": url,
@@ -44,210 +93,207 @@ class NetworkTracer:
                 "duration": duration,
                 "request_headers": request_headers,
                 "response_headers": response_headers,
-                "request_body": request_body,
-                "response_body": (
-                    response_body[:1000] if response_body else None
-                ),  # Limit response body to 1000 characters
+                "request_body": _body_text(request_body),
+                "response_body": _body_text(response_body),
             }
         )
 
     def activate_patches(self):
-        if not self.patches_applied:
-            # Apply monkey patches and store originals
-            self._original_urlopen = monkey_patch_urllib(self)
-            self._original_requests_request = monkey_patch_requests(self)
-            self._original_http_request, self._original_https_request = (
-                monkey_patch_http_client(self)
-            )
-            self._original_socket_create_connection = monkey_patch_socket(self)
-            self.patches_applied = True
+        if self.patches_applied:
+            return
+        self.patches_applied = True
+        self._patch(urllib.request, "urlopen", monkey_patch_urllib(self))
+        request, getresponse = monkey_patch_http_client(self)
+        self._patch(HTTPConnection, "request", request)
+        self._patch(HTTPConnection, "getresponse", getresponse)
+        self._patch(socket, "create_connection", monkey_patch_socket(self))
+        # requests is only patched once the application imports it.
+        requests = sys.modules.get("requests")
+        if requests is not None:
+            self._patch_requests(requests)
+        elif not self._requests_hook_registered:
+            wrapt.register_post_import_hook(self._patch_requests, "requests")
+            self._requests_hook_registered = True
 
     def deactivate_patches(self):
+        if not self.patches_applied:
+            return
+        self.patches_applied = False
+        for owner, name, original, replacement in reversed(self._patches):
+            # A patch installed on top of ours (e.g. by a second tracer)
+            # keeps calling through; ours then passes calls straight through.
+            if getattr(owner, name) is replacement:
+                setattr(owner, name, original)
+        self._patches = []
+
+    def _patch(self, owner, name, replacement):
+        original = getattr(owner, name)
+        replacement.__wrapped__ = original
+        setattr(owner, name, replacement)
+        self._patches.append((owner, name, original, replacement))
+
+    def _patch_requests(self, module):
         if self.patches_applied:
-            # Restore original functions
-            restore_urllib(self._original_urlopen)
-            restore_requests(self._original_requests_request)
-            restore_http_client(
-                self._original_http_request, self._original_https_request
-            )
-            restore_socket(self._original_socket_create_connection)
-            self.network_calls = []
-            self.patches_applied = False
+            self._patch(module.Session, "request", monkey_patch_requests(self))
 
 
-# Define the monkey patch and restore functions
+# Define the monkey patch functions. Each returns the replacement for the
+# original function, which it looks up through ``replacement.__wrapped__``.
 def monkey_patch_urllib(network_tracer):
-    from urllib.request import urlopen
-
-    original_urlopen = urlopen
+    def patched_urlopen(url, *args, **kwargs):
+        if not network_tracer.is_recording():
+            return patched_urlopen.__wrapped__(url, *args, **kwargs)
 
-    def patched_urlopen(url, data=None, timeout=None, *args, **kwargs):
         if isinstance(url, str):
+            data = args[0] if args else kwargs.get("data")
             method = "GET" if data is None else "POST"
             url_str = url
+            request_headers = None
         else:
+            data = url.data
             method = url.get_method()
             url_str = url.full_url
+            request_headers = dict(url.header_items())
 
         start_time = datetime.now()
         try:
-            response = original_urlopen(url, data, timeout, *args, **kwargs)
-            end_time = datetime.now()
-            network_tracer.record_call(
-                method=method,
-                url=url_str,
-                status_code=response.status,
-                start_time=start_time,
-                end_time=end_time,
-                request_headers=dict(response.request.headers),
-                response_headers=dict(response.headers),
-                request_body=data,
-                response_body=response.read().decode("utf-8", errors="ignore"),
-            )
-            return response
+            response = patched_urlopen.__wrapped__(url, *args, **kwargs)
         except Exception as e:
-            end_time = datetime.now()
             network_tracer.record_call(
                 method=method,
                 url=url_str,
                 error=e,
                 start_time=start_time,
-                end_time=end_time,
+                end_time=datetime.now(),
             )
             raise
+        # The body is left unread for the caller.
+        network_tracer.record_call(
+            method=method,
+            url=url_str,
+            status_code=response.status,
+            start_time=start_time,
+            end_time=datetime.now(),
+            request_headers=request_headers,
+            response_headers=dict(response.headers),
+            request_body=data,
+        )
+        return response
 
-    urllib.request.urlopen = patched_urlopen
-    return original_urlopen  # Return the original function
-
-
-def restore_urllib(original_urlopen):
-    urllib.request.urlopen = original_urlopen
+    return patched_urlopen
 
 
 def monkey_patch_requests(network_tracer):
-    original_request = requests.Session.request
-
     def patched_request(self, method, url, *args, **kwargs):
+        if not network_tracer.is_recording():
+            return patched_request.__wrapped__(self, method, url, *args, **kwargs)
+
         start_time = datetime.now()
         try:
-            response = original_request(self, method, url, *args, **kwargs)
-            end_time = datetime.now()
-            network_tracer.record_call(
-                method=method,
-                url=url,
-                status_code=response.status_code,
-                start_time=start_time,
-                end_time=end_time,
-                request_headers=dict(response.request.headers),
-                response_headers=dict(response.headers),
-                request_body=kwargs.get("data") or kwargs.get("json"),
-                response_body=response.text,
-            )
-            return response
+            response = patched_request.__wrapped__(self, method, url, *args, **kwargs)
         except Exception as e:
-            end_time = datetime.now()
             network_tracer.record_call(
                 method=method,
                 url=url,
                 error=e,
                 start_time=start_time,
-                end_time=end_time,
+                end_time=datetime.now(),
             )
             raise
+        network_tracer.record_call(
+            method=method,
+            url=url,
+            status_code=response.status_code,
+            start_time=start_time,
+            end_time=datetime.now(),
+            request_headers=dict(response.request.headers),
+            response_headers=dict(response.headers),
+            request_body=kwargs.get("data") or kwargs.get("json"),
+            # Reading a streamed response would consume it.
+            response_body=None if kwargs.get("stream") else response.text,
+        )
+        return response
 
-    requests.Session.request = patched_request
-    return original_request
-
-
-def restore_requests(original_request):
-    requests.Session.request = original_request
+    return patched_request
 
 
 def monkey_patch_http_client(network_tracer):
-    original_http_request = HTTPConnection.request
-    original_https_request = HTTPSConnection.request
+    # The call is recorded when its response arrives. request() only notes
+    # what was sent; clients such as urllib3 send without calling it.
+    def patched_request(self, method, url, body=None, headers={}, *args, **kwargs):
+        if network_tracer.is_recording():
+            self._agentneo_request = (url, body, headers, datetime.now())
+        return patched_request.__wrapped__(
+            self, method, url, body, headers, *args, **kwargs
+        )
 
-    def patched_request(self, method, url, body=None, headers=None, *args, **kwargs):
-        start_time = datetime.now()
+    def patched_getresponse(self, *args, **kwargs):
+        if not network_tracer.is_recording():
+            return patched_getresponse.__wrapped__(self, *args, **kwargs)
+
+        sent = self.__dict__.pop("_agentneo_request", None)
+        path, body, headers, start_time = sent or ("", None, None, datetime.now())
+        method = getattr(self, "_method", None)
+        url = f"{self._http_vsn_str} {self.host}:{self.port}{path}"
         try:
-            result = (
-                original_http_request(self, method, url, body, headers, *args, **kwargs)
-                if isinstance(self, HTTPConnection)
-                else original_https_request(
-                    self, method, url, body, headers, *args, **kwargs
-                )
-            )
-            response = self.getresponse()
-            end_time = datetime.now()
-            network_tracer.record_call(
-                method=method,
-                url=f"{self._http_vsn_str} {self.host}:{self.port}{url}",
-                status_code=response.status,
-                start_time=start_time,
-                end_time=end_time,
-                request_headers=headers,
-                response_headers=dict(response.headers),
-                request_body=body,
-                response_body=response.read().decode("utf-8", errors="ignore"),
-            )
-            return result
+            response = patched_getresponse.__wrapped__(self, *args, **kwargs)
         except Exception as e:
-            end_time = datetime.now()
             network_tracer.record_call(
                 method=method,
-                url=f"{self._http_vsn_str} {self.host}:{self.port}{url}",
+                url=url,
                 error=e,
                 start_time=start_time,
-                end_time=end_time,
+                end_time=datetime.now(),
             )
             raise
+        # The body is left unread for the caller.
+        network_tracer.record_call(
+            method=method,
+            url=url,
+            status_code=response.status,
+            start_time=start_time,
+            end_time=datetime.now(),
+            request_headers=dict(headers) if headers else None,
+            response_headers=dict(response.headers),
+            request_body=body,
+        )
+        return response
 
-    HTTPConnection.request = patched_request
-    HTTPSConnection.request = patched_request
-    return original_http_request, original_https_request
-
-
-def restore_http_client(original_http_request, original_https_request):
-    HTTPConnection.request = original_http_request
-    HTTPSConnection.request = original_https_request
+    return patched_request, patched_getresponse
 
 
 def monkey_patch_socket(network_tracer):
-    original_create_connection = socket.create_connection
-
     def patched_create_connection(address, *args, **kwargs):
-        host, port = address
+        if not network_tracer.is_recording():
+            return patched_create_connection.__wrapped__(address, *args, **kwargs)
+
+        host, port = address[:2]
         start_time = datetime.now()
         try:
-            result = original_create_connection(address, *args, **kwargs)
-            end_time = datetime.now()
-            network_tracer.record_call(
-                method="CONNECT",
-                url=f"{host}:{port}",
-                start_time=start_time,
-                end_time=end_time,
-            )
-            return result
+            result = patched_create_connection.__wrapped__(address, *args, **kwargs)
         except Exception as e:
-            end_time = datetime.now()
             network_tracer.record_call(
                 method="CONNECT",
                 url=f"{host}:{port}",
                 error=e,
                 start_time=start_time,
-                end_time=end_time,
+                end_time=datetime.now(),
             )
             raise
+        network_tracer.record_call(
+            method="CONNECT",
+            url=f"{host}:{port}",
+            start_time=start_time,
+            end_time=datetime.now(),
+        )
+        return result
 
-    socket.create_connection = patched_create_connection
-    return original_create_connection
-
-
-def restore_socket(original_create_connection):
-    socket.create_connection = original_create_connection
+    return patched_create_connection
 
 
 async def patch_aiohttp_trace_config(network_tracer):
+    import aiohttp
+
     async def on_request_start(session, trace_config_ctx, params):
         trace_config_ctx.start = datetime.now()
 
@@ -262,7 +308,6 @@ async def patch_aiohttp_trace_config(network_tracer):
             end_time=end_time,
             request_headers=dict(params.headers),
             response_headers=dict(response.headers),
-            request_body=await params.response.text(),
             response_body=await response.text(),
         )
 
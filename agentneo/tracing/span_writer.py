@@ -0,0 +1,287 @@
+import asyncio
+import atexit
+import collections
+import logging
+import threading
+import time
+import weakref
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from ..data import IdSequenceModel, TraceModel
+from ..data.trace_versions import bump_span_trace_versions, bump_trace_versions
+
+logger = logging.getLogger(__name__)
+
+_live_writers = weakref.WeakSet()
+
+
+class IdAllocator:
+    """Hands out primary keys on the caller's thread.
+
+    Ids are reserved from the ``id_sequences`` table in blocks, so a span
+    knows its id before its row is written and several processes can
+    share one database file without handing out the same id twice.
+    """
+
+    def __init__(self, session_factory, block_size: int = 1000):
+        self.Session = session_factory
+        self.block_size = block_size
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def next_id(self, model) -> int:
+        table_name = model.__tablename__
+        with self._lock:
+            block = self._blocks.get(table_name)
+            if block is None or block[0] >= block[1]:
+                block = self._reserve_block(model)
+                self._blocks[table_name] = block
+            next_id = block[0]
+            block[0] += 1
+            return next_id
+
+    def _reserve_block(self, model):
+        table_name = model.__tablename__
+        for _ in range(3):
+            with self.Session() as session:
+                try:
+                    # Rows written without the allocator (older versions,
+                    # other tools) must never be handed out again.
+                    floor = (session.scalar(select(func.max(model.id))) or 0) + 1
+                    result = session.execute(
+                        update(IdSequenceModel)
+                        .where(IdSequenceModel.table_name == table_name)
+                        .values(
+                            next_id=func.max(IdSequenceModel.next_id, floor)
+                            + self.block_size
+                        )
+                    )
+                    if result.rowcount == 0:
+                        session.add(
+                            IdSequenceModel(
+                                table_name=table_name,
+                                next_id=floor + self.block_size,
+                            )
+                        )
+                        session.flush()
+                    end = session.scalar(
+                        select(IdSequenceModel.next_id).where(
+                            IdSequenceModel.table_name == table_name
+                        )
+                    )
+                    session.commit()
+                    return [end - self.block_size, end]
+                except IntegrityError:
+                    # Another process created the sequence row first.
+                    session.rollback()
+        raise RuntimeError(f"Unable to reserve ids for table '{table_name}'")
+
+
+class _Flush:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+_EMPTY = object()
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class SpanWriter:
+    """Persists trace rows from a background thread.
+
+    Tracers enqueue inserts and updates and return immediately; the writer
+    commits them in batches once ``batch_size`` operations are pending or
+    ``flush_interval`` seconds after the first of them, whichever comes
+    first, so light traffic still shares one commit per interval.
+
+    When ``max_queue_size`` operations are pending, callers on a plain
+    thread wait for room, while callers running an asyncio event loop never
+    block: their operations are queued beyond the limit. Nothing queued is
+    ever dropped.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        max_queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+    ):
+        self.Session = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        # Pending operations in order; _pending_changed guards it
+        self._pending = collections.deque()
+        self._pending_changed = threading.Condition()
+        self._thread = None
+        self._lock = threading.Lock()
+        _live_writers.add(self)
+
+    def add(self, instance):
+        """Queue a new ORM instance for insertion."""
+        self._put(("add", instance))
+
+    def add_unique(self, instance, **key):
+        """Queue ``instance`` for insertion unless a row matching ``key``
+        already exists, e.g. for content-addressed rows."""
+        self._put(("add_unique", instance, key))
+
+    def update(self, model, row_id, values):
+        """Queue an update of the row ``row_id`` of ``model``."""
+        self._put(("update", model, row_id, values))
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything queued so far has been committed."""
+        marker = _Flush()
+        self._ensure_started()
+        self._enqueue(marker, wait_for_room=False)
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: float = None) -> bool:
+        """Commit all pending operations and stop the writer thread.
+
+        Returns False if the thread had not drained the queue within
+        ``timeout`` seconds; it then carries on in the background.
+        """
+        # Holding the lock keeps a new writer thread from starting (and
+        # reordering operations) until the old one has drained the queue.
+        with self._lock:
+            if self._thread is None:
+                return True
+            thread, self._thread = self._thread, None
+            self._enqueue(_STOP, wait_for_room=False)
+            thread.join(timeout)
+            if thread.is_alive():
+                return False
+            # Operations queued behind the stop marker by other threads
+            if self._pending:
+                self._start_thread()
+            return True
+
+    def _put(self, item):
+        self._ensure_started()
+        self._enqueue(item, wait_for_room=not _in_event_loop())
+
+    def _enqueue(self, item, wait_for_room):
+        with self._pending_changed:
+            if wait_for_room:
+                self._pending_changed.wait_for(
+                    lambda: len(self._pending) < self.max_queue_size
+                )
+            self._pending.append(item)
+            self._pending_changed.notify_all()
+
+    def _get(self, timeout=None):
+        """The next pending operation, or _EMPTY after ``timeout`` seconds."""
+        with self._pending_changed:
+            if not self._pending_changed.wait_for(lambda: self._pending, timeout):
+                return _EMPTY
+            item = self._pending.popleft()
+            self._pending_changed.notify_all()
+            return item
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._start_thread()
+
+    def _start_thread(self):
+        self._thread = threading.Thread(
+            target=self._run, name="agentneo-span-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._get()
+            # A batch is written once it is full or flush_interval seconds
+            # after its first operation; flush() and close() write it early.
+            deadline = time.monotonic() + self.flush_interval
+            batch, markers, stop = [], [], False
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, _Flush):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                if stop or markers or len(batch) >= self.batch_size:
+                    break
+                item = self._get(max(deadline - time.monotonic(), 0))
+                if item is _EMPTY:
+                    break
+
+            if batch:
+                self._write(batch)
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                return
+
+    def _write(self, batch):
+        try:
+            self._apply(batch)
+        except SQLAlchemyError as e:
+            logger.warning(f"Batched trace write failed, retrying row by row: {e}")
+            for operation in batch:
+                try:
+                    self._apply([operation])
+                except SQLAlchemyError as e:
+                    logger.error(f"Failed to persist trace data: {e}")
+
+    def _apply(self, batch):
+        with self.Session(expire_on_commit=False) as session:
+            try:
+                # Traces whose version the batch bumps, and updated spans
+                # whose trace is looked up
+                trace_ids, updated_spans = set(), {}
+                for operation in batch:
+                    if operation[0] == "add":
+                        session.add(operation[1])
+                        trace_ids.add(getattr(operation[1], "trace_id", None))
+                    elif operation[0] == "add_unique":
+                        _, instance, key = operation
+                        query = session.query(type(instance)).filter_by(**key)
+                        if not session.query(query.exists()).scalar():
+                            session.add(instance)
+                        trace_ids.add(getattr(instance, "trace_id", None))
+                    else:
+                        _, model, row_id, values = operation
+                        session.execute(
+                            update(model).where(model.id == row_id).values(**values)
+                        )
+                        if model is TraceModel:
+                            trace_ids.add(row_id)
+                        elif hasattr(model, "trace_id"):
+                            updated_spans.setdefault(model, set()).add(row_id)
+                session.flush()
+                bump_trace_versions(session, trace_ids)
+                for model, span_ids in updated_spans.items():
+                    bump_span_trace_versions(session, model, span_ids)
+                session.commit()
+            except SQLAlchemyError:
+                session.rollback()
+                raise
+
+
+@atexit.register
+def _flush_live_writers():
+    for writer in list(_live_writers):
+        try:
+            if not writer.close(timeout=5):
+                logger.error("Trace writer did not finish writing before exit")
+        except Exception as e:
+            logger.error(f"Error flushing trace writer at exit: {e}")
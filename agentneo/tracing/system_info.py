@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import platform
+import threading
+from concurrent.futures import Future
+from importlib import metadata
+
+import psutil
+
+_snapshot = None
+_snapshot_pid = None
+_snapshot_lock = threading.Lock()
+
+
+def collect_system_info() -> dict:
+    """Gather OS, hardware and environment details, as stored in the DB.
+
+    This is slow (``cpuinfo`` spawns subprocesses), so tracers go through
+    :func:`get_system_info` instead of calling it directly.
+    """
+    import cpuinfo
+    import GPUtil
+
+    os_name = platform.system()
+    if os_name == "Darwin":
+        os_version = platform.mac_ver()[0]
+    else:
+        os_version = platform.version()
+
+    # Get GPU information
+    try:
+        gpus = GPUtil.getGPUs()
+        gpu_info = [
+            {"name": gpu.name, "memory_total": gpu.memoryTotal} for gpu in gpus
+        ]
+    except Exception as e:
+        logging.warning(f"Failed to get GPU information: {e}")
+        gpu_info = None
+
+    # Get disk information
+    disk = psutil.disk_usage("/")
+    disk_info = {
+        "total": disk.total / (1024**3),  # GB
+        "available": disk.free / (1024**3),  # GB
+    }
+
+    installed_packages = {}
+    for dist in metadata.distributions():
+        name = dist.metadata["Name"]
+        if name:
+            installed_packages[name.lower()] = dist.version
+
+    return {
+        "os_name": os_name,
+        "os_version": os_version,
+        "python_version": platform.python_version(),
+        "cpu_info": cpuinfo.get_cpu_info()["brand_raw"],
+        "gpu_info": json.dumps(gpu_info) if gpu_info else None,
+        "disk_info": json.dumps(disk_info),
+        "memory_total": psutil.virtual_memory().total / (1024**3),  # GB
+        "installed_packages": json.dumps(installed_packages, sort_keys=True),
+    }
+
+
+def _collect(future: Future):
+    try:
+        future.set_result(collect_system_info())
+    except Exception as e:
+        future.set_exception(e)
+
+
+def get_system_info() -> Future:
+    """Return a future for this process's system snapshot.
+
+    The snapshot is collected once per process on a background thread, the
+    first time any tracer asks for it.
+    """
+    global _snapshot, _snapshot_pid
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot_pid != os.getpid():
+            _snapshot = Future()
+            _snapshot_pid = os.getpid()
+            threading.Thread(
+                target=_collect,
+                args=(_snapshot,),
+                name="agentneo-system-info",
+                daemon=True,
+            ).start()
+        return _snapshot
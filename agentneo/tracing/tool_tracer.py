@@ -1,11 +1,10 @@
 import asyncio
-import psutil
-import json
 import functools
 from datetime import datetime
-from .network_tracer import NetworkTracer, patch_aiohttp_trace_config
+from .network_tracer import patch_aiohttp_trace_config
 from .user_interaction_tracer import UserInteractionTracer
 from ..data import ToolCallModel
+from ..utils.serialization import dumps
 from functools import wraps
 
 
@@ -30,37 +29,38 @@ class ToolTracerMixin:
 
     def _trace_tool_call_sync(self, func, name, description, *args, **kwargs):
         start_time = datetime.now()
-        start_memory = psutil.Process().memory_info().rss
+        memory_span = self.memory_probe.start_span()
         agent_id = self.current_agent_id.get()
 
-        # Activate network tracing
-        self.network_tracer.activate_patches()
-
         try:
-            result = func(*args, **kwargs)
+            # Collect the network calls made by this tool only
+            with self.network_tracer.span() as network_calls:
+                result = func(*args, **kwargs)
 
             end_time = datetime.now()
-            end_memory = psutil.Process().memory_info().rss
-            memory_used = end_memory - start_memory
+            memory_used = self.memory_probe.end_span(memory_span)
 
-            serialized_params = self._serialize_params(args, kwargs)
+            input_parameters = self._store_payload(
+                "input_parameters", dumps(self._serialize_params(args, kwargs))
+            )
+            output = self._store_payload("output", dumps(result))
             tool_call = ToolCallModel(
+                id=self._next_id(ToolCallModel),
                 project_id=self.project_id,
                 trace_id=self.trace_id,
                 agent_id=agent_id,
                 name=name,
-                input_parameters=json.dumps(serialized_params),
-                output=str(result),
+                input_parameters=input_parameters,
+                output=output,
                 start_time=start_time,
                 end_time=end_time,
                 duration=(end_time - start_time).total_seconds(),
                 memory_used=memory_used,
-                network_calls=self.network_tracer.network_calls,
+                network_calls=network_calls,
             )
-            with self.Session() as session:
-                session.add(tool_call)
-                session.commit()
-                tool_call_id = tool_call.id
+            self.writer.add(tool_call)
+            self._add_to_trace_totals(tool_call_count=1)
+            tool_call_id = tool_call.id
 
             # Append tool_call_id to current_tool_call_ids
             tool_call_ids = self.current_tool_call_ids.get()
@@ -74,13 +74,13 @@ class ToolTracerMixin:
                     "id": tool_call_id,
                     "name": name,
                     "description": description,
-                    "input_parameters": json.dumps(serialized_params),
-                    "output": str(result),
+                    "input_parameters": input_parameters,
+                    "output": output,
                     "start_time": start_time.isoformat(),
                     "end_time": end_time.isoformat(),
                     "duration": (end_time - start_time).total_seconds(),
                     "memory_used": memory_used,
-                    "network_calls": self.network_tracer.network_calls,
+                    "network_calls": network_calls,
                     "agent_id": agent_id,
                 }
             )
@@ -89,50 +89,51 @@ class ToolTracerMixin:
         except Exception as e:
             self._log_error(e, "tool", name)
             raise
-        finally:
-            self.network_tracer.deactivate_patches()
 
     async def _trace_tool_call_async(self, func, name, description, *args, **kwargs):
         start_time = datetime.now()
-        start_memory = psutil.Process().memory_info().rss
+        memory_span = self.memory_probe.start_span()
         agent_id = self.current_agent_id.get()
 
         # Initialize the UserInteractionTracer
         user_interaction_tracer = UserInteractionTracer(self)
 
-        # Activate network tracing
-        self.network_tracer.activate_patches()
-
         try:
-            async with user_interaction_tracer.async_capture():
-                if asyncio.iscoroutinefunction(func):
-                    trace_config = await patch_aiohttp_trace_config(self.network_tracer)
-                    result = await func(*args, **kwargs, trace_config=trace_config)
-                else:
-                    result = await asyncio.to_thread(func, *args, **kwargs)
+            # Collect the network calls made by this tool only
+            with self.network_tracer.span() as network_calls:
+                async with user_interaction_tracer.async_capture():
+                    if asyncio.iscoroutinefunction(func):
+                        trace_config = await patch_aiohttp_trace_config(
+                            self.network_tracer
+                        )
+                        result = await func(*args, **kwargs, trace_config=trace_config)
+                    else:
+                        result = await asyncio.to_thread(func, *args, **kwargs)
 
             end_time = datetime.now()
-            end_memory = psutil.Process().memory_info().rss
-            memory_used = end_memory - start_memory
+            memory_used = self.memory_probe.end_span(memory_span)
 
-            serialized_params = self._serialize_params(args, kwargs)
+            input_parameters = self._store_payload(
+                "input_parameters", dumps(self._serialize_params(args, kwargs))
+            )
+            output = self._store_payload("output", dumps(result))
             tool_call = ToolCallModel(
+                id=self._next_id(ToolCallModel),
                 project_id=self.project_id,
                 trace_id=self.trace_id,
                 agent_id=agent_id,
                 name=name,
-                input_parameters=json.dumps(serialized_params),
-                output=str(result),
+                input_parameters=input_parameters,
+                output=output,
                 start_time=start_time,
                 end_time=end_time,
                 duration=(end_time - start_time).total_seconds(),
                 memory_used=memory_used,
-                network_calls=self.network_tracer.network_calls,
+                network_calls=network_calls,
             )
-            with self.Session() as session:
-                session.add(tool_call)
-                session.commit()
-                tool_call_id = tool_call.id
+            self.writer.add(tool_call)
+            self._add_to_trace_totals(tool_call_count=1)
+            tool_call_id = tool_call.id
 
             # Append tool_call_id to current_tool_call_ids if available
             tool_call_ids = self.current_tool_call_ids.get()
@@ -144,13 +145,13 @@ class ToolTracerMixin:
                     "id": tool_call_id,
                     "name": name,
                     "description": description,
-                    "input_parameters": json.dumps(serialized_params),
-                    "output": str(result),
+                    "input_parameters": input_parameters,
+                    "output": output,
                     "start_time": start_time.isoformat(),
                     "end_time": end_time.isoformat(),
                     "duration": (end_time - start_time).total_seconds(),
                     "memory_used": memory_used,
-                    "network_calls": self.network_tracer.network_calls,
+                    "network_calls": network_calls,
                     "agent_id": agent_id,
                 }
             )
@@ -159,8 +160,6 @@ class ToolTracerMixin:
         except Exception as e:
             self._log_error(e, "tool", name)
             raise
-        finally:
-            self.network_tracer.deactivate_patches()
 
     def _serialize_params(self, args, kwargs):
         def _serialize(obj):
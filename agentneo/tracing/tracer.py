@@ -7,6 +7,7 @@ from .tool_tracer import ToolTracerMixin
 from .agent_tracer import AgentTracerMixin
 from .tool import Tool
 from .network_tracer import NetworkTracer
+from .memory import create_memory_probe
 
 
 class Tracer(LLMTracerMixin, ToolTracerMixin, AgentTracerMixin, BaseTracer):
@@ -14,8 +15,13 @@ class Tracer(LLMTracerMixin, ToolTracerMixin, AgentTracerMixin, BaseTracer):
         self,
         session,
         auto_instrument_llm: bool = True,
+        memory_mode: str = "sampled",
+        payload_limits: Optional[Dict[str, Optional[int]]] = None,
     ):
-        super().__init__(session)
+        # "off", "sampled" or "tracemalloc", see agentneo.tracing.memory
+        self.memory_probe = create_memory_probe(memory_mode)
+        # Size caps in bytes by column, see agentneo.data.blob_store
+        super().__init__(session, payload_limits=payload_limits)
         self.auto_instrument_llm = auto_instrument_llm
         self.tools: Dict[str, Tool] = {}
         self.call_depth = contextvars.ContextVar("call_depth", default=0)
@@ -25,6 +31,8 @@ class Tracer(LLMTracerMixin, ToolTracerMixin, AgentTracerMixin, BaseTracer):
     def start(self):
         # Start base tracer
         super().start()
+        self.memory_probe.start()
+        self.network_tracer.activate_patches()
         self.is_active = True
         # Instrument calls from mixins
         if self.auto_instrument_llm:
@@ -35,6 +43,8 @@ class Tracer(LLMTracerMixin, ToolTracerMixin, AgentTracerMixin, BaseTracer):
         if self.is_active:  # Only unpatch if currently active
             self.unpatch_llm_calls()
             self.is_active = False
+        self.network_tracer.deactivate_patches()
+        self.memory_probe.stop()
 
         # Stop base tracer
         super().stop()
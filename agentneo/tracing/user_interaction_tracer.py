@@ -25,6 +25,7 @@ class UserInteractionTracer:
     def _log_interaction(self, interaction_type, content):
         agent_id = self.tracer.current_agent_id.get()
         user_interaction = UserInteractionModel(
+            id=self.tracer._next_id(UserInteractionModel),
             project_id=self.tracer.project_id,
             trace_id=self.tracer.trace_id,
             agent_id=agent_id,
@@ -32,9 +33,7 @@ class UserInteractionTracer:
             content=content,
             timestamp=datetime.now(),
         )
-        with self.tracer.Session() as session:
-            session.add(user_interaction)
-            session.commit()
+        self.tracer.writer.add(user_interaction)
 
         # Also add to trace data
         self.tracer.trace_data.setdefault("user_interactions", []).append(
@@ -1,3 +1,4 @@
 from .generic import get_db_path
+from .model_costs import get_model_costs, reload_model_costs
 
-__all__ = ["get_db_path"]
+__all__ = ["get_db_path", "get_model_costs", "reload_model_costs"]
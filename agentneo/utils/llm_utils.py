@@ -2,25 +2,11 @@ from agentneo.data import LLMCall
 from .trace_utils import (
     calculate_cost,
     convert_usage_to_dict,
-    load_model_costs,
 )
-from importlib import resources
+from .model_costs import get_model_costs
 import json
 
 
-# Load the Json configuration
-try:
-    with open("agentneo/configs/model_costs.json", "r") as file:
-        config = json.load(file)
-except FileNotFoundError:
-    # with resources.open_text("agentneo", "configs/model_costs.json") as file:
-    #     config = json.load(file)
-    from importlib.resources import files
-    with (files("agentneo.configs") / "model_costs.json").open("r") as file:
-        config = json.load(file)
-
-
-
 def extract_llm_output(result):
 
     # import pdb
@@ -141,12 +127,9 @@ def extract_llm_output(result):
 
     token_usage = convert_usage_to_dict(usage)
 
-    # Load model costs
-    model_costs = load_model_costs()
-
     # Calculate cost
-    if model_name in model_costs:
-        model_config = model_costs[model_name]
+    model_config = get_model_costs().lookup(model_name)
+    if model_config is not None:
         input_cost_per_token = model_config.get("input_cost_per_token", 0.0)
         output_cost_per_token = model_config.get("output_cost_per_token", 0.0)
         reasoning_cost_per_token = model_config.get(
@@ -0,0 +1,144 @@
+import json
+import os
+import re
+import threading
+from collections.abc import Mapping
+from importlib.resources import files
+from types import MappingProxyType
+from typing import Optional
+
+# Dated or versioned suffixes providers append to a base model name, e.g.
+# "gpt-4o-2024-08-06", "claude-3-5-sonnet@20240620".
+_VERSION_SUFFIX = re.compile(
+    r"(@[\w.\-]+|-\d{4}-\d{2}-\d{2}|-\d{8}|-latest|-v\d+(\.\d+)*)$"
+)
+# Month-day dates, as in "gpt-4-0613". Context sizes look alike
+# ("llama3-8b-8192", "-1024"), so these are only stripped from looked up
+# names, where the rest must then be a known model.
+_SHORT_DATE_SUFFIX = re.compile(r"-(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])$")
+
+
+def _strip_provider(model: str) -> str:
+    return model.rsplit("/", 1)[-1]
+
+
+def _strip_version(model: str) -> str:
+    stripped = _VERSION_SUFFIX.sub("", model)
+    return stripped or model
+
+
+def _lookup_keys(model: str):
+    model = model.strip().lower()
+    bare = _strip_provider(model)
+    keys = (model, bare, _strip_version(model), _strip_version(bare))
+    return keys + tuple(_SHORT_DATE_SUFFIX.sub("", key) for key in keys)
+
+
+class ModelCostIndex(Mapping):
+    """Read-only, indexed view of ``configs/model_costs.json``.
+
+    Besides plain key access, :meth:`lookup` resolves provider-prefixed
+    ("groq/llama3-8b-8192") and version-suffixed ("gpt-4o-2024-11-20")
+    model names through an alias table built once at load time.
+    """
+
+    def __init__(self, costs: dict, path: str = None, mtime: float = None):
+        self._costs = {
+            name: MappingProxyType(dict(cost))
+            for name, cost in costs.items()
+            if isinstance(cost, dict)
+        }
+        self.path = path
+        self.mtime = mtime
+
+        # Exact names win over bare names, which win over versionless ones.
+        aliases = {}
+        for name in self._costs:
+            aliases.setdefault(name.lower(), name)
+        for name in self._costs:
+            aliases.setdefault(_strip_provider(name.lower()), name)
+        for name in self._costs:
+            aliases.setdefault(_strip_version(_strip_provider(name.lower())), name)
+        self._aliases = aliases
+        self._resolved = {}
+
+    def __getitem__(self, name):
+        return self._costs[name]
+
+    def __iter__(self):
+        return iter(self._costs)
+
+    def __len__(self):
+        return len(self._costs)
+
+    def resolve(self, model: Optional[str]) -> Optional[str]:
+        """Return the table key ``model`` refers to, or ``None``."""
+        if not model:
+            return None
+        try:
+            return self._resolved[model]
+        except KeyError:
+            pass
+        if model in self._costs:
+            name = model
+        else:
+            name = next(
+                (
+                    self._aliases[key]
+                    for key in _lookup_keys(model)
+                    if key in self._aliases
+                ),
+                None,
+            )
+        self._resolved[model] = name
+        return name
+
+    def lookup(self, model: Optional[str]) -> Optional[Mapping]:
+        """Return the cost entry for ``model``, or ``None`` if unknown."""
+        name = self.resolve(model)
+        return self._costs[name] if name is not None else None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _model_costs_path() -> str:
+    return str(files("agentneo.configs") / "model_costs.json")
+
+
+def _load_index(path: str) -> ModelCostIndex:
+    mtime = os.path.getmtime(path)
+    with open(path, "r") as file:
+        return ModelCostIndex(json.load(file), path=path, mtime=mtime)
+
+
+def get_model_costs(check_mtime: bool = False) -> ModelCostIndex:
+    """Return the process-wide model cost index, loading it on first use.
+
+    :param check_mtime: Reload the table if the file changed on disk since
+        it was loaded.
+    """
+    global _index
+    index = _index
+    if index is not None and not (check_mtime and _is_stale(index)):
+        return index
+    with _index_lock:
+        if _index is None or (check_mtime and _is_stale(_index)):
+            _index = _load_index(_model_costs_path())
+        return _index
+
+
+def reload_model_costs() -> ModelCostIndex:
+    """Unconditionally re-read the model cost table."""
+    global _index
+    with _index_lock:
+        _index = _load_index(_model_costs_path())
+        return _index
+
+
+def _is_stale(index: ModelCostIndex) -> bool:
+    try:
+        return os.path.getmtime(index.path) != index.mtime
+    except OSError:
+        return False
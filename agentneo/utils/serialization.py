@@ -0,0 +1,75 @@
+"""Canonical JSON serialization of span payloads.
+
+Prompts, outputs, tool-call arguments and tool results are stored as JSON
+text, written once by :func:`dumps` and read back with a single
+:func:`loads`. Values that JSON has no type for are converted on the way:
+pydantic models and dataclasses become objects, sets become arrays,
+datetimes ISO strings, bytes text, and anything else its ``str()``.
+"""
+
+import dataclasses
+import datetime
+import decimal
+import enum
+import json
+import types
+
+
+def _default(obj):
+    # Called by json.dumps for each value it can't serialize itself.
+    if hasattr(obj, "model_dump"):  # pydantic v2, litellm responses
+        return obj.model_dump()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, types.SimpleNamespace):
+        return vars(obj)
+    if isinstance(obj, (set, frozenset)):
+        try:
+            return sorted(obj)
+        except TypeError:
+            return list(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (bytes, bytearray)):
+        return bytes(obj).decode("utf-8", errors="replace")
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if hasattr(obj, "dict") and callable(obj.dict):  # pydantic v1
+        try:
+            return obj.dict()
+        except TypeError:
+            pass
+    return str(obj)
+
+
+def dumps(value) -> str:
+    """Serialize ``value`` to the canonical JSON text of a span payload."""
+    try:
+        return json.dumps(value, default=_default, ensure_ascii=False)
+    except (ValueError, TypeError, RecursionError):
+        # Circular references, non-string keys
+        return json.dumps(str(value), ensure_ascii=False)
+
+
+def loads(text):
+    """Decode a span payload written by :func:`dumps`.
+
+    Text that isn't JSON (rows written by older versions) is returned as is.
+    """
+    if not isinstance(text, str):
+        return text
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def as_text(text):
+    """The payload as display text: strings as themselves, structures as
+    their JSON."""
+    value = loads(text)
+    return value if isinstance(value, str) else text
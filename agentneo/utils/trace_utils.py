@@ -1,7 +1,8 @@
 import json
-from importlib import resources
 from dataclasses import asdict
 
+from .model_costs import get_model_costs
+
 
 def convert_usage_to_dict(usage):
     # Initialize the token_usage dictionary with default values
@@ -57,12 +58,8 @@ def calculate_cost(
 
 
 def load_model_costs():
-    try:
-        with open("agentneo/configs/model_costs.json", "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        with resources.open_text("agentneo.configs", "model_costs.json") as file:
-            return json.load(file)
+    # Kept for callers of the old loader; see agentneo.utils.model_costs
+    return get_model_costs()
 
 
 def log_event(event_data, log_file_path):
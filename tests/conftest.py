@@ -0,0 +1,28 @@
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def fake_litellm(monkeypatch):
+    """Stands in for litellm: ``completion`` records its kwargs in
+    ``calls``, raises the exceptions queued in ``failures`` and otherwise
+    returns ``respond(**kwargs)``, by default a response numbering its
+    answers ("answer 1", ...)."""
+    module = types.SimpleNamespace(calls=[], failures=[])
+
+    def respond(**kwargs):
+        content = f"answer {len(module.calls)}"
+        return {"model": kwargs["model"], "choices": [{"message": {"content": content}}]}
+
+    def completion(**kwargs):
+        module.calls.append(kwargs)
+        if module.failures:
+            raise module.failures.pop(0)
+        return module.respond(**kwargs)
+
+    module.respond = respond
+    module.completion = completion
+    monkeypatch.setitem(sys.modules, "litellm", module)
+    return module
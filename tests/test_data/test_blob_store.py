@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from agentneo.data import (
+    Base,
+    ProjectInfoModel,
+    ToolCallModel,
+    TraceLoader,
+    TraceModel,
+)
+from agentneo.data.blob_store import (
+    BLOB_MARKER,
+    PayloadPolicy,
+    blob_ref,
+    compress,
+    decompress,
+    load_blobs,
+)
+from agentneo.utils.serialization import dumps
+
+
+def test_small_payloads_stay_inline():
+    policy = PayloadPolicy(limits={"output": 100})
+    text = dumps("x" * 50)
+    assert policy.apply("output", text) == (text, None)
+    assert policy.apply("unlimited_field", dumps("x" * 10_000)) == (
+        dumps("x" * 10_000),
+        None,
+    )
+
+
+def test_oversized_payloads_become_markers():
+    policy = PayloadPolicy(limits={"output": 100}, codec="zlib", preview_length=10)
+    text = dumps({"rows": ["row"] * 1000})
+    marker, blob = policy.apply("output", text)
+
+    value = json.loads(marker)
+    assert blob_ref(value) == blob.hash == value[BLOB_MARKER]
+    assert value["size"] == len(text.encode("utf-8"))
+    assert value["preview"] == text[:10]
+    assert len(blob.data) < len(text)
+    assert decompress(blob.data, blob.codec).decode("utf-8") == text
+    # Identical payloads share one blob
+    assert policy.apply("output", text)[1].hash == blob.hash
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        compress(b"data", "lz4")
+
+
+def test_loader_fetches_blobs(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    policy = PayloadPolicy(limits={"output": 100})
+    payload = {"rows": list(range(500))}
+    marker, blob = policy.apply("output", dumps(payload))
+    with Session(engine) as session:
+        session.add(ProjectInfoModel(id=1, project_name="Blobs"))
+        session.add(TraceModel(id=1, project_id=1))
+        session.add(blob)
+        session.add(
+            ToolCallModel(
+                id=1,
+                project_id=1,
+                trace_id=1,
+                name="query",
+                input_parameters=dumps({}),
+                output=marker,
+                memory_used=0,
+            )
+        )
+        session.commit()
+
+    with Session(engine) as session:
+        assert TraceLoader(session).load(1).tool_calls[0].output == payload
+        lazy = TraceLoader(session, resolve_blobs=False).load(1)
+        digest = blob_ref(lazy.tool_calls[0].output)
+        assert json.loads(load_blobs(session, [digest])[digest]) == payload
+        assert TraceLoader(session, decode=False).load(1).tool_calls[0].output == marker
@@ -0,0 +1,61 @@
+import os
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+
+from agentneo.data import engine as engine_module
+from agentneo.data.engine import SQLITE_PRAGMAS, get_engine
+
+
+def test_new_connections_are_tuned(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    with engine.connect() as connection:
+
+        def pragma(name):
+            return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1  # NORMAL
+        assert pragma("cache_size") == SQLITE_PRAGMAS["cache_size"]
+        assert pragma("mmap_size") == SQLITE_PRAGMAS["mmap_size"]
+        assert pragma("temp_store") == 2  # MEMORY
+        assert pragma("busy_timeout") == SQLITE_PRAGMAS["busy_timeout"]
+
+
+def test_one_engine_per_path_and_process(tmp_path, monkeypatch):
+    db_path = f"sqlite:///{tmp_path / 'trace_data.db'}"
+    engine = get_engine(db_path)
+    assert get_engine(db_path) is engine
+    assert get_engine(f"sqlite:///{tmp_path / 'other.db'}") is not engine
+
+    # A forked child must not reuse its parent's pooled connections
+    pid = os.getpid()
+    monkeypatch.setattr(engine_module.os, "getpid", lambda: pid + 1)
+    forked = get_engine(db_path)
+    assert forked is not engine
+    assert get_engine(db_path) is forked
+
+
+def test_in_memory_database_is_shared_by_threads():
+    engine = get_engine("sqlite:///:memory:")
+    assert isinstance(engine.pool, StaticPool)
+    with engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO project_info (project_name) VALUES ('Memory')")
+        )
+
+    names = []
+
+    def read():
+        with engine.connect() as connection:
+            names.extend(
+                connection.execute(text("SELECT project_name FROM project_info"))
+                .scalars()
+                .all()
+            )
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    thread.join()
+    assert names == ["Memory"]
@@ -0,0 +1,45 @@
+import math
+import random
+
+import pytest
+
+from agentneo.data import latency_sketch
+
+
+def _exact(durations, q):
+    ordered = sorted(durations)
+    return ordered[max(math.ceil(q * len(ordered)), 1) - 1]
+
+
+@pytest.mark.parametrize("q", [0.5, 0.95, 0.99])
+def test_quantiles_are_within_the_relative_accuracy(q):
+    rng = random.Random(7)
+    durations = [rng.lognormvariate(0, 2) for _ in range(5000)]
+    histogram = {}
+    for duration in durations:
+        latency_sketch.add(histogram, duration)
+
+    estimate = latency_sketch.quantile(histogram, q)
+    exact = _exact(durations, q)
+    assert abs(estimate - exact) <= latency_sketch.RELATIVE_ACCURACY * exact
+
+
+def test_merged_histograms_count_every_duration():
+    first, second = {}, {}
+    for duration in (0.1, 0.2, 0.3):
+        latency_sketch.add(first, duration)
+    for duration in (0.3, 5.0, None, 0.0):
+        latency_sketch.add(second, duration)
+    # Through JSON, as stored
+    second = {str(index): count for index, count in second.items()}
+
+    merged = latency_sketch.merge([first, second])
+    assert sum(merged.values()) == 6
+    assert merged[latency_sketch.bucket_index(0.3)] == 2
+    assert latency_sketch.quantile(merged, 0.01) == pytest.approx(
+        latency_sketch.MIN_DURATION, rel=latency_sketch.RELATIVE_ACCURACY
+    )
+    assert latency_sketch.quantile(merged, 1.0) == pytest.approx(
+        5.0, rel=latency_sketch.RELATIVE_ACCURACY
+    )
+    assert latency_sketch.quantile({}, 0.5) is None
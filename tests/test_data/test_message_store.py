@@ -0,0 +1,117 @@
+import json
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from agentneo.data import (
+    Base,
+    LLMCallModel,
+    MessageModel,
+    ProjectInfoModel,
+    TraceLoader,
+    TraceModel,
+)
+from agentneo.data.blob_store import PayloadPolicy, blob_ref
+from agentneo.data.message_store import join_messages, prompt_marker, split_messages
+from agentneo.utils.serialization import dumps
+
+
+def test_split_messages_round_trips_through_join():
+    prompt = [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "Héllo"},
+    ]
+    messages = split_messages(prompt)
+    assert join_messages(text for _, text in messages) == dumps(prompt)
+    assert messages[0][0] != messages[1][0]
+    assert split_messages("plain prompt") is None
+    assert split_messages(["a", "b"]) is None
+    assert split_messages([]) is None
+
+
+def test_loader_rehydrates_shared_messages(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    system = {"role": "system", "content": "You are a helpful agent."}
+    turns = [{"role": "user", "content": f"question {i}"} for i in range(3)]
+    prompts = [[system, *turns[: i + 1]] for i in range(3)]
+
+    with Session(engine) as session:
+        session.add(ProjectInfoModel(id=1, project_name="Messages"))
+        session.add(TraceModel(id=1, project_id=1))
+        stored = set()
+        for call_id, prompt in enumerate(prompts, start=1):
+            messages = split_messages(prompt)
+            for digest, text in messages:
+                if digest not in stored:
+                    stored.add(digest)
+                    session.add(MessageModel(hash=digest, content=text))
+            session.add(
+                LLMCallModel(
+                    id=call_id,
+                    project_id=1,
+                    trace_id=1,
+                    name="completion",
+                    input_prompt=prompt_marker(len(messages)),
+                    input_message_refs=[digest for digest, _ in messages],
+                    output=dumps("answer"),
+                    token_usage="{}",
+                    cost="{}",
+                    memory_used=0,
+                )
+            )
+        session.commit()
+
+    with Session(engine) as session:
+        # Each distinct message is stored once
+        assert session.scalar(select(func.count()).select_from(MessageModel)) == 4
+        trace = TraceLoader(session).load(1)
+        raw = TraceLoader(session, decode=False).load(1)
+
+    assert [call.input_prompt for call in trace.llm_calls] == prompts
+    assert [call.input_prompt for call in raw.llm_calls] == [dumps(p) for p in prompts]
+    assert trace.to_dict()["llm_calls"][2]["input_prompt"][3]["content"] == "question 2"
+
+
+def test_oversized_messages_are_stored_as_blobs(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    policy = PayloadPolicy(limits={"input_prompt": 1000})
+    prompt = [
+        {"role": "system", "content": "Be brief."},
+        {"role": "user", "content": "long document " * 500},
+    ]
+    messages = split_messages(prompt)
+
+    with Session(engine) as session:
+        session.add(ProjectInfoModel(id=1, project_name="Messages"))
+        session.add(TraceModel(id=1, project_id=1))
+        # As the tracer stores them
+        for digest, text in messages:
+            content, blob = policy.apply("input_prompt", text)
+            if blob is not None:
+                session.add(blob)
+            session.add(MessageModel(hash=digest, content=content))
+        session.add(
+            LLMCallModel(
+                id=1,
+                project_id=1,
+                trace_id=1,
+                name="completion",
+                input_prompt=prompt_marker(len(messages)),
+                input_message_refs=[digest for digest, _ in messages],
+                output=dumps("answer"),
+                token_usage="{}",
+                cost="{}",
+                memory_used=0,
+            )
+        )
+        session.commit()
+
+    with Session(engine) as session:
+        stored = session.get(MessageModel, messages[1][0]).content
+        assert blob_ref(json.loads(stored)) is not None
+        assert len(stored) < 1000
+        assert TraceLoader(session).load(1).llm_calls[0].input_prompt == prompt
+        lazy = TraceLoader(session, resolve_blobs=False).load(1)
+        assert blob_ref(lazy.llm_calls[0].input_prompt[1]) is not None
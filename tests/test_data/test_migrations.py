@@ -0,0 +1,349 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import sessionmaker
+
+from agentneo.data import (
+    Base,
+    ErrorModel,
+    LLMCallModel,
+    ProjectInfoModel,
+    SpanRollupModel,
+    SpanUsageModel,
+    SystemInfoModel,
+    ToolCallModel,
+    TraceModel,
+)
+from agentneo.data import migrations
+from agentneo.data.migrations import SCHEMA_VERSION, migrate
+
+
+def _index_names(engine, table):
+    return {index["name"] for index in inspect(engine).get_indexes(table)}
+
+
+def test_migrate_adds_indexes_to_existing_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(connection)
+    assert not _index_names(engine, "llm_call")
+
+    migrate(engine)
+
+    assert {
+        "ix_llm_call_trace_id_start_time",
+        "ix_llm_call_agent_id",
+        "ix_llm_call_project_id",
+    } <= _index_names(engine, "llm_call")
+    assert "ix_traces_project_id_start_time" in _index_names(engine, "traces")
+    with engine.connect() as connection:
+        version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+    assert version == SCHEMA_VERSION
+
+
+def test_migrate_is_idempotent(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    migrate(engine)
+    migrate(engine)
+    assert "ix_errors_trace_id_timestamp" in _index_names(engine, "errors")
+
+
+def test_migrate_backfills_trace_rollups(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        session.add(ProjectInfoModel(id=1, project_name="Rollups"))
+        session.add(TraceModel(id=1, project_id=1, end_time=datetime.now()))
+        for call_id in (1, 2):
+            session.add(
+                LLMCallModel(
+                    id=call_id,
+                    project_id=1,
+                    trace_id=1,
+                    name="completion",
+                    input_prompt="[]",
+                    output="",
+                    token_usage=json.dumps({"input": 10, "completion": 5}),
+                    cost=json.dumps({"input": 0.25, "output": 0.5}),
+                    memory_used=0,
+                )
+            )
+        session.commit()
+    with engine.begin() as connection:
+        connection.exec_driver_sql("PRAGMA user_version = 1")
+
+    migrate(engine)
+
+    with Session() as session:
+        trace = session.get(TraceModel, 1)
+        assert trace.total_cost == 1.5
+        assert trace.total_tokens == 30
+        assert trace.llm_call_count == 2
+        assert trace.tool_call_count == 0
+        assert trace.error_count == 0
+
+
+def test_migrate_shares_duplicate_system_info(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        session.add(ProjectInfoModel(id=1, project_name="Snapshots"))
+        for trace_id, free_space in ((1, 120.5), (2, 119.0)):
+            session.add(TraceModel(id=trace_id, project_id=1))
+            session.add(
+                SystemInfoModel(
+                    id=trace_id,
+                    project_id=1,
+                    trace_id=trace_id,
+                    os_name="Linux",
+                    os_version="6.1",
+                    python_version="3.11.4",
+                    cpu_info="Test CPU",
+                    disk_info=json.dumps({"total": 500.0, "available": free_space}),
+                    memory_total=16.0,
+                    installed_packages=json.dumps({"agentneo": "1.0"}),
+                )
+            )
+        session.commit()
+    with engine.begin() as connection:
+        connection.exec_driver_sql("PRAGMA user_version = 2")
+
+    migrate(engine)
+
+    with Session() as session:
+        snapshots = session.query(SystemInfoModel).all()
+        assert [snapshot.id for snapshot in snapshots] == [1]
+        for trace_id in (1, 2):
+            trace = session.get(TraceModel, trace_id)
+            assert trace.system_info_hash == snapshots[0].content_hash
+            assert trace.system_info.cpu_info == "Test CPU"
+
+
+def test_migrate_rewrites_payloads_as_json(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    messages = [{"role": "user", "content": "What's 2 + 2?"}]
+    with Session() as session:
+        session.add(ProjectInfoModel(id=1, project_name="Payloads"))
+        session.add(TraceModel(id=1, project_id=1))
+        session.add(
+            LLMCallModel(
+                id=1,
+                project_id=1,
+                trace_id=1,
+                name="completion",
+                input_prompt=str(messages),
+                output="It's 4",
+                token_usage="{}",
+                cost="{}",
+                memory_used=0,
+            )
+        )
+        session.add(
+            ToolCallModel(
+                id=1,
+                project_id=1,
+                trace_id=1,
+                name="lookup",
+                input_parameters=json.dumps({"query": "x"}),
+                output=str({"rows": (1, 2), "ok": True}),
+                memory_used=0,
+            )
+        )
+        session.commit()
+    with engine.begin() as connection:
+        connection.exec_driver_sql("PRAGMA user_version = 4")
+
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("PRAGMA user_version = 4")
+    migrate(engine)
+
+    with Session() as session:
+        llm_call = session.get(LLMCallModel, 1)
+        assert json.loads(llm_call.input_prompt) == messages
+        assert json.loads(llm_call.output) == "It's 4"
+        tool_call = session.get(ToolCallModel, 1)
+        assert json.loads(tool_call.input_parameters) == {"query": "x"}
+        assert json.loads(tool_call.output) == {"rows": [1, 2], "ok": True}
+
+
+def test_payload_rewrite_commits_in_batches(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as session:
+        session.add(ProjectInfoModel(id=1, project_name="Payloads"))
+        session.add(TraceModel(id=1, project_id=1))
+        for call_id in range(1, 6):
+            session.add(
+                ToolCallModel(
+                    id=call_id,
+                    project_id=1,
+                    trace_id=1,
+                    name="lookup",
+                    input_parameters=str({"n": call_id}),
+                    output="ok",
+                    memory_used=0,
+                )
+            )
+        session.commit()
+    with engine.begin() as connection:
+        connection.exec_driver_sql("PRAGMA user_version = 4")
+    monkeypatch.setattr(migrations, "_PAYLOAD_BATCH_SIZE", 2)
+    commits = []
+    event.listen(engine, "commit", lambda connection: commits.append(connection))
+
+    migrate(engine)
+
+    # Three batches of tool calls (llm_call has none), then the upgrade
+    assert len(commits) == 3 + 1
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql(
+            "SELECT input_parameters FROM tool_call WHERE id = 5"
+        ).scalar() == json.dumps({"n": 5})
+
+
+def test_migrate_adds_trace_versions(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql('ALTER TABLE "traces" DROP COLUMN "version"')
+        connection.exec_driver_sql(
+            "INSERT INTO project_info (id, project_name) VALUES (1, 'Versions')"
+        )
+        connection.exec_driver_sql("INSERT INTO traces (id, project_id) VALUES (1, 1)")
+
+    migrate(engine)
+
+    with sessionmaker(bind=engine)() as session:
+        assert session.get(TraceModel, 1).version == 0
+
+
+def test_migrate_summarizes_span_usage(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        session.add(ProjectInfoModel(id=1, project_name="Usage"))
+        session.add(TraceModel(id=1, project_id=1, end_time=datetime.now()))
+        session.add(TraceModel(id=2, project_id=1))  # still running
+        for call_id, trace_id in ((1, 1), (2, 1), (3, 2)):
+            session.add(
+                LLMCallModel(
+                    id=call_id,
+                    project_id=1,
+                    trace_id=trace_id,
+                    name="completion",
+                    model="gpt-4o-mini",
+                    input_prompt="[]",
+                    output="",
+                    duration=0.5 * call_id,
+                    token_usage=json.dumps({"input": 10, "completion": 5}),
+                    # Older rows hold the object itself
+                    cost={"input": 0.25, "output": 0.5},
+                    memory_used=0,
+                )
+            )
+        session.add(
+            ToolCallModel(
+                id=1,
+                project_id=1,
+                trace_id=1,
+                name="search",
+                input_parameters="{}",
+                output="",
+                duration=0.1,
+                memory_used=0,
+            )
+        )
+        session.add(
+            ErrorModel(
+                project_id=1,
+                trace_id=1,
+                error_type="tool",
+                error_message="search: boom",
+            )
+        )
+        session.add(
+            ErrorModel(
+                project_id=1,
+                trace_id=1,
+                error_type="llm",
+                error_message="completion: rate limited",
+            )
+        )
+        session.commit()
+    with engine.begin() as connection:
+        # Errors had no model before version 8
+        connection.exec_driver_sql('ALTER TABLE "errors" DROP COLUMN "model"')
+        connection.exec_driver_sql("PRAGMA user_version = 7")
+
+    migrate(engine)
+
+    with Session() as session:
+        rows = {
+            (row.trace_id, row.span_type, row.name): row
+            for row in session.query(SpanUsageModel)
+        }
+        assert set(rows) == {
+            (1, "llm", "gpt-4o-mini"),
+            (1, "llm", None),
+            (1, "tool", "search"),
+        }
+        assert rows[1, "llm", None].error_count == 1
+        llm = rows[1, "llm", "gpt-4o-mini"]
+        assert (llm.call_count, llm.error_count) == (2, 0)
+        assert llm.total_duration == 1.5
+        assert llm.total_cost == 1.5
+        assert llm.total_tokens == 30
+        assert sum(llm.durations.values()) == 2
+        tool = rows[1, "tool", "search"]
+        assert (tool.call_count, tool.error_count) == (1, 1)
+
+
+def test_migrate_rolls_up_spans(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    start = datetime(2024, 6, 1, 10, 30)
+    with Session() as session:
+        session.add(ProjectInfoModel(id=1, project_name="Rollups"))
+        session.add(TraceModel(id=1, project_id=1, start_time=start, end_time=start))
+        session.add(
+            ToolCallModel(
+                id=1,
+                project_id=1,
+                trace_id=1,
+                name="search",
+                input_parameters="{}",
+                output="",
+                start_time=start,
+                duration=0.1,
+                memory_used=0,
+            )
+        )
+        session.commit()
+    with engine.begin() as connection:
+        # Traces had no rolled_up flag before version 9
+        connection.exec_driver_sql('ALTER TABLE "traces" DROP COLUMN "rolled_up"')
+        connection.exec_driver_sql("PRAGMA user_version = 8")
+
+    migrate(engine)
+
+    with Session() as session:
+        rollups = {
+            rollup.granularity: rollup for rollup in session.query(SpanRollupModel)
+        }
+        assert set(rollups) == {"minute", "hour", "day"}
+        assert rollups["hour"].bucket_start == datetime(2024, 6, 1, 10)
+        assert (rollups["day"].name, rollups["day"].call_count) == ("search", 1)
+        assert session.get(TraceModel, 1).rolled_up
+
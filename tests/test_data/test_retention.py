@@ -0,0 +1,110 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from agentneo.data import (
+    BlobModel,
+    ErrorModel,
+    LLMCallModel,
+    MessageModel,
+    ProjectInfoModel,
+    SpanRollupModel,
+    TraceModel,
+    get_engine,
+)
+from agentneo.data.blob_store import BLOB_MARKER
+from agentneo.data.retention import prune_raw_spans
+from agentneo.data.rollups import roll_up_traces
+from agentneo.utils.serialization import dumps
+
+NOW = datetime(2024, 6, 30)
+OLD = NOW - timedelta(days=40)
+
+
+def _llm_call(call_id, trace_id, start, message_refs, output):
+    return LLMCallModel(
+        id=call_id,
+        project_id=1,
+        trace_id=trace_id,
+        name="completion",
+        model="gpt-4o",
+        input_prompt=dumps({"__agentneo_messages__": len(message_refs)}),
+        input_message_refs=message_refs,
+        output=output,
+        start_time=start,
+        duration=1.0,
+        token_usage=dumps({"input": 1}),
+        cost=dumps({"input": 0.1}),
+        memory_used=0,
+    )
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    recent = NOW - timedelta(days=1)
+    with Session(engine) as session:
+        session.add(ProjectInfoModel(id=1, project_name="Retention"))
+        session.add(TraceModel(id=1, project_id=1, start_time=OLD, end_time=OLD))
+        session.add(TraceModel(id=2, project_id=1, start_time=recent, end_time=recent))
+        session.add(TraceModel(id=3, project_id=1, start_time=OLD))  # never ended
+        for digest in ("shared", "old-only"):
+            session.add(MessageModel(hash=digest, content="{}", created_at=OLD))
+        session.add(
+            BlobModel(hash="big", codec="zlib", size=1, data=b"", created_at=OLD)
+        )
+        marker = json.dumps({BLOB_MARKER: "big", "size": 1, "preview": ""})
+        session.add(_llm_call(1, 1, OLD, ["shared", "old-only"], marker))
+        session.add(_llm_call(2, 2, recent, ["shared"], dumps("x")))
+        session.add(_llm_call(3, 3, OLD, [], dumps("x")))
+        session.add(
+            ErrorModel(
+                project_id=1, trace_id=1, error_type="llm", error_message="x: y"
+            )
+        )
+        session.flush()
+        roll_up_traces(session, [1, 2])
+        session.commit()
+    return engine
+
+
+def _rollups(engine):
+    with Session(engine) as session:
+        return [
+            (rollup.bucket_start, rollup.name, rollup.call_count, rollup.error_count)
+            for rollup in session.query(SpanRollupModel).order_by(SpanRollupModel.id)
+        ]
+
+
+def test_prunes_spans_of_old_finished_traces(engine):
+    rollups = _rollups(engine)
+    deleted = prune_raw_spans(engine, retention_days=30, now=NOW)
+
+    assert deleted["llm_call"] == 1
+    assert deleted["errors"] == 1
+    with Session(engine) as session:
+        assert {call.id for call in session.query(LLMCallModel)} == {2, 3}
+        trace = session.get(TraceModel, 1)
+        assert trace is not None
+        assert trace.version == 1
+        assert session.get(TraceModel, 2).version == 0
+    # The aggregates stay
+    assert _rollups(engine) == rollups
+
+
+def test_unreferenced_blobs_and_messages_go_with_them(engine):
+    deleted = prune_raw_spans(engine, retention_days=30, now=NOW)
+
+    assert (deleted["blobs"], deleted["messages"]) == (1, 1)
+    with Session(engine) as session:
+        assert [m.hash for m in session.query(MessageModel)] == ["shared"]
+        assert session.query(BlobModel).count() == 0
+
+
+def test_nothing_to_prune(engine):
+    assert not any(prune_raw_spans(engine, retention_days=60, now=NOW).values())
+    # Already pruned traces are not counted again
+    prune_raw_spans(engine, retention_days=30, now=NOW)
+    assert not any(prune_raw_spans(engine, retention_days=30, now=NOW).values())
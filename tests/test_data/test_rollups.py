@@ -0,0 +1,145 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+from agentneo.data import (
+    AgentCallModel,
+    ErrorModel,
+    LLMCallModel,
+    ProjectInfoModel,
+    SpanRollupModel,
+    ToolCallModel,
+    TraceModel,
+    get_engine,
+)
+from agentneo.data.rollups import bucket_start, roll_up_traces
+from agentneo.utils.serialization import dumps
+
+
+def _add_trace(session, trace_id, start):
+    session.add(TraceModel(id=trace_id, project_id=1, start_time=start, end_time=start))
+    session.add(
+        AgentCallModel(
+            id=trace_id,
+            project_id=1,
+            trace_id=trace_id,
+            name="planner",
+            start_time=start,
+            end_time=start.replace(second=start.second + 3),
+        )
+    )
+    for n in range(2):
+        session.add(
+            LLMCallModel(
+                id=trace_id * 10 + n,
+                project_id=1,
+                trace_id=trace_id,
+                agent_id=trace_id,
+                name="completion",
+                model="gpt-4o",
+                input_prompt=dumps([]),
+                output=dumps(""),
+                start_time=start.replace(second=start.second + n),
+                duration=1.0,
+                token_usage=dumps({"input": 8, "completion": 2}),
+                cost=dumps({"input": 0.1, "output": 0.1}),
+                memory_used=0,
+            )
+        )
+    session.add(
+        ToolCallModel(
+            id=trace_id,
+            project_id=1,
+            trace_id=trace_id,
+            name="search",
+            input_parameters=dumps({}),
+            output=dumps(""),
+            start_time=start,
+            duration=0.5,
+            memory_used=0,
+        )
+    )
+    session.add(
+        ErrorModel(
+            project_id=1,
+            trace_id=trace_id,
+            error_type="tool",
+            error_message="search: timed out",
+            timestamp=start,
+        )
+    )
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    with Session(engine) as session:
+        session.add(ProjectInfoModel(id=1, project_name="Rollups"))
+        _add_trace(session, 1, datetime(2024, 6, 1, 10, 15, 20))
+        _add_trace(session, 2, datetime(2024, 6, 1, 10, 40, 0))
+        _add_trace(session, 3, datetime(2024, 6, 2, 9, 0, 0))
+        session.flush()
+        yield session
+
+
+def _rollups(session, granularity, span_type):
+    return {
+        rollup.bucket_start: rollup
+        for rollup in session.query(SpanRollupModel).filter_by(
+            granularity=granularity, span_type=span_type
+        )
+    }
+
+
+def test_bucket_start():
+    time = datetime(2024, 6, 1, 10, 15, 20, 500)
+    assert bucket_start(time, "minute") == datetime(2024, 6, 1, 10, 15)
+    assert bucket_start(time, "hour") == datetime(2024, 6, 1, 10)
+    assert bucket_start(time, "day") == datetime(2024, 6, 1)
+    with pytest.raises(ValueError):
+        bucket_start(time, "week")
+
+
+def test_spans_are_counted_at_every_granularity(session):
+    roll_up_traces(session, [1, 2, 3])
+
+    minutes = _rollups(session, "minute", "llm")
+    assert len(minutes) == 3
+    first = minutes[datetime(2024, 6, 1, 10, 15)]
+    assert first.name == "gpt-4o"
+    assert first.call_count == 2
+    assert first.total_cost == pytest.approx(0.4)
+    assert first.total_tokens == 20
+
+    days = _rollups(session, "day", "llm")
+    assert [days[day].call_count for day in sorted(days)] == [4, 2]
+    assert sum(days[datetime(2024, 6, 1)].durations.values()) == 4
+
+    hours = _rollups(session, "hour", "tool")
+    tools = hours[datetime(2024, 6, 1, 10)]
+    assert (tools.name, tools.call_count, tools.error_count) == ("search", 2, 2)
+    agents = _rollups(session, "day", "agent")[datetime(2024, 6, 1)]
+    assert (agents.name, agents.call_count) == ("planner", 2)
+    assert agents.total_duration == 6.0
+
+
+def test_later_traces_are_added_to_existing_buckets(session):
+    roll_up_traces(session, [1])
+    roll_up_traces(session, [2, 3])
+
+    day = _rollups(session, "day", "llm")[datetime(2024, 6, 1)]
+    assert day.call_count == 4
+    assert day.total_duration == 4.0
+    assert sum(day.durations.values()) == 4
+    assert session.query(SpanRollupModel).filter_by(granularity="day").count() == 6
+
+
+def test_traces_are_rolled_up_once(session):
+    roll_up_traces(session, [1, 2])
+    roll_up_traces(session, [2, 3])
+    roll_up_traces(session, [1, 2, 3])
+
+    days = _rollups(session, "day", "llm")
+    assert [days[day].call_count for day in sorted(days)] == [4, 2]
+    assert all(session.get(TraceModel, trace_id).rolled_up for trace_id in (1, 2, 3))
@@ -0,0 +1,163 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from agentneo.data import (
+    AgentCallModel,
+    Base,
+    LLMCallModel,
+    ProjectInfoModel,
+    ToolCallModel,
+    TraceLoader,
+    TraceModel,
+)
+from agentneo.utils.serialization import dumps
+
+
+def _populate(engine, traces):
+    with Session(engine) as session:
+        session.add(ProjectInfoModel(id=1, project_name="Loader"))
+        for trace_id in range(1, traces + 1):
+            session.add(TraceModel(id=trace_id, project_id=1))
+            session.add(
+                AgentCallModel(
+                    id=trace_id,
+                    project_id=1,
+                    trace_id=trace_id,
+                    name="agent",
+                    llm_call_ids=json.dumps([trace_id]),
+                )
+            )
+            session.add(
+                LLMCallModel(
+                    id=trace_id,
+                    project_id=1,
+                    trace_id=trace_id,
+                    agent_id=trace_id,
+                    name="completion",
+                    input_prompt=dumps([{"role": "user", "content": "hi"}]),
+                    output=dumps("Hello there"),
+                    token_usage=json.dumps({"input": 1, "completion": 2}),
+                    cost={"input": 0.1},
+                    memory_used=0,
+                )
+            )
+            session.add(
+                ToolCallModel(
+                    id=trace_id,
+                    project_id=1,
+                    trace_id=trace_id,
+                    name="search",
+                    input_parameters=json.dumps({"query": "x"}),
+                    output=dumps({"answer": 42}),
+                    memory_used=0,
+                    network_calls=[],
+                )
+            )
+        session.commit()
+
+
+def test_load_many_uses_a_fixed_number_of_queries(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    _populate(engine, traces=5)
+
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    with Session(engine) as session:
+        few = TraceLoader(session).load_many([1])
+        queries_for_one = len(statements)
+        statements.clear()
+        records = TraceLoader(session).load_many([5, 3, 99, 1])
+    assert len(statements) == queries_for_one
+    assert [record.id for record in records] == [5, 3, 1]
+    assert few[0].project_name == "Loader"
+
+
+def test_records_decode_json_columns_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    _populate(engine, traces=1)
+
+    with Session(engine) as session:
+        trace = TraceLoader(session).load(1)
+        raw = TraceLoader(session, decode=False).load(1)
+
+    llm_call = trace.llm_calls[0]
+    assert llm_call.input_prompt == [{"role": "user", "content": "hi"}]
+    assert llm_call.output == "Hello there"
+    assert llm_call.token_usage == {"input": 1, "completion": 2}
+    assert llm_call.cost == {"input": 0.1}
+    assert trace.agent_calls[0].llm_call_ids == [1]
+    assert trace.tool_calls[0].input_parameters == {"query": "x"}
+    assert trace.tool_calls[0].output == {"answer": 42}
+    assert raw.llm_calls[0].token_usage == json.dumps({"input": 1, "completion": 2})
+
+    document = trace.to_dict()
+    assert document["llm_calls"][0]["input_prompt"][0]["content"] == "hi"
+    assert document["system_info"] is None
+
+
+
+def test_iter_spans_reads_pages_in_start_order(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(ProjectInfoModel(id=1, project_name="Loader"))
+        session.add(TraceModel(id=1, project_id=1))
+        for call_id in range(1, 8):
+            session.add(
+                LLMCallModel(
+                    id=call_id,
+                    project_id=1,
+                    trace_id=1,
+                    agent_id=1 if call_id % 2 else None,
+                    name="completion",
+                    input_prompt=dumps("prompt"),
+                    output=dumps(call_id),
+                    start_time=datetime(2024, 6, 1, 12, 0, 10 - call_id),
+                    token_usage={},
+                    cost={},
+                    memory_used=0,
+                )
+            )
+        session.commit()
+
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    with Session(engine) as session:
+        loader = TraceLoader(session)
+        calls = list(loader.iter_spans(LLMCallModel, 1, page_size=3))
+        assert [call.id for call in calls] == [7, 6, 5, 4, 3, 2, 1]
+        assert calls[0].output == 7
+        # The ids, then one query per page
+        assert len(statements) == 1 + 3
+        of_agent = loader.iter_spans(LLMCallModel, 1, page_size=3, agent_id=None)
+        assert [call.id for call in of_agent] == [6, 4, 2]
+        assert TraceLoader(session, calls=False).load(1).llm_calls == []
+
+        statements.clear()
+        groups = loader.iter_span_groups(LLMCallModel, 1, "agent_id", [None, 1], 3)
+        assert [(key, call.id) for key, call in groups] == [
+            (None, 6),
+            (None, 4),
+            (None, 2),
+            (1, 7),
+            (1, 5),
+            (1, 3),
+            (1, 1),
+        ]
+        # Pages run across the groups
+        assert len(statements) == 1 + 3
+        groups = loader.iter_span_groups(LLMCallModel, 1, "agent_id", [1])
+        assert [call.id for _, call in groups] == [7, 5, 3, 1]
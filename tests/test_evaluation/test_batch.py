@@ -0,0 +1,113 @@
+import json
+import types
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from agentneo.data import MetricModel, ProjectInfoModel, ToolCallModel, TraceModel, get_engine
+from agentneo.evaluation import BatchEvaluation
+from agentneo.evaluation import batch as batch_module
+
+
+@pytest.fixture
+def fake_litellm(fake_litellm):
+    # Judges every tool call a success, but fails on "boom" while broken
+    fake_litellm.broken = True
+
+    def respond(**kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        if fake_litellm.broken and "boom" in prompt:
+            raise ValueError("bad request")
+        content = json.dumps({"success": True, "reason": "ok"})
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    fake_litellm.respond = respond
+    return fake_litellm
+
+
+@pytest.fixture
+def neo_session(tmp_path):
+    db_path = f"sqlite:///{tmp_path / 'trace_data.db'}"
+    with Session(get_engine(db_path)) as session:
+        session.add(ProjectInfoModel(id=1, project_name="Nightly"))
+        session.add(ProjectInfoModel(id=2, project_name="Other"))
+        for trace_id in range(1, 7):
+            project_id = 1 if trace_id <= 5 else 2
+            session.add(
+                TraceModel(
+                    id=trace_id,
+                    project_id=project_id,
+                    start_time=datetime(2024, 1, trace_id),
+                )
+            )
+            session.add(
+                ToolCallModel(
+                    id=trace_id,
+                    project_id=project_id,
+                    trace_id=trace_id,
+                    name="search",
+                    input_parameters="{}",
+                    output="boom" if trace_id == 3 else f"result {trace_id}",
+                    memory_used=0,
+                )
+            )
+        session.commit()
+    return types.SimpleNamespace(db_path=db_path, project_name="Nightly")
+
+
+def _stored(neo_session):
+    with Session(get_engine(neo_session.db_path)) as session:
+        query = select(MetricModel.trace_id, MetricModel.metric_name)
+        return sorted(session.execute(query).tuples())
+
+
+def test_batch_evaluation_resumes_after_failures(neo_session, fake_litellm):
+    batch = BatchEvaluation(neo_session, chunk_size=2, judge_cache=False)
+    summary = batch.evaluate(metric_list=["tool_call_success_rate"])
+
+    assert summary == {"evaluated": 4, "skipped": 0, "failed": 1}
+    assert [trace_id for trace_id, _ in _stored(neo_session)] == [1, 2, 4, 5]
+
+    fake_litellm.broken = False
+    fake_litellm.calls.clear()
+    summary = batch.evaluate(metric_list=["tool_call_success_rate"])
+
+    assert summary == {"evaluated": 1, "skipped": 4, "failed": 0}
+    # Only the failed trace was judged again
+    assert len(fake_litellm.calls) == 2
+    results = batch.get_results()
+    assert list(results) == [1, 2, 3, 4, 5]
+    assert all(r[0]["score"] == 1.0 for r in results.values())
+
+
+def test_batch_evaluation_selects_by_ids_and_time_range(neo_session, fake_litellm):
+    batch = BatchEvaluation(
+        neo_session,
+        trace_ids=[2, 4, 5, 6],
+        start_time=datetime(2024, 1, 3),
+        end_time=datetime(2024, 1, 6),
+        judge_cache=False,
+    )
+    with Session(batch.engine) as session:
+        assert batch.select_trace_ids(session) == [4, 5]
+
+
+def test_batch_evaluation_of_more_ids_than_sqlite_parameters(
+    neo_session, fake_litellm, monkeypatch
+):
+    # More than SQLite's default limit of 32766 bound parameters
+    batch = BatchEvaluation(
+        neo_session, trace_ids=[*range(7, 40_000), 5, 1, 2], judge_cache=False
+    )
+    with Session(batch.engine) as session:
+        assert batch.select_trace_ids(session) == [1, 2, 5]
+
+    monkeypatch.setattr(batch_module, "QUERY_CHUNK_SIZE", 2)
+    batch = BatchEvaluation(neo_session, trace_ids=[5, 1, 2], judge_cache=False)
+    summary = batch.evaluate(metric_list=["tool_call_success_rate"])
+    assert summary == {"evaluated": 3, "skipped": 0, "failed": 0}
+    assert batch.evaluate(metric_list=["tool_call_success_rate"])["skipped"] == 3
+    assert [len(results) for results in batch.get_results().values()] == [1, 1, 1]
@@ -0,0 +1,44 @@
+from sqlalchemy.orm import Session
+
+from agentneo.data import (
+    LLMCallModel,
+    MessageModel,
+    ProjectInfoModel,
+    TraceModel,
+    get_engine,
+)
+from agentneo.data.message_store import prompt_marker, split_messages
+from agentneo.evaluation.evaluation import serialize_trace
+from agentneo.utils.serialization import dumps
+
+
+def test_serialize_trace_rehydrates_stored_messages(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    prompt = [{"role": "user", "content": "hello there"}]
+    messages = split_messages(prompt)
+    with Session(engine) as session:
+        session.add(ProjectInfoModel(id=1, project_name="Serialize"))
+        session.add(TraceModel(id=1, project_id=1))
+        for digest, text in messages:
+            session.add(MessageModel(hash=digest, content=text))
+        session.add(
+            LLMCallModel(
+                id=1,
+                project_id=1,
+                trace_id=1,
+                name="completion",
+                input_prompt=prompt_marker(len(messages)),
+                input_message_refs=[digest for digest, _ in messages],
+                output=dumps("hi"),
+                token_usage="{}",
+                cost="{}",
+                memory_used=0,
+            )
+        )
+        session.commit()
+
+    with Session(engine) as session:
+        serialized = serialize_trace(session.get(TraceModel, 1))
+
+    assert serialized["llm_calls"][0]["input_prompt"] == prompt
+    assert serialized["llm_calls"][0]["output"] == "hi"
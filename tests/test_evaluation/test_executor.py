@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from agentneo.evaluation.executor import (
+    JudgeExecutor,
+    TokenBucket,
+    complete,
+    judge_map,
+    use_executor,
+)
+
+
+class RateLimitError(Exception):
+    pass
+
+
+def test_complete_retries_transient_errors(fake_litellm):
+    fake_litellm.failures = [RateLimitError("slow down"), TimeoutError()]
+    executor = JudgeExecutor(backoff_base=0.01)
+    with use_executor(executor):
+        assert complete(model="judge")["model"] == "judge"
+    assert len(fake_litellm.calls) == 3
+
+
+def test_complete_does_not_retry_other_errors(fake_litellm):
+    fake_litellm.failures = [ValueError("bad request")]
+    executor = JudgeExecutor(backoff_base=0.01)
+    with pytest.raises(ValueError):
+        executor.complete(model="judge")
+    assert len(fake_litellm.calls) == 1
+
+
+def test_map_runs_concurrently_and_preserves_order():
+    executor = JudgeExecutor(max_concurrency=4)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def judge(item):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return item * 2
+
+    with use_executor(executor):
+        assert judge_map(judge, range(8)) == [i * 2 for i in range(8)]
+        # Fan-out from inside a worker runs inline instead of deadlocking
+        assert judge_map(lambda i: judge_map(judge, [i, i]), range(4)) == [
+            [i * 2, i * 2] for i in range(4)
+        ]
+    executor.shutdown()
+    assert 1 < peak[0] <= 4
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
@@ -0,0 +1,115 @@
+import time
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session
+
+from agentneo.data import Base, JudgeCacheModel
+from agentneo.evaluation import judge_cache
+from agentneo.evaluation.executor import JudgeExecutor
+from agentneo.evaluation.judge_cache import JudgeCache, cache_key
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def _count(engine):
+    with Session(engine) as session:
+        return session.scalar(select(func.count()).select_from(JudgeCacheModel))
+
+
+def test_cache_key_ignores_credentials_but_not_params():
+    messages = [{"role": "user", "content": "score this"}]
+    key = cache_key(model="gpt-4o", messages=messages, temperature=0)
+    assert key == cache_key(
+        temperature=0, messages=messages, model="gpt-4o", api_key="secret"
+    )
+    assert key != cache_key(model="gpt-4o", messages=messages, temperature=1)
+    assert key != cache_key(model="gpt-4o-mini", messages=messages, temperature=0)
+
+
+def test_repeated_requests_are_answered_from_cache(engine, fake_litellm):
+    cache = JudgeCache(engine)
+    executor = JudgeExecutor(cache=cache)
+    request = {"model": "judge", "messages": [{"role": "user", "content": "hi"}]}
+
+    first = executor.complete(**request)
+    second = executor.complete(**request)
+
+    assert len(fake_litellm.calls) == 1
+    assert second.choices[0].message.content == "answer 1"
+    assert first["choices"][0]["message"]["content"] == "answer 1"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    # Another process (or a later evaluation) reads the same entries
+    assert JudgeCache(engine).get(cache_key(**request)) is not None
+
+
+def test_expired_entries_are_misses(engine, fake_litellm):
+    cache = JudgeCache(engine, ttl=0.05)
+    cache.put("key", {"choices": []})
+    assert cache.get("key") is not None
+    time.sleep(0.1)
+    assert cache.get("key") is None
+    cache.prune()
+    assert _count(engine) == 0
+
+
+def test_prune_evicts_least_recently_used(engine, fake_litellm, monkeypatch):
+    monkeypatch.setattr(judge_cache, "TOUCH_INTERVAL", 0)
+    cache = JudgeCache(engine, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, {"choices": []})
+        time.sleep(0.01)
+    cache.get("a")
+    cache.prune()
+    assert _count(engine) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_prune_evicts_least_recently_used_beyond_max_bytes(
+    engine, fake_litellm, monkeypatch
+):
+    monkeypatch.setattr(judge_cache, "TOUCH_INTERVAL", 0)
+    response = {"choices": [{"message": {"content": "x" * 1000}}]}
+    cache = JudgeCache(engine, max_bytes=2500)
+    for key in ("a", "b", "c"):
+        cache.put(key, response)
+        time.sleep(0.01)
+    cache.get("a")
+    cache.prune()
+    with Session(engine) as session:
+        assert session.scalar(select(func.sum(JudgeCacheModel.size))) <= 2500
+    assert _count(engine) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_hits_record_their_use_at_most_once_per_interval(engine, fake_litellm):
+    cache = JudgeCache(engine)
+    cache.put("key", {"choices": []})
+    updates = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: updates.append(statement)
+        if statement.startswith("UPDATE")
+        else None,
+    )
+    for _ in range(5):
+        assert cache.get("key") is not None
+    assert updates == []
+
+    with Session(engine) as session:
+        entry = session.get(JudgeCacheModel, "key")
+        entry.last_used_at -= timedelta(seconds=judge_cache.TOUCH_INTERVAL + 1)
+        session.commit()
+    updates.clear()
+    cache.get("key")
+    cache.get("key")
+    assert len(updates) == 1
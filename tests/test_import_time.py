@@ -0,0 +1,77 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Modules that only the evaluation, the dashboard or a traced tool need.
+HEAVY_MODULES = [
+    "litellm",
+    "openai",
+    "flask",
+    "waitress",
+    "aiohttp",
+    "requests",
+    "cpuinfo",
+    "GPUtil",
+    "pkg_resources",
+]
+
+# Seconds `from agentneo import Tracer` may take in a fresh interpreter.
+IMPORT_TIME_BUDGET = float(os.environ.get("AGENTNEO_IMPORT_TIME_BUDGET", "1.0"))
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _import_in_subprocess(statement):
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))\n"
+    )
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")])
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize(
+    "statement", ["import agentneo", "from agentneo import Tracer"]
+)
+def test_import_does_not_load_heavy_dependencies(statement):
+    loaded = set(_import_in_subprocess(statement)["modules"])
+    assert not loaded & set(HEAVY_MODULES)
+
+
+def test_tracer_import_time_budget():
+    # Best of a few runs, to keep a busy machine from failing the check.
+    elapsed = min(
+        _import_in_subprocess("from agentneo import Tracer")["elapsed"]
+        for _ in range(3)
+    )
+    assert elapsed < IMPORT_TIME_BUDGET, (
+        f"Importing Tracer took {elapsed:.2f}s, "
+        f"budget is {IMPORT_TIME_BUDGET:.2f}s"
+    )
+
+
+def test_public_names_resolve_lazily():
+    import agentneo
+
+    assert agentneo.Tracer.__name__ == "Tracer"
+    assert agentneo.AgentNeo.__name__ == "AgentNeo"
+    assert agentneo.data.TraceModel.__tablename__ == "traces"
+    with pytest.raises(AttributeError):
+        agentneo.not_a_public_name
@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy.orm import Session, sessionmaker
+
+from agentneo.data import ProjectInfoModel, TraceModel, get_engine
+from agentneo.server import dashboard_server
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """An empty database, served by the dashboard with a cold cache."""
+    engine = get_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    monkeypatch.setattr(dashboard_server, "Session", sessionmaker(bind=engine))
+    dashboard_server.response_cache.clear()
+    return engine
+
+
+@pytest.fixture
+def client(engine):
+    return dashboard_server.app.test_client()
+
+
+@pytest.fixture
+def trace(engine):
+    """Project 1 with an empty trace 1, for tests to add spans to."""
+    with Session(engine) as session:
+        session.add(ProjectInfoModel(id=1, project_name="Test"))
+        session.add(TraceModel(id=1, project_id=1))
+        session.commit()
+    return 1
@@ -0,0 +1,214 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from agentneo.data import (
+    ErrorModel,
+    LLMCallModel,
+    ProjectInfoModel,
+    ToolCallModel,
+    TraceModel,
+)
+from agentneo.data.latency_sketch import RELATIVE_ACCURACY
+from agentneo.data.rollups import roll_up_traces
+from agentneo.data.span_usage import summarize_traces
+from agentneo.server.analytics import project_analytics
+from agentneo.utils.serialization import dumps
+
+
+@pytest.fixture(autouse=True)
+def traces(engine):
+    start = datetime(2024, 6, 1, 10)
+    with Session(engine) as session:
+        session.add(ProjectInfoModel(id=1, project_name="Analytics"))
+        session.add(ProjectInfoModel(id=2, project_name="Other"))
+        # Two traces a day for two days, then one still running
+        for trace_id in range(1, 6):
+            trace_start = start + timedelta(days=(trace_id - 1) // 2, hours=trace_id)
+            running = trace_id == 5
+            session.add(
+                TraceModel(
+                    id=trace_id,
+                    project_id=1,
+                    start_time=trace_start,
+                    end_time=None if running else trace_start + timedelta(seconds=10),
+                    duration=None if running else float(trace_id),
+                    total_cost=None if running else 0.5,
+                    total_tokens=None if running else 100,
+                    llm_call_count=None if running else 2,
+                    tool_call_count=None if running else 1,
+                    error_count=None if running else int(trace_id == 2),
+                )
+            )
+            for n, model in enumerate(("gpt-4o", "gpt-4o-mini")):
+                session.add(
+                    LLMCallModel(
+                        id=trace_id * 10 + n,
+                        project_id=1,
+                        trace_id=trace_id,
+                        name="completion",
+                        model=model,
+                        input_prompt=dumps([]),
+                        output=dumps(""),
+                        start_time=trace_start,
+                        duration=trace_id * (n + 1),
+                        token_usage=dumps({"input": 40, "completion": 10}),
+                        cost=dumps({"input": 0.2, "output": 0.05}),
+                        memory_used=0,
+                    )
+                )
+            session.add(
+                ToolCallModel(
+                    id=trace_id,
+                    project_id=1,
+                    trace_id=trace_id,
+                    name="search",
+                    input_parameters=dumps({}),
+                    output=dumps(""),
+                    start_time=trace_start,
+                    duration=0.1,
+                    memory_used=0,
+                )
+            )
+        session.add(
+            ErrorModel(
+                project_id=1,
+                trace_id=2,
+                error_type="tool",
+                error_message="search: timed out",
+                timestamp=start + timedelta(hours=2),
+            )
+        )
+        session.add(TraceModel(id=6, project_id=2, end_time=start, duration=1.0))
+        session.flush()
+        # As the tracer does when each trace stops
+        summarize_traces(session, [1, 2, 3, 4, 6])
+        roll_up_traces(session, [1, 2, 3, 4, 6])
+        session.commit()
+
+
+def test_model_and_tool_breakdown(client):
+    analytics = client.get("/api/projects/1/analytics").get_json()
+
+    models = {model["model"]: model for model in analytics["models"]}
+    assert set(models) == {"gpt-4o", "gpt-4o-mini"}
+    assert models["gpt-4o"]["call_count"] == 4  # the running trace is left out
+    assert models["gpt-4o"]["total_cost"] == pytest.approx(1.0)
+    assert models["gpt-4o"]["total_tokens"] == 200
+    assert models["gpt-4o-mini"]["total_duration"] == pytest.approx(20.0)
+    assert analytics["llm_calls"]["call_count"] == 8
+    assert analytics["llm_calls"]["error_rate"] == 0.0
+
+    (tool,) = analytics["tools"]
+    assert tool["name"] == "search"
+    assert tool["call_count"] == 4
+    assert tool["error_count"] == 1
+    assert tool["error_rate"] == pytest.approx(1 / 5)
+
+    traces = analytics["traces"]
+    assert traces["trace_count"] == 4
+    assert traces["error_rate"] == 0.25
+    assert traces["total_cost"] == pytest.approx(2.0)
+
+
+def test_duration_percentiles(client):
+    analytics = client.get("/api/projects/1/analytics").get_json()
+    assert analytics["traces"]["duration"] == {"p50": 2.0, "p95": 4.0, "p99": 4.0}
+
+    # gpt-4o-mini calls took 2, 4, 6 and 8 seconds
+    (mini,) = [m for m in analytics["models"] if m["model"] == "gpt-4o-mini"]
+    for name, exact in {"p50": 4.0, "p99": 8.0}.items():
+        assert mini["duration"][name] == pytest.approx(exact, rel=RELATIVE_ACCURACY)
+    llm = analytics["llm_calls"]["duration"]
+    assert llm["p50"] == pytest.approx(3.0, rel=RELATIVE_ACCURACY)
+
+
+def test_time_series_and_range(client):
+    analytics = client.get("/api/projects/1/analytics").get_json()
+    series = analytics["series"]
+    assert [bucket["trace_count"] for bucket in series] == [2, 2]
+    assert series[0]["total_tokens"] == 200
+    assert series[1]["mean_duration"] == 3.5
+
+    hourly = client.get("/api/projects/1/analytics?bucket=hour").get_json()
+    assert len(hourly["series"]) == 4
+
+    second_day = client.get(
+        "/api/projects/1/analytics?start_time=2024-06-02T00:00:00"
+    ).get_json()
+    assert second_day["traces"]["trace_count"] == 2
+    assert second_day["tools"][0]["error_count"] == 0
+
+
+def test_invalid_requests(client):
+    response = client.get("/api/projects/1/analytics?bucket=week")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+    assert client.get("/api/projects/1/analytics?start_time=x").status_code == 400
+    assert client.get("/api/projects/9/analytics").status_code == 404
+
+
+def test_rollups(client):
+    rollups = client.get("/api/projects/1/rollups?granularity=day").get_json()
+    assert [(r["span_type"], r["name"]) for r in rollups[:3]] == [
+        ("llm", "gpt-4o"),
+        ("llm", "gpt-4o-mini"),
+        ("tool", "search"),
+    ]
+    assert [r["call_count"] for r in rollups] == [2, 2, 2] * 2
+    assert rollups[2]["error_count"] == 1
+
+    (mini,) = client.get(
+        "/api/projects/1/rollups?granularity=day&span_type=llm&name=gpt-4o-mini"
+        "&start_time=2024-06-02T00:00:00"
+    ).get_json()
+    # Calls of 6 and 8 seconds
+    assert mini["total_duration"] == 14.0
+    assert mini["duration"]["p99"] == pytest.approx(8.0, rel=RELATIVE_ACCURACY)
+
+    hourly = client.get("/api/projects/1/rollups").get_json()
+    assert len(hourly) == 4 * 3
+    assert client.get("/api/projects/1/rollups?granularity=week").status_code == 400
+    assert client.get("/api/projects/1/rollups?span_type=x").status_code == 400
+
+
+def test_llm_errors_count_against_their_model(engine):
+    with Session(engine) as session:
+        session.add(ProjectInfoModel(id=3, project_name="Errors"))
+        session.add(TraceModel(id=7, project_id=3, end_time=datetime(2024, 6, 1)))
+        for call_id, model in enumerate(("gpt-4o", "gpt-4o", "gpt-4o-mini")):
+            session.add(
+                LLMCallModel(
+                    id=call_id + 100,
+                    project_id=3,
+                    trace_id=7,
+                    name="completion",
+                    model=model,
+                    input_prompt=dumps([]),
+                    output=dumps(""),
+                    duration=1.0,
+                    token_usage=dumps({}),
+                    cost=dumps({}),
+                    memory_used=0,
+                )
+            )
+        session.add(
+            ErrorModel(
+                project_id=3,
+                trace_id=7,
+                error_type="llm",
+                error_message="completion: rate limited",
+                model="gpt-4o",
+            )
+        )
+        session.flush()
+        summarize_traces(session, [7])
+        analytics = project_analytics(session, 3)
+
+    models = {model["model"]: model for model in analytics["models"]}
+    assert set(models) == {"gpt-4o", "gpt-4o-mini"}
+    assert models["gpt-4o"]["error_count"] == 1
+    assert models["gpt-4o"]["error_rate"] == pytest.approx(1 / 3)
+    assert models["gpt-4o-mini"]["error_rate"] == 0.0
+    assert analytics["llm_calls"]["error_rate"] == pytest.approx(1 / 4)
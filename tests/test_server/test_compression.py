@@ -0,0 +1,114 @@
+import gzip
+import sys
+import types
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+from agentneo.data import LLMCallModel
+from agentneo.server import dashboard_server
+from agentneo.server.streaming import StreamedJSON, iter_json
+from agentneo.utils.serialization import dumps
+
+
+@pytest.fixture(autouse=True)
+def llm_calls(engine, trace):
+    with Session(engine) as session:
+        for call_id in range(1, 21):
+            session.add(
+                LLMCallModel(
+                    id=call_id,
+                    project_id=1,
+                    trace_id=1,
+                    name="completion",
+                    input_prompt=dumps([{"role": "user", "content": "hello " * 500}]),
+                    output=dumps("é" * 1000),
+                    token_usage={"input": 1},
+                    cost={"input": 0.1},
+                    memory_used=0,
+                )
+            )
+        session.commit()
+
+
+def test_streamed_json_matches_jsonify():
+    document = {
+        "b": (i for i in range(3)),
+        "a": {"spans": ({"z": i, "y": datetime(2024, 6, 1)} for i in range(500))},
+        "c": ["plain", None, 1.5],
+        "d": (x for x in []),
+    }
+    expected = {
+        "b": [0, 1, 2],
+        "a": {"spans": [{"z": i, "y": datetime(2024, 6, 1)} for i in range(500)]},
+        "c": ["plain", None, 1.5],
+        "d": [],
+    }
+    app = dashboard_server.app
+    with app.app_context():
+        jsonified = app.json.response(expected).get_data()
+    chunks = list(iter_json(StreamedJSON(document).document, app.json, chunk_size=100))
+    assert len(chunks) > 1
+    assert b"".join(chunks) == jsonified
+
+
+@pytest.mark.parametrize("url", ["/api/traces/1", "/api/analysis_traces/1"])
+def test_trace_is_compressed_when_accepted(client, url):
+    plain = client.get(url)
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["Vary"]
+
+    for _ in range(2):  # streamed, then served from the cache
+        compressed = client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(compressed.data) == plain.data
+        assert len(compressed.data) < len(plain.data) / 10
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/api/projects", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json()[0]["project_name"] == "Test"
+
+
+def test_brotli_is_preferred_when_installed(client, monkeypatch):
+    class Compressor:
+        def __init__(self, quality):
+            self.data = []
+
+        def process(self, data):
+            self.data.append(data)
+            return b""
+
+        def finish(self):
+            return b"br:" + b"".join(self.data)
+
+    monkeypatch.setitem(sys.modules, "brotli", types.SimpleNamespace(Compressor=Compressor))
+    plain = client.get("/api/traces/1").data
+    response = client.get("/api/traces/1", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.data == b"br:" + plain
+    response = client.get("/api/traces/1", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
+def test_matching_etag_skips_building_the_response(client, monkeypatch):
+    etag = client.get("/api/traces/1").headers["ETag"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("trace loaded")
+
+    monkeypatch.setattr(dashboard_server, "_load_trace", fail)
+    dashboard_server.response_cache.clear()
+    response = client.get("/api/traces/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+
+def test_large_streamed_responses_are_not_cached(client, monkeypatch):
+    monkeypatch.setattr(dashboard_server, "STREAMED_CACHE_LIMIT", 10_000)
+    first = client.get("/api/traces/1")
+    assert len(first.data) > 10_000
+    assert dashboard_server.response_cache.stats()["entries"] == 0
+    assert client.get("/api/traces/1").data == first.data
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from agentneo.data import (
+    ErrorModel,
+    MetricModel,
+    ProjectInfoModel,
+    TraceModel,
+)
+
+
+@pytest.fixture(autouse=True)
+def traces(engine):
+    start = datetime(2024, 6, 1)
+    with Session(engine) as session:
+        for project_id in range(1, 6):
+            session.add(ProjectInfoModel(id=project_id, project_name=f"p{project_id}"))
+        for trace_id in range(1, 26):
+            running = trace_id % 5 == 0
+            session.add(
+                TraceModel(
+                    id=trace_id,
+                    project_id=1,
+                    start_time=start + timedelta(minutes=trace_id),
+                    duration=None if running else 1.0,
+                    # Ties, so that pages are cut inside a run of equal values
+                    total_cost=None if running else float(trace_id % 4),
+                    error_count=None if running else int(trace_id % 3 == 0),
+                )
+            )
+            if trace_id % 3 == 0:
+                session.add(
+                    ErrorModel(
+                        project_id=1,
+                        trace_id=trace_id,
+                        error_type="ValueError",
+                        error_message="bad",
+                    )
+                )
+            session.add(
+                MetricModel(
+                    trace_id=trace_id,
+                    metric_name="a" if trace_id % 2 else "b",
+                    score=trace_id / 25,
+                    result_detail={},
+                    config={},
+                )
+            )
+        session.commit()
+
+
+def _all_pages(client, url, limit, **query):
+    items, cursor, pages = [], None, 0
+    while True:
+        params = {**query, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(url, query_string=params)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page) <= limit
+        items.extend(page)
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return items, pages
+
+
+def test_unpaginated_list_is_unchanged(client):
+    response = client.get("/api/projects/1/traces")
+    traces = response.get_json()
+    assert [t["id"] for t in traces] == list(range(1, 26))
+    assert "X-Next-Cursor" not in response.headers
+    assert "sort_key" not in traces[0]
+    assert traces[4]["total_errors"] == 0  # running, counted
+    assert traces[5]["total_errors"] == 1
+
+
+@pytest.mark.parametrize("sort", ["id", "-start_time", "total_cost", "-total_cost"])
+def test_pages_cover_the_sorted_list_once(client, sort):
+    url = "/api/projects/1/traces"
+    expected = [t["id"] for t in client.get(url, query_string={"sort": sort}).get_json()]
+    items, pages = _all_pages(client, url, limit=4, sort=sort)
+    assert [t["id"] for t in items] == expected
+    assert pages == 7
+
+
+def test_sort_orders_by_value_then_id(client):
+    traces = client.get("/api/projects/1/traces?sort=-total_cost").get_json()
+    keys = [(t["total_cost"] or 0.0, t["id"]) for t in traces]
+    assert keys == sorted(keys, key=lambda k: (-k[0], -k[1]))
+
+
+def test_trace_filters(client):
+    def ids(query):
+        return [t["id"] for t in client.get(f"/api/projects/1/traces?{query}").get_json()]
+
+    assert ids("has_errors=true") == [3, 6, 9, 12, 15, 18, 21, 24]
+    assert 15 not in ids("has_errors=false")
+    assert ids("min_cost=3") == [3, 7, 11, 19, 23]
+    assert ids("start_time=2024-06-01T00:10:00&end_time=2024-06-01T00:13:00") == [
+        10,
+        11,
+        12,
+    ]
+    assert ids("has_errors=1&min_cost=2&limit=2") == [3, 6]
+
+
+def test_projects_and_metrics_paginate(client):
+    projects, _ = _all_pages(client, "/api/projects", limit=2)
+    assert [p["id"] for p in projects] == [1, 2, 3, 4, 5]
+
+    metrics, _ = _all_pages(
+        client, "/api/projects/1/evaluation", limit=10, sort="-score"
+    )
+    assert [m["trace_id"] for m in metrics] == list(range(25, 0, -1))
+
+    only_b = client.get("/api/projects/1/evaluation?metric_name=b").get_json()
+    assert {m["trace_id"] % 2 for m in only_b} == {0}
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["sort=cost", "limit=0", "limit=x", "cursor=notacursor", "has_errors=maybe", "min_cost=x"],
+)
+def test_invalid_parameters_are_rejected(client, query):
+    response = client.get(f"/api/projects/1/traces?{query}")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_cursor_is_bound_to_its_sort(client):
+    response = client.get("/api/projects/1/traces?limit=2&sort=total_cost")
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(f"/api/projects/1/traces?limit=2&sort=-total_cost&cursor={cursor}")
+    assert response.status_code == 400
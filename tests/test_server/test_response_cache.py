@@ -0,0 +1,113 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from agentneo.data import (
+    LLMCallModel,
+    MetricModel,
+    TraceModel,
+)
+from agentneo.data.trace_versions import bump_trace_versions
+from agentneo.server import dashboard_server
+from agentneo.server.response_cache import ENTRY_OVERHEAD, ResponseCache
+from agentneo.utils.serialization import dumps
+
+
+def test_lookup_needs_the_stored_version():
+    cache = ResponseCache(max_bytes=10_000)
+    cache.put("trace", 1, b"old")
+    assert cache.get("trace", 1).body == b"old"
+    assert cache.get("trace", 2) is None
+    cache.put("trace", 2, b"new")
+    assert cache.get("trace", 2).body == b"new"
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    cache = ResponseCache(max_bytes=3 * (100 + ENTRY_OVERHEAD))
+    for key in "abc":
+        cache.put(key, 0, b"x" * 100)
+    cache.get("a", 0)
+    cache.put("d", 0, b"x" * 100)
+    assert cache.get("b", 0) is None
+    assert all(cache.get(key, 0) for key in "acd")
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+    cache.put("huge", 0, b"x" * cache.max_bytes)
+    assert cache.get("huge", 0) is None
+    assert cache.stats()["entries"] == 3
+
+
+@pytest.fixture(autouse=True)
+def llm_call(engine, trace):
+    with Session(engine) as session:
+        session.add(
+            LLMCallModel(
+                id=1,
+                project_id=1,
+                trace_id=1,
+                name="completion",
+                input_prompt=dumps([{"role": "user", "content": "hi"}]),
+                output=dumps("first"),
+                token_usage={"input": 1},
+                cost={"input": 0.1},
+                memory_used=0,
+            )
+        )
+        session.commit()
+
+
+def _outputs(client):
+    return [call["output"] for call in client.get("/api/traces/1").get_json()["llm_calls"]]
+
+
+def test_trace_is_served_from_cache_until_its_version_changes(engine):
+    client = dashboard_server.app.test_client()
+    cache = dashboard_server.response_cache
+    assert _outputs(client) == ["first"]
+
+    # Written behind the tracer's back: the cached response is still current
+    with Session(engine) as session:
+        session.get(LLMCallModel, 1).output = dumps("changed")
+        session.commit()
+    hits = cache.hits
+    assert _outputs(client) == ["first"]
+    assert cache.hits == hits + 1
+
+    with Session(engine) as session:
+        bump_trace_versions(session, [1])
+        session.commit()
+    assert _outputs(client) == ["changed"]
+
+
+def test_stored_metrics_refresh_the_evaluation_view(engine):
+    client = dashboard_server.app.test_client()
+    assert client.get("/api/projects/1/evaluation").get_json() == []
+    assert client.get("/api/analysis_traces/1").get_json()["metrics"] == []
+
+    with Session(engine) as session:
+        session.add(
+            MetricModel(
+                trace_id=1, metric_name="m", score=1.0, result_detail={}, config={}
+            )
+        )
+        bump_trace_versions(session, [1])
+        session.commit()
+    assert len(client.get("/api/projects/1/evaluation").get_json()) == 1
+    assert len(client.get("/api/analysis_traces/1").get_json()["metrics"]) == 1
+
+
+def test_errors_are_not_cached(engine):
+    client = dashboard_server.app.test_client()
+    assert client.get("/api/traces/2").status_code == 404
+    with Session(engine) as session:
+        session.add(TraceModel(id=2, project_id=1))
+        session.commit()
+    assert client.get("/api/traces/2").status_code == 200
+
+
+def test_compressed_variants_count_towards_the_size():
+    cache = ResponseCache(max_bytes=10_000)
+    entry = cache.put("trace", 1, b"x" * 1000)
+    cache.add_encoding("trace", entry, "gzip", b"y" * 100)
+    assert cache.get("trace", 1).encoded == {"gzip": b"y" * 100}
+    assert cache.stats()["bytes"] == 1100 + ENTRY_OVERHEAD
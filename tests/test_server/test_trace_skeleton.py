@@ -0,0 +1,116 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from agentneo.data import (
+    AgentCallModel,
+    ErrorModel,
+    LLMCallModel,
+    ToolCallModel,
+    TraceModel,
+)
+from agentneo.server import dashboard_server
+from agentneo.utils.serialization import dumps
+
+
+@pytest.fixture(autouse=True)
+def spans(engine, trace):
+    with Session(engine) as session:
+        session.add(TraceModel(id=2, project_id=1))
+        session.add(AgentCallModel(id=1, project_id=1, trace_id=1, name="agent"))
+        for call_id in (1, 2):
+            session.add(
+                LLMCallModel(
+                    id=call_id,
+                    project_id=1,
+                    trace_id=1,
+                    agent_id=1 if call_id == 1 else None,
+                    name="completion",
+                    model="gpt-4o-mini",
+                    input_prompt=dumps([{"role": "user", "content": "x" * 5000}]),
+                    output=dumps("y" * 5000),
+                    token_usage={"input": 10, "completion": 20},
+                    cost={"input": 0.1, "output": 0.2},
+                    memory_used=0,
+                )
+            )
+        session.add(
+            ToolCallModel(
+                id=1,
+                project_id=1,
+                trace_id=1,
+                agent_id=1,
+                name="search",
+                input_parameters=dumps({"query": "x"}),
+                output=dumps("z" * 5000),
+                memory_used=0,
+                network_calls=[],
+            )
+        )
+        session.add(
+            ErrorModel(
+                project_id=1,
+                trace_id=1,
+                agent_id=1,
+                tool_call_id=1,
+                error_type="ValueError",
+                error_message="bad input",
+            )
+        )
+        session.commit()
+
+
+def test_skeleton_has_the_span_tree_without_payloads(client):
+    skeleton = client.get("/api/traces/1/skeleton").get_json()
+    (agent,) = skeleton["agent_calls"]
+    (llm_call,) = agent["llm_calls"]
+    (tool_call,) = agent["tool_calls"]
+    assert [call["id"] for call in skeleton["llm_calls"]] == [2]
+
+    assert llm_call["model"] == "gpt-4o-mini"
+    assert "input_prompt" not in llm_call and "output" not in llm_call
+    assert "output" not in tool_call and "network_calls" not in tool_call
+    assert tool_call["error_count"] == 1
+    assert tool_call["status"] == "error"
+    assert llm_call["status"] == "running"  # never ended
+    assert [error["error_type"] for error in agent["errors"]] == ["ValueError"]
+    assert "error_message" not in agent["errors"][0]
+
+
+def test_span_detail_matches_the_full_trace(client):
+    trace = client.get("/api/traces/1").get_json()
+    (agent,) = trace["agent_calls"]
+    expected = {
+        ("llm_call", 1): agent["llm_calls"][0],
+        ("llm_call", 2): trace["llm_calls"][0],
+        ("tool_call", 1): agent["tool_calls"][0],
+    }
+    for (kind, span_id), span in expected.items():
+        detail = client.get(f"/api/traces/1/spans/{kind}/{span_id}").get_json()
+        assert detail == span
+    assert expected[("tool_call", 1)]["errors"][0]["error_message"] == "bad input"
+
+
+def test_span_groups_can_be_skipped(client):
+    groups = dashboard_server._span_groups(LLMCallModel, 1, "agent_id", [1, None])
+    assert [call.id for call in groups[None]] == [2]
+    assert list(groups[1]) == []
+
+
+def test_span_of_another_trace_or_kind_is_not_found(client):
+    assert client.get("/api/traces/2/spans/llm_call/1").status_code == 404
+    assert client.get("/api/traces/1/spans/llm_call/9").status_code == 404
+    assert client.get("/api/traces/1/spans/prompt/1").status_code == 404
+    assert client.get("/api/traces/9/skeleton").status_code == 404
+
+
+@pytest.mark.parametrize(
+    "url",
+    ["/api/traces/1/skeleton", "/api/traces/1/spans/llm_call/1", "/api/traces/1"],
+)
+def test_conditional_get(client, url):
+    response = client.get(url)
+    etag = response.headers["ETag"]
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+    assert client.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200
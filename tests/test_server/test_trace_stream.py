@@ -0,0 +1,167 @@
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+from agentneo.data import (
+    AgentCallModel,
+    ErrorModel,
+    ToolCallModel,
+    TraceModel,
+)
+from agentneo.data.trace_versions import bump_trace_versions
+from agentneo.server import dashboard_server
+from agentneo.server.trace_tail import TraceTail
+from agentneo.utils.serialization import dumps
+
+
+@pytest.fixture(autouse=True)
+def agent_call(engine, trace, monkeypatch):
+    with Session(engine) as session:
+        session.add(AgentCallModel(id=1, project_id=1, trace_id=1, name="agent"))
+        session.commit()
+    monkeypatch.setattr(dashboard_server, "STREAM_POLL_INTERVAL", 0.01)
+
+
+def _write(engine, *rows, **trace_values):
+    with Session(engine) as session:
+        session.add_all(rows)
+        if trace_values:
+            trace = session.get(TraceModel, 1)
+            for name, value in trace_values.items():
+                setattr(trace, name, value)
+        session.flush()
+        bump_trace_versions(session, [1])
+        session.commit()
+
+
+def _tool_call(call_id, agent_id=1):
+    return ToolCallModel(
+        id=call_id,
+        project_id=1,
+        trace_id=1,
+        agent_id=agent_id,
+        name="search",
+        input_parameters=dumps({"query": call_id}),
+        output=dumps(f"result {call_id}"),
+        memory_used=0,
+        network_calls=[],
+    )
+
+
+def _events(chunks):
+    """The (event, data) pairs of an SSE stream."""
+    for chunk in chunks:
+        fields = dict(
+            line.split(": ", 1)
+            for line in chunk.decode("utf-8").splitlines()
+            if line and not line.startswith(":")
+        )
+        if "event" in fields:
+            yield fields["event"], json.loads(fields["data"])
+
+
+def test_tail_returns_each_span_once(engine):
+    tail = TraceTail(1)
+    with Session(engine) as session:
+        assert [kind for kind, _ in tail.poll(session)] == ["agent_call"]
+        assert tail.poll(session) == []
+
+    # Ids are handed out when a span starts, so rows land out of order
+    _write(engine, _tool_call(5))
+    with Session(engine) as session:
+        assert [span.id for _, span in tail.poll(session)] == [5]
+    _write(
+        engine,
+        _tool_call(3),
+        ErrorModel(
+            id=1,
+            project_id=1,
+            trace_id=1,
+            tool_call_id=3,
+            error_type="ValueError",
+            error_message="bad",
+        ),
+    )
+    with Session(engine) as session:
+        changes = tail.poll(session)
+    assert [(kind, span.id) for kind, span in changes] == [
+        ("tool_call", 3),
+        ("error", 1),
+    ]
+    assert not tail.finished
+
+    with Session(engine) as session:
+        agent = session.get(AgentCallModel, 1)
+        agent.end_time = datetime.now()
+        session.commit()
+    _write(engine, end_time=datetime.now())
+    with Session(engine) as session:
+        changes = tail.poll(session)
+    assert [(kind, span.id) for kind, span in changes] == [("agent_call", 1)]
+    assert tail.finished
+
+    with Session(engine) as session:
+        assert TraceTail(2).poll(session) is None
+
+
+def test_stream_follows_the_trace_until_it_ends(engine):
+    client = dashboard_server.app.test_client()
+    response = client.get("/api/traces/1/stream", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    events = _events(response.response)
+
+    kind, agent = next(events)
+    assert (kind, agent["name"], agent["end_time"]) == ("agent_call", "agent", None)
+
+    _write(engine, _tool_call(2))
+    kind, span = next(events)
+    assert (kind, span["id"], span["agent_id"]) == ("tool_call", 2, 1)
+    assert span["output"] == "result 2"
+
+    _write(
+        engine,
+        ErrorModel(
+            id=1,
+            project_id=1,
+            trace_id=1,
+            tool_call_id=2,
+            error_type="ValueError",
+            error_message="bad",
+        ),
+        end_time=datetime.now(),
+        duration=1.5,
+        total_cost=0.25,
+    )
+    kind, error = next(events)
+    assert (kind, error["tool_call_id"], error["error_message"]) == ("trace_error", 2, "bad")
+    kind, end = next(events)
+    assert (kind, end["duration"], end["total_cost"]) == ("end", 1.5, 0.25)
+    assert list(events) == []
+
+
+def test_stream_of_unknown_trace_is_not_found(engine):
+    client = dashboard_server.app.test_client()
+    assert client.get("/api/traces/9/stream").status_code == 404
+
+
+def test_open_streams_are_capped_and_leave_threads_to_other_requests(
+    engine, monkeypatch
+):
+    monkeypatch.setattr(dashboard_server, "MAX_TRACE_STREAMS", 1)
+    monkeypatch.setattr(dashboard_server, "_open_streams", 0)
+    client = dashboard_server.app.test_client()
+    stream = client.get("/api/traces/1/stream", buffered=False)
+    kind, _ = next(_events(stream.response))
+    assert kind == "agent_call"
+
+    assert client.get("/api/traces/1").status_code == 200
+    busy = client.get("/api/traces/1/stream")
+    assert busy.status_code == 503
+    assert busy.headers["Retry-After"] == str(dashboard_server.STREAM_BUSY_RETRY_AFTER)
+
+    stream.close()
+    reopened = client.get("/api/traces/1/stream", buffered=False)
+    assert reopened.status_code == 200
+    reopened.close()
@@ -0,0 +1,116 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import Session
+
+from agentneo.data import ProjectInfoModel, SystemInfoModel, TraceModel, get_engine
+from agentneo.tracing import base
+from agentneo.tracing.base import BaseTracer, _RecentHashes
+
+SNAPSHOT = {
+    "os_name": "Linux",
+    "os_version": "6.1",
+    "python_version": "3.11.4",
+    "cpu_info": "Test CPU",
+    "gpu_info": None,
+    "disk_info": json.dumps({"total": 500.0, "available": 120.0}),
+    "memory_total": 16.0,
+    "installed_packages": json.dumps({"agentneo": "1.0"}),
+}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    db_path = f"sqlite:///{tmp_path / 'trace_data.db'}"
+    with Session(get_engine(db_path)) as session:
+        session.add(ProjectInfoModel(id=1, project_name="First"))
+        session.add(ProjectInfoModel(id=2, project_name="Second"))
+        session.commit()
+    return db_path
+
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    future = Future()
+    monkeypatch.setattr(base, "get_system_info", lambda: future)
+    return future
+
+
+def _tracer(db_path, project_name):
+    return BaseTracer(SimpleNamespace(project_name=project_name, db_path=db_path))
+
+
+def test_stop_does_not_wait_for_the_system_snapshot(db_path, snapshot):
+    tracer = _tracer(db_path, "First")
+    tracer.start()
+    started = time.monotonic()
+    tracer.stop()
+    assert time.monotonic() - started < 1
+
+    snapshot.set_result(SNAPSHOT)
+    with Session(get_engine(db_path)) as session:
+        trace = session.get(TraceModel, tracer.trace_id)
+        assert trace.end_time is not None
+        assert trace.system_info.cpu_info == "Test CPU"
+
+
+def test_projects_find_shared_snapshots_through_their_traces(db_path, snapshot):
+    snapshot.set_result(SNAPSHOT)
+    for project_name in ("First", "Second"):
+        tracer = _tracer(db_path, project_name)
+        tracer.start()
+        tracer.stop()
+
+    with Session(get_engine(db_path)) as session:
+        (shared,) = session.query(SystemInfoModel).all()
+        # Recorded by the first project's trace
+        assert shared.project_id == 1
+        for project_id in (1, 2):
+            project = session.get(ProjectInfoModel, project_id)
+            assert project.system_info.content_hash == shared.content_hash
+        session.add(ProjectInfoModel(id=3, project_name="Empty"))
+        session.flush()
+        assert session.get(ProjectInfoModel, 3).system_info is None
+
+
+def test_stop_gives_up_on_a_stuck_writer(db_path, snapshot, monkeypatch, caplog):
+    monkeypatch.setattr(base, "WRITER_CLOSE_TIMEOUT", 0.1)
+    tracer = _tracer(db_path, "First")
+    release = threading.Event()
+    write = tracer.writer._write
+
+    def stuck_write(batch):
+        release.wait()
+        write(batch)
+
+    monkeypatch.setattr(tracer.writer, "_write", stuck_write)
+    tracer.start()
+    thread = tracer.writer._thread
+    started = time.monotonic()
+    with caplog.at_level(logging.ERROR):
+        tracer.stop()
+    assert time.monotonic() - started < 1
+    assert "left unfinished" in caplog.text
+
+    # The writer carries on once the database is free again
+    release.set()
+    thread.join(5)
+    with Session(get_engine(db_path)) as session:
+        assert session.get(TraceModel, tracer.trace_id).end_time is None
+
+
+def test_remembered_hashes_are_capped():
+    hashes = _RecentHashes(limit=2)
+    hashes.add("a")
+    hashes.add("b")
+    assert "a" in hashes
+    hashes.add("c")
+    # "b" was the least recently used
+    assert "b" not in hashes
+    assert "a" in hashes and "c" in hashes
+    assert len(hashes) == 2
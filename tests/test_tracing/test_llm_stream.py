@@ -0,0 +1,107 @@
+import asyncio
+import gc
+from types import SimpleNamespace
+
+from agentneo.tracing.llm_stream import (
+    StreamRecorder,
+    TracedAsyncStream,
+    TracedStream,
+    wrap_stream,
+)
+
+
+def _chunk(content=None, tool_call=None, finish_reason=None, usage=None):
+    delta = {"content": content}
+    if tool_call is not None:
+        delta["tool_calls"] = [tool_call]
+    return {
+        "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        "usage": usage,
+    }
+
+
+CHUNKS = [
+    _chunk("Hel"),
+    _chunk("lo"),
+    _chunk(
+        tool_call={"index": 0, "id": "call_1", "function": {"name": "search"}}
+    ),
+    _chunk(tool_call={"index": 0, "function": {"arguments": '{"q": 1}'}}),
+    _chunk(finish_reason="stop"),
+    {
+        "model": "gpt-4o-mini",
+        "choices": [],
+        "usage": SimpleNamespace(prompt_tokens=7, completion_tokens=3),
+    },
+]
+
+
+def _recorder():
+    finished = []
+    recorder = StreamRecorder(lambda recorder, error: finished.append(error))
+    return recorder, finished
+
+
+def test_sync_stream_passes_chunks_through_and_assembles_response():
+    recorder, finished = _recorder()
+    stream = wrap_stream(iter(CHUNKS), recorder)
+    assert isinstance(stream, TracedStream)
+
+    assert list(stream) == CHUNKS
+    assert finished == [None]
+    assert recorder.chunk_count == len(CHUNKS)
+    assert recorder.time_to_first_token >= 0
+    assert recorder.inter_token_latency >= 0
+
+    response = recorder.assemble()
+    message = response.choices[0].message
+    assert response.model == "gpt-4o-mini"
+    assert message.content == "Hello"
+    assert message.tool_calls[0].id == "call_1"
+    assert message.tool_calls[0].function.name == "search"
+    assert message.tool_calls[0].function.arguments == '{"q": 1}'
+    assert response.choices[0].finish_reason == "stop"
+    assert response.usage.completion_tokens == 3
+
+
+def test_stream_errors_are_reported_once():
+    def failing():
+        yield CHUNKS[0]
+        raise RuntimeError("connection reset")
+
+    recorder, finished = _recorder()
+    stream = wrap_stream(failing(), recorder)
+    assert next(stream) == CHUNKS[0]
+    try:
+        next(stream)
+    except RuntimeError:
+        pass
+    stream.close()
+    assert [str(error) for error in finished] == ["connection reset"]
+
+
+def test_abandoned_stream_is_recorded_on_collection():
+    recorder, finished = _recorder()
+    stream = wrap_stream(iter(CHUNKS), recorder)
+    next(stream)
+    del stream
+    gc.collect()
+    assert finished == [None]
+    assert recorder.assemble().choices[0].message.content == "Hel"
+
+
+def test_async_stream():
+    async def chunks():
+        for chunk in CHUNKS:
+            yield chunk
+
+    async def consume(stream):
+        return [chunk async for chunk in stream]
+
+    recorder, finished = _recorder()
+    stream = wrap_stream(chunks(), recorder, asynchronous=True)
+    assert isinstance(stream, TracedAsyncStream)
+    assert asyncio.run(consume(stream)) == CHUNKS
+    assert finished == [None]
+    assert recorder.assemble().choices[0].message.content == "Hello"
@@ -0,0 +1,52 @@
+import time
+import tracemalloc
+
+import pytest
+
+from agentneo.tracing.memory import (
+    MemoryProbe,
+    SampledRSSProbe,
+    TracemallocProbe,
+    create_memory_probe,
+)
+
+
+def test_create_memory_probe_modes():
+    assert type(create_memory_probe("off")) is MemoryProbe
+    assert isinstance(create_memory_probe("sampled"), SampledRSSProbe)
+    assert isinstance(create_memory_probe("tracemalloc"), TracemallocProbe)
+    with pytest.raises(ValueError, match="memory_mode"):
+        create_memory_probe("rss")
+
+
+def test_off_probe_reports_nothing():
+    probe = create_memory_probe("off")
+    assert probe.end_span(probe.start_span()) == 0
+
+
+def test_sampled_probe_reads_latest_sample():
+    probe = SampledRSSProbe(interval=0.01)
+    probe.start()
+    try:
+        token = probe.start_span()
+        assert token > 0
+        ballast = bytearray(64 * 1024 * 1024)
+        ballast[::4096] = b"x" * len(ballast[::4096])
+        time.sleep(0.1)
+        assert probe.end_span(token) > 0
+    finally:
+        probe.stop()
+    assert probe._thread is None
+
+
+def test_tracemalloc_probe_accounts_span_allocations():
+    assert not tracemalloc.is_tracing()
+    probe = TracemallocProbe()
+    probe.start()
+    try:
+        token = probe.start_span()
+        ballast = [object() for _ in range(10000)]
+        assert probe.end_span(token) >= 10000 * 16
+    finally:
+        probe.stop()
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,84 @@
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from agentneo.tracing.network_tracer import NetworkTracer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = HTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def network_tracer():
+    tracer = NetworkTracer()
+    tracer.activate_patches()
+    yield tracer
+    tracer.deactivate_patches()
+
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.read().decode()
+
+
+def test_calls_are_recorded_per_span(network_tracer, server_url):
+    with network_tracer.span() as calls:
+        # The response body is still readable by the caller
+        assert _get(f"{server_url}/one") == "/one"
+    assert _get(f"{server_url}/outside") == "/outside"
+
+    urls = [call["url"] for call in calls]
+    assert f"{server_url}/one" in urls
+    assert not any("/outside" in url for url in urls)
+    assert network_tracer.network_calls == []
+
+
+def test_concurrent_spans_do_not_share_calls(network_tracer, server_url):
+    results = {}
+    barrier = threading.Barrier(4)
+
+    def tool(index):
+        with network_tracer.span() as calls:
+            barrier.wait()
+            for _ in range(3):
+                _get(f"{server_url}/tool-{index}")
+        results[index] = calls
+
+    threads = [threading.Thread(target=tool, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for index, calls in results.items():
+        urls = [call["url"] for call in calls if call["method"] == "GET"]
+        assert urls and all(url.endswith(f"/tool-{index}") for url in urls)
+
+
+def test_patches_are_removed_on_deactivate(server_url):
+    original_urlopen = urllib.request.urlopen
+    tracer = NetworkTracer()
+    tracer.activate_patches()
+    assert urllib.request.urlopen is not original_urlopen
+    tracer.deactivate_patches()
+    assert urllib.request.urlopen is original_urlopen
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from agentneo.data import AgentCallModel, Base, ProjectInfoModel, TraceModel
+from agentneo.tracing.span_writer import IdAllocator, SpanWriter
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trace_data.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        session.add(ProjectInfoModel(id=1, project_name="Writer Project"))
+        session.commit()
+    return Session
+
+
+def test_id_allocator_skips_existing_rows(session_factory):
+    with session_factory() as session:
+        session.add(TraceModel(id=41, project_id=1))
+        session.commit()
+
+    allocator = IdAllocator(session_factory, block_size=10)
+    ids = [allocator.next_id(TraceModel) for _ in range(25)]
+    assert ids == list(range(42, 67))
+
+
+def test_id_allocators_do_not_overlap(session_factory):
+    first = IdAllocator(session_factory, block_size=5)
+    second = IdAllocator(session_factory, block_size=5)
+    ids = [first.next_id(TraceModel) for _ in range(3)]
+    ids += [second.next_id(TraceModel) for _ in range(3)]
+    ids += [first.next_id(TraceModel) for _ in range(3)]
+    assert len(set(ids)) == len(ids)
+
+
+def test_writer_commits_inserts_and_updates_on_flush(session_factory):
+    writer = SpanWriter(session_factory, batch_size=2, flush_interval=60)
+    for trace_id in range(1, 6):
+        writer.add(TraceModel(id=trace_id, project_id=1))
+    writer.update(TraceModel, 3, {"duration": 1.5})
+    assert writer.flush(timeout=5)
+
+    with session_factory() as session:
+        assert session.query(TraceModel).count() == 5
+        assert session.get(TraceModel, 3).duration == 1.5
+    writer.close()
+
+
+def test_writer_commits_a_partial_batch_once(session_factory):
+    writer = SpanWriter(session_factory, batch_size=100, flush_interval=0.3)
+    commits = []
+    apply = writer._apply
+    writer._apply = lambda batch: commits.append(len(batch)) or apply(batch)
+    for trace_id in range(1, 21):
+        writer.add(TraceModel(id=trace_id, project_id=1))
+        time.sleep(0.001)
+    time.sleep(0.6)  # past the flush interval, without flush()
+
+    assert commits == [20]
+    with session_factory() as session:
+        assert session.query(TraceModel).count() == 20
+    writer.close()
+
+
+def test_writer_isolates_failing_rows(session_factory):
+    writer = SpanWriter(session_factory)
+    writer.add(TraceModel(id=1, project_id=1))
+    writer.add(TraceModel(id=1, project_id=1))  # duplicate primary key
+    writer.add(TraceModel(id=2, project_id=1))
+    writer.close()
+
+    with session_factory() as session:
+        assert sorted(t.id for t in session.query(TraceModel)) == [1, 2]
+
+
+def test_writer_never_blocks_an_event_loop_nor_drops_writes(session_factory):
+    writer = SpanWriter(session_factory, max_queue_size=2)
+    # Keep the queue from being drained while it fills up
+    writer._ensure_started = lambda: None
+
+    async def trace():
+        for trace_id in range(1, 11):
+            writer.add(TraceModel(id=trace_id, project_id=1))
+            writer.add(AgentCallModel(project_id=1, trace_id=trace_id, name="a"))
+        writer.update(TraceModel, 10, {"duration": 2.0})
+
+    asyncio.run(asyncio.wait_for(trace(), timeout=5))
+    del writer._ensure_started
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    with session_factory() as session:
+        assert session.query(TraceModel).count() == 10
+        assert session.query(AgentCallModel).count() == 10
+        assert session.get(TraceModel, 10).duration == 2.0
+
+
+def test_writer_bumps_trace_versions(session_factory):
+    writer = SpanWriter(session_factory)
+    writer.add(TraceModel(id=1, project_id=1))
+    writer.add(TraceModel(id=2, project_id=1))
+    assert writer.flush(timeout=5)
+    writer.add(AgentCallModel(id=1, project_id=1, trace_id=1, name="agent"))
+    assert writer.flush(timeout=5)
+    writer.update(AgentCallModel, 1, {"end_time": None})
+    writer.update(TraceModel, 2, {"duration": 1.0})
+    writer.close()
+
+    with session_factory() as session:
+        # New traces start at 0; their agent's insert and update bump it
+        assert session.get(TraceModel, 1).version == 2
+        assert session.get(TraceModel, 2).version == 1
@@ -0,0 +1,62 @@
+import json
+import os
+
+import pytest
+
+from agentneo.utils import model_costs
+from agentneo.utils.model_costs import ModelCostIndex
+
+COSTS = {
+    "gpt-4o": {"input_cost_per_token": 1.0, "output_cost_per_token": 2.0},
+    "gpt-4o-mini": {"input_cost_per_token": 0.1, "output_cost_per_token": 0.2},
+    "groq/llama3-8b-8192": {"input_cost_per_token": 0.5, "output_cost_per_token": 0.5},
+    "sample_spec": "not a cost entry",
+}
+
+
+@pytest.fixture
+def index():
+    return ModelCostIndex(COSTS)
+
+
+def test_exact_lookup(index):
+    assert index.lookup("gpt-4o-mini")["input_cost_per_token"] == 0.1
+    assert "sample_spec" not in index
+
+
+def test_provider_and_version_normalization(index):
+    assert index.resolve("openai/gpt-4o") == "gpt-4o"
+    assert index.resolve("GPT-4o-2024-11-20") == "gpt-4o"
+    assert index.resolve("llama3-8b-8192") == "groq/llama3-8b-8192"
+    assert index.resolve("unknown-model") is None
+    assert index.lookup(None) is None
+
+
+def test_context_sizes_are_not_taken_for_dates(index):
+    assert index.resolve("gpt-4o-0806") == "gpt-4o"
+    assert index.resolve("gpt-4o-20240806") == "gpt-4o"
+    # A different context size is a different model
+    assert index.resolve("llama3-8b-4096") is None
+    assert index.resolve("gpt-4o-8192") is None
+
+
+def test_entries_are_immutable(index):
+    with pytest.raises(TypeError):
+        index["gpt-4o"]["input_cost_per_token"] = 0
+
+
+def test_index_is_shared_and_reloaded_on_mtime_change(tmp_path, monkeypatch):
+    path = tmp_path / "model_costs.json"
+    path.write_text(json.dumps(COSTS))
+    monkeypatch.setattr(model_costs, "_model_costs_path", lambda: str(path))
+    monkeypatch.setattr(model_costs, "_index", None)
+
+    first = model_costs.get_model_costs()
+    assert model_costs.get_model_costs() is first
+
+    path.write_text(json.dumps({"new-model": {"input_cost_per_token": 3.0}}))
+    os.utime(path, (first.mtime + 10, first.mtime + 10))
+    assert model_costs.get_model_costs() is first
+    reloaded = model_costs.get_model_costs(check_mtime=True)
+    assert reloaded is not first
+    assert reloaded.lookup("new-model")["input_cost_per_token"] == 3.0
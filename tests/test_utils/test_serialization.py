@@ -0,0 +1,52 @@
+import dataclasses
+import datetime
+import json
+from types import SimpleNamespace
+
+from agentneo.utils.serialization import as_text, dumps, loads
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: int
+
+
+class Message:
+    def model_dump(self):
+        return {"role": "assistant", "content": "hi"}
+
+
+def test_dumps_writes_json_for_non_native_types():
+    value = {
+        "point": Point(1, 2),
+        "message": Message(),
+        "namespace": SimpleNamespace(name="search", arguments="{}"),
+        "tags": {"b", "a"},
+        "when": datetime.datetime(2024, 1, 2, 3, 4, 5),
+        "raw": b"bytes",
+        "other": object,
+    }
+    assert json.loads(dumps(value)) == {
+        "point": {"x": 1, "y": 2},
+        "message": {"role": "assistant", "content": "hi"},
+        "namespace": {"name": "search", "arguments": "{}"},
+        "tags": ["a", "b"],
+        "when": "2024-01-02T03:04:05",
+        "raw": "bytes",
+        "other": "<class 'object'>",
+    }
+
+
+def test_dumps_never_fails():
+    cyclic = []
+    cyclic.append(cyclic)
+    assert loads(dumps(cyclic)) == "[[...]]"
+
+
+def test_loads_and_as_text():
+    assert loads(dumps("Hello")) == "Hello"
+    assert loads("not json") == "not json"
+    assert as_text(dumps("Hello")) == "Hello"
+    assert as_text(dumps({"a": 1})) == '{"a": 1}'
+    assert as_text(None) is None
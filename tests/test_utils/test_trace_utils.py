@@ -1,8 +1,7 @@
 import pytest
 import json
 from dataclasses import dataclass
-from agentneo.utils import trace_utils
-from unittest.mock import mock_open, patch
+from agentneo.utils import get_model_costs, trace_utils
 
 
 # Define a mock data class for testing log_event
@@ -48,15 +47,8 @@ def test_calculate_cost():
 
 # Test load_model_costs function
 def test_load_model_costs():
-    # Simulate file found case
-    model_costs_content = {"modelA": {"input_cost": 0.01, "output_cost": 0.02}}
-    with patch("builtins.open", mock_open(read_data=json.dumps(model_costs_content))):
-        assert trace_utils.load_model_costs() == model_costs_content
-
-    # Simulate file not found case, using a fallback file within resources
-    with patch("builtins.open", side_effect=FileNotFoundError):
-        with patch("importlib.resources.open_text", mock_open(read_data=json.dumps(model_costs_content))):
-            assert trace_utils.load_model_costs() == model_costs_content
+    # The packaged table, whatever the working directory
+    assert trace_utils.load_model_costs() is get_model_costs()
 
 # Test log_event function
 def test_log_event(tmp_path):